@@ -0,0 +1,93 @@
+import threading
+from typing import TYPE_CHECKING, List, Optional
+from config.settings import API_KEY, SPORT, REGION, MARKETS, BOOKMAKERS, ODDS_BASE_URL, ODDS_CACHE_TTL
+from clients.session import ApiClient
+from metrics import count
+from storage.odds_cache import OddsCache
+
+if TYPE_CHECKING:
+    from storage.odds_history import OddsHistoryStore  # Usa pandas: se importa solo al registrar un snapshot
+
+_client: Optional[ApiClient] = None
+_client_lock = threading.Lock()
+
+def odds_api_client() -> ApiClient:
+    """Sesión compartida (keep-alive y reintentos) para la Odds API"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient(ODDS_BASE_URL)
+        return _client
+
+def fetch_odds(sport: str = SPORT, region: str = REGION, markets: List[str] = MARKETS,
+               bookmakers: List[str] = BOOKMAKERS, ttl: float = ODDS_CACHE_TTL, force_refresh: bool = False,
+               cache: Optional[OddsCache] = None, client: Optional[ApiClient] = None,
+               history: Optional['OddsHistoryStore'] = None, record_history: bool = True) -> Optional[list]:
+    """ Obtiene las cuotas pasando por la caché local.
+
+    Si la respuesta guardada tiene menos de `ttl` segundos se devuelve sin llamar a la API.
+    Si ha caducado se hace una petición condicional (ETag / Last-Modified) y un 304
+    reutiliza los datos guardados. `force_refresh` ignora la caché y siempre consulta.
+    Cada respuesta nueva (200) se añade al histórico de cuotas si `record_history`.
+    Devuelve None si la API responde con error. """
+
+    cache = cache or OddsCache()
+    client = client or odds_api_client()
+    key = cache.key(sport, region, markets, bookmakers)
+    entry = cache.get(key)
+
+    if not force_refresh and cache.is_fresh(entry, ttl):
+        print("♻️ Cuotas servidas desde la caché local")
+        count('odds_requests_total', source='cache')
+        return entry['data']
+
+    # Petición condicional si ya tenemos una versión guardada
+    headers = {}
+    if entry and not force_refresh:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    params = {
+        'regions': region,
+        'markets': ','.join(markets),
+        'bookmakers': ','.join(bookmakers),
+        'apiKey': API_KEY,
+    }
+    response = client.get(f'sports/{sport}/odds/', params=params, headers=headers)
+
+    quota = cache.record_quota(response.headers)
+    if 'remaining' in quota:
+        print(f"📉 Peticiones restantes en la Odds API: {quota['remaining']}")
+
+    if response.status_code == 304 and entry:
+        cache.touch(key, entry)
+        print("♻️ Cuotas sin cambios (304), usando la caché local")
+        count('odds_requests_total', source='not_modified')
+        return entry['data']
+
+    if response.status_code == 200:
+        data = response.json()
+        cache.put(key, data, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        if record_history:
+            record_snapshot(data, history)
+        count('odds_requests_total', source='api')
+        return data
+
+    print(f"❌ Error al obtener cuotas: {response.status_code}")
+    count('odds_requests_total', source='error')
+    return None
+
+def record_snapshot(data: list, history: Optional['OddsHistoryStore'] = None) -> None:
+    """Añade un snapshot al histórico de cuotas sin interrumpir la descarga si falla"""
+    from storage.odds_history import OddsHistoryStore
+    store = history or OddsHistoryStore()
+    try:
+        changes = store.record_snapshot(data)
+        print(f"🗃️ Histórico de cuotas actualizado: {changes} cambios")
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el histórico de cuotas: {str(e)}")
+    finally:
+        if history is None:
+            store.close()
@@ -0,0 +1,76 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from config.settings import HTTP_RETRIES, HTTP_BACKOFF, HTTP_POOL_SIZE
+from metrics import METRICS, log_event
+
+
+class RateLimiter:
+    """Limita las llamadas a una API a `calls_per_minute`, compartido entre hilos"""
+
+    def __init__(self, calls_per_minute: Optional[float] = None):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Bloquea hasta que haya un hueco libre para la siguiente llamada"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ApiClient:
+    """Sesión HTTP keep-alive por API con limitador de llamadas y reintentos con backoff"""
+
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None,
+                 calls_per_minute: Optional[float] = None, retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_BACKOFF, timeout: float = 10, pool_size: int = HTTP_POOL_SIZE):
+        self.base_url = base_url
+        self.api = urlparse(base_url).netloc or base_url  # Etiqueta de las métricas HTTP
+        self.timeout = timeout
+        self.limiter = RateLimiter(calls_per_minute)
+
+        # Reintenta errores de conexión, 429 (respetando Retry-After) y 5xx
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path: str = '', params: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET relativo a `base_url`, respetando el límite de llamadas de la API (registra latencia y estado)"""
+        self.limiter.wait()
+        inicio = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, params=params, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            METRICS.inc('http_errors_total', api=self.api, error=type(e).__name__)
+            log_event('http', api=self.api, path=path, error=type(e).__name__, seconds=round(time.perf_counter() - inicio, 6))
+            raise
+        segundos = time.perf_counter() - inicio
+        METRICS.observe('http_request_seconds', segundos, api=self.api, status=response.status_code)
+        METRICS.inc('http_requests_total', api=self.api, status=response.status_code)
+        log_event('http', api=self.api, path=path, status=response.status_code, seconds=round(segundos, 6))
+        return response
+
+    def close(self) -> None:
+        self.session.close()
@@ -23,7 +23,13 @@ BOOKMAKERS = [
     "skybet",
     "marathonbet",
     "betsson"]  # Casas de apuestas de referencia
+SHARP_BOOKMAKER = "pinnacle"  # Casa de referencia para la probabilidad sin margen
 MIN_EDGE = 0.02  # Margen mínimo para considerar una Value Bet
+ODDS_BASE_URL = "https://api.the-odds-api.com/v4/"  # URL base de la API
+ODDS_CACHE_DIR = "data/cache"  # Caché local de respuestas de la Odds API
+ODDS_CACHE_TTL = 300  # Segundos que una respuesta se considera vigente
+LIVE_POLL_INTERVAL = 60  # Segundos entre sondeos del monitor en vivo
+ODDS_HISTORY_DB = "data/odds_history.sqlite"  # Histórico de cuotas (solo-añadir)
 
 """____________________________________________________________________________________"""
 
@@ -38,5 +44,35 @@ LEAGUES = {
     #'eredivisie': 'DED',  # Eredivisie
     #'premier_league': 'PL',  # Premier League
 }
+LEAGUE_SPORTS = {   # Deporte de la Odds API de cada liga
+    'la_liga': SPORT,
+    #'bundesliga': 'soccer_germany_bundesliga',
+    #'serie_a': 'soccer_italy_serie_a',
+    #'eredivisie': 'soccer_netherlands_eredivisie',
+    #'premier_league': 'soccer_epl',
+}
 DEFAULT_SEASON = 2024 # Temporada por defecto
+FD_CALLS_PER_MINUTE = 10 # Límite del plan gratuito de FootballData.org
+FD_MAX_WORKERS = 4 # Descargas de ligas en paralelo
+HISTORY_STORE_DIR = 'data/store' # Almacén local de partidos por liga y temporada
+COMPACT_HISTORY_DIR = 'data/store/compact' # Historial compacto multi-liga (arrays .npy abribles con mmap)
+
+"""____________________________________________________________________________________"""
+
+# Configuración HTTP compartida
+
+HTTP_RETRIES = 3 # Reintentos ante errores de conexión, 429 y 5xx
+HTTP_BACKOFF = 1.0 # Factor de espera exponencial entre reintentos (segundos)
+HTTP_POOL_SIZE = 10 # Conexiones keep-alive por API
+STARTUP_BUDGET = 0.3 # Segundos máximos de arranque de los comandos ligeros (scripts/startup_check.py)
+IMPORT_BUDGET = 1.0 # Segundos máximos para importar los scripts con la pila científica (scripts/startup_check.py)
+METRICS_DIR = 'data/metrics' # Métricas (textfile de Prometheus y JSON) y perfiles
+PROFILE_ENV = 'VALUE_BETS_PROFILE' # Variable de entorno con las etapas a perfilar ('all' o lista separada por comas)
+
+"""____________________________________________________________________________________"""
+
+# Configuración del modelo
 
+DC_DECAY_RATE = 0.0019 # Decaimiento diario del peso de cada partido en el ajuste Dixon-Coles
+MODEL_CACHE_DIR = 'data/cache' # Parámetros ajustados por liga
+FIXTURE_CACHE_SIZE = 4096 # Partidos con salidas del modelo en caché (se descartan los usados hace más tiempo)
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterator, Optional, Tuple
+from config.settings import METRICS_DIR, PROFILE_ENV
+
+# Solo biblioteca estándar: instrumentar no debe encarecer el arranque de los comandos ligeros
+logger = logging.getLogger('sports_betting')
+logger.addHandler(logging.NullHandler())
+
+PREFIX = 'value_bets_'
+
+
+def _key(name: str, labels: Dict[str, object]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def log_event(event: str, **fields) -> None:
+    """Log estructurado: una línea JSON por evento (solo si hay handlers configurados)"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, ensure_ascii=False, default=str))
+
+
+def configure_logging(path: Optional[str] = None, level: int = logging.INFO) -> None:
+    """Activa los logs estructurados en stderr o en un archivo (JSON lines)"""
+    handler = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+class Metrics:
+    """Registro en memoria de contadores y duraciones con etiquetas, seguro entre hilos.
+
+    Las duraciones guardan número de observaciones, suma y máximo (suficiente para
+    medias y picos sin histogramas). Se exporta como textfile de Prometheus o JSON.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[tuple, float] = {}
+        self.timings: Dict[tuple, list] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Suma `value` al contador `name`"""
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Registra una duración en segundos"""
+        key = _key(name, labels)
+        with self._lock:
+            timing = self.timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def stage(self, name: str, **labels) -> Iterator[Dict]:
+        """Mide una etapa; el dict devuelto admite campos extra para el log (filas, eventos...)"""
+        fields: Dict = {}
+        inicio = time.perf_counter()
+        estado = 'ok'
+        try:
+            with profiled(name):
+                yield fields
+        except BaseException:
+            estado = 'error'
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.observe('stage_seconds', segundos, stage=name, **labels)
+            if estado == 'error':
+                self.inc('stage_errors_total', stage=name, **labels)
+            log_event('stage', stage=name, seconds=round(segundos, 6), status=estado, **labels, **fields)
+
+    def snapshot(self) -> Dict:
+        """Vista JSON de todas las métricas"""
+        with self._lock:
+            return {
+                'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in self.counters.items()],
+                'timings': [{'name': n, 'labels': dict(l), 'count': c, 'sum': s, 'max': m}
+                            for (n, l), (c, s, m) in self.timings.items()],
+            }
+
+    def merge(self, snapshot: Dict) -> None:
+        """Acumula una vista de `snapshot` (p. ej. la de un proceso del pool)"""
+        for counter in snapshot['counters']:
+            self.inc(counter['name'], counter['value'], **counter['labels'])
+        with self._lock:
+            for timing in snapshot['timings']:
+                actual = self.timings.setdefault(_key(timing['name'], timing['labels']), [0, 0.0, 0.0])
+                actual[0] += timing['count']
+                actual[1] += timing['sum']
+                actual[2] = max(actual[2], timing['max'])
+
+    def to_prometheus(self) -> str:
+        """Formato de texto de Prometheus (para el textfile collector de node_exporter)"""
+        def labels_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"'.replace('\n', ' ') for k, v in labels) + '}'
+
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f'# TYPE {PREFIX}{name} counter')
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f'{PREFIX}{name}{labels_text(labels)} {value:g}')
+            for name in sorted({n for n, _ in self.timings}):
+                lines.append(f'# TYPE {PREFIX}{name} summary')
+                for (n, labels), (count, total, peak) in sorted(self.timings.items()):
+                    if n == name:
+                        lines.append(f'{PREFIX}{name}_count{labels_text(labels)} {count}')
+                        lines.append(f'{PREFIX}{name}_sum{labels_text(labels)} {total:.6f}')
+                        lines.append(f'{PREFIX}{name}_max{labels_text(labels)} {peak:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, directory: str = METRICS_DIR, name: str = 'value_bets') -> Tuple[str, str]:
+        """Guarda `<name>.prom` y `<name>.json` de forma atómica; devuelve sus rutas"""
+        os.makedirs(directory, exist_ok=True)
+        rutas = []
+        for extension, contenido in (('prom', self.to_prometheus()),
+                                     ('json', json.dumps(self.snapshot(), indent=2, ensure_ascii=False))):
+            path = os.path.join(directory, f'{name}.{extension}')
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(contenido)
+            os.replace(path + '.tmp', path)
+            rutas.append(path)
+        return rutas[0], rutas[1]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+METRICS = Metrics()  # Registro compartido del proceso
+
+
+def stage(name: str, **labels):
+    """Atajo a `METRICS.stage`"""
+    return METRICS.stage(name, **labels)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Atajo a `METRICS.inc`"""
+    METRICS.inc(name, value, **labels)
+
+
+def timed(name: str):
+    """Decorador que mide cada llamada como la etapa `name`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ----------------------------
+# PERFILADO BAJO DEMANDA
+# ----------------------------
+_profile_stages: Optional[set] = None
+_profile_active = threading.Lock()  # cProfile no admite perfiles anidados: el primero manda
+
+
+def enable_profiling(stages: str = 'all') -> None:
+    """Perfila las etapas indicadas ('all' o nombres separados por comas)"""
+    global _profile_stages
+    _profile_stages = {s.strip() for s in stages.split(',') if s.strip()}
+
+
+def _profiling(name: str) -> bool:
+    global _profile_stages
+    if _profile_stages is None:
+        _profile_stages = {s.strip() for s in os.environ.get(PROFILE_ENV, '').split(',') if s.strip()}
+    return bool(_profile_stages) and ('all' in _profile_stages or name in _profile_stages)
+
+
+@contextmanager
+def profiled(name: str, directory: str = METRICS_DIR, top: int = 15) -> Iterator[None]:
+    """Ejecuta el bloque con cProfile si la etapa está activada (`enable_profiling` o la variable
+    de entorno PROFILE_ENV); guarda el `.prof` y escribe en el log las funciones más costosas"""
+    if not _profiling(name) or not _profile_active.acquire(blocking=False):
+        yield
+        return
+
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_active.release()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile_{name.replace('.', '_')}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        resumen = io.StringIO()
+        pstats.Stats(profiler, stream=resumen).sort_stats('cumulative').print_stats(top)
+        log_event('profile', stage=name, path=path)
+        logger.debug(resumen.getvalue())
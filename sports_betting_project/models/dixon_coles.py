@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from config.settings import DC_DECAY_RATE, MODEL_CACHE_DIR
+from models.poisson import score_matrix, MAX_GOALS
+
+RIDGE = 1e-3        # Penalización L2 sobre ataque/defensa (identificabilidad y equipos con pocos datos)
+RHO_BOUNDS = (-0.2, 0.2)
+
+
+def data_version(matches: pd.DataFrame) -> str:
+    """Huella de los partidos (fechas, equipos y goles) que identifica una versión de los datos"""
+    h = hashlib.sha1()
+    h.update(pd.to_datetime(matches['date'], utc=True, cache=False).astype('int64').to_numpy().tobytes())
+    for col in ('home_team', 'away_team'):
+        h.update('\x1f'.join(matches[col].astype(str)).encode('utf-8'))
+    for col in ('home_score', 'away_score'):
+        h.update(matches[col].to_numpy(dtype=np.int64).tobytes())
+    return h.hexdigest()[:16]
+
+
+def dixon_coles_matrix(lambda_home, lambda_away, rho, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """Matriz de marcadores Poisson con la corrección de Dixon-Coles en 0-0, 1-0, 0-1 y 1-1"""
+    lambda_home = np.atleast_1d(np.asarray(lambda_home, dtype=float))
+    lambda_away = np.atleast_1d(np.asarray(lambda_away, dtype=float))
+    matrix = score_matrix(lambda_home, lambda_away, max_goals).copy()
+
+    matrix[:, 0, 0] *= 1 - lambda_home * lambda_away * rho
+    matrix[:, 0, 1] *= 1 + lambda_home * rho
+    matrix[:, 1, 0] *= 1 + lambda_away * rho
+    matrix[:, 1, 1] *= 1 - rho
+    return matrix / matrix.sum(axis=(1, 2), keepdims=True)
+
+
+def _negative_log_likelihood(params: np.ndarray, home: np.ndarray, away: np.ndarray, x: np.ndarray,
+                             y: np.ndarray, weights: np.ndarray, n_teams: int):
+    """Log-verosimilitud ponderada (negativa) de Dixon-Coles y su gradiente analítico.
+
+    Parámetros: [intercepto, localía, rho, ataque (n), defensa (n)];
+    log λ = intercepto + localía + ataque[local] + defensa[visitante],
+    log μ = intercepto + ataque[visitante] + defensa[local].
+    """
+    intercept, home_adv, rho = params[:3]
+    attack = params[3:3 + n_teams]
+    defense = params[3 + n_teams:]
+
+    log_lam = intercept + home_adv + attack[home] + defense[away]
+    log_mu = intercept + attack[away] + defense[home]
+    lam = np.exp(log_lam)
+    mu = np.exp(log_mu)
+
+    # Corrección de marcadores bajos τ(x, y) y sus derivadas
+    tau = np.ones_like(lam)
+    d_lam = np.zeros_like(lam)  # d log τ / d log λ
+    d_mu = np.zeros_like(lam)   # d log τ / d log μ
+    d_rho = np.zeros_like(lam)  # d log τ / d ρ
+
+    s00 = (x == 0) & (y == 0)
+    s01 = (x == 0) & (y == 1)
+    s10 = (x == 1) & (y == 0)
+    s11 = (x == 1) & (y == 1)
+
+    tau[s00] = 1 - lam[s00] * mu[s00] * rho
+    tau[s01] = 1 + lam[s01] * rho
+    tau[s10] = 1 + mu[s10] * rho
+    tau[s11] = 1 - rho
+    tau = np.maximum(tau, 1e-10)
+
+    d_lam[s00] = -lam[s00] * mu[s00] * rho / tau[s00]
+    d_mu[s00] = d_lam[s00]
+    d_rho[s00] = -lam[s00] * mu[s00] / tau[s00]
+    d_lam[s01] = lam[s01] * rho / tau[s01]
+    d_rho[s01] = lam[s01] / tau[s01]
+    d_mu[s10] = mu[s10] * rho / tau[s10]
+    d_rho[s10] = mu[s10] / tau[s10]
+    d_rho[s11] = -1 / tau[s11]
+
+    loglik = weights * (np.log(tau) + x * log_lam - lam + y * log_mu - mu)
+
+    # Gradiente respecto a log λ y log μ de cada partido
+    g_lam = weights * (x - lam + d_lam)
+    g_mu = weights * (y - mu + d_mu)
+
+    grad = np.empty_like(params)
+    grad[0] = g_lam.sum() + g_mu.sum()
+    grad[1] = g_lam.sum()
+    grad[2] = (weights * d_rho).sum()
+    grad[3:3 + n_teams] = np.bincount(home, g_lam, n_teams) + np.bincount(away, g_mu, n_teams)
+    grad[3 + n_teams:] = np.bincount(away, g_lam, n_teams) + np.bincount(home, g_mu, n_teams)
+
+    # Penalización L2 sobre ataque y defensa
+    penalty = RIDGE * (attack @ attack + defense @ defense)
+    grad[3:] -= 2 * RIDGE * params[3:]
+
+    return -(loglik.sum() - penalty), -grad
+
+
+class DixonColesModel:
+    """Modelo Dixon-Coles ajustado por máxima verosimilitud sobre toda una liga.
+
+    Estima ataque y defensa por equipo, ventaja de localía y el parámetro rho de
+    dependencia en marcadores bajos, ponderando cada partido con un decaimiento
+    exponencial según su antigüedad respecto al último partido de los datos.
+    Una vez ajustado, valorar un partido es leer parámetros y evaluar la matriz.
+    """
+
+    def __init__(self, teams: List[str], params: np.ndarray, version: str = '', decay: float = DC_DECAY_RATE):
+        self.teams = list(teams)
+        self.index = {team: i for i, team in enumerate(self.teams)}
+        self.params = np.asarray(params, dtype=float)
+        self.version = version
+        self.decay = decay
+
+    @property
+    def intercept(self) -> float:
+        return float(self.params[0])
+
+    @property
+    def home_advantage(self) -> float:
+        return float(self.params[1])
+
+    @property
+    def rho(self) -> float:
+        return float(self.params[2])
+
+    @property
+    def attack(self) -> np.ndarray:
+        return self.params[3:3 + len(self.teams)]
+
+    @property
+    def defense(self) -> np.ndarray:
+        return self.params[3 + len(self.teams):]
+
+    @classmethod
+    def fit(cls, matches: pd.DataFrame, decay: float = DC_DECAY_RATE,
+            previous: Optional['DixonColesModel'] = None) -> 'DixonColesModel':
+        """Ajusta el modelo con L-BFGS-B y gradiente analítico; `previous` sirve de punto de partida"""
+        from scipy.optimize import minimize  # SciPy solo se carga cuando hay que reajustar
+
+        matches = matches.dropna(subset=['home_score', 'away_score'])
+        teams = list(pd.unique(pd.concat([matches['home_team'], matches['away_team']]).astype(str)))
+        index = {team: i for i, team in enumerate(teams)}
+        n_teams = len(teams)
+
+        home = matches['home_team'].astype(str).map(index).to_numpy()
+        away = matches['away_team'].astype(str).map(index).to_numpy()
+        x = matches['home_score'].to_numpy(dtype=float)
+        y = matches['away_score'].to_numpy(dtype=float)
+
+        # Peso exponencial por antigüedad (días) respecto al partido más reciente
+        dates = pd.to_datetime(matches['date'], utc=True, cache=False)
+        age = (dates.max() - dates).dt.total_seconds().to_numpy() / 86400
+        weights = np.exp(-decay * age)
+
+        # Punto de partida: solución anterior (equipos conocidos) o medias de la liga
+        x0 = np.zeros(3 + 2 * n_teams)
+        if previous is not None:
+            x0[:3] = previous.params[:3]
+            for team, i in index.items():
+                j = previous.index.get(team)
+                if j is not None:
+                    x0[3 + i] = previous.attack[j]
+                    x0[3 + n_teams + i] = previous.defense[j]
+        else:
+            mean_goals = max(np.average((x + y) / 2, weights=weights), 1e-3)
+            x0[0] = np.log(mean_goals)
+            x0[1] = np.log(max(np.average(x, weights=weights), 1e-3) / max(np.average(y, weights=weights), 1e-3))
+
+        bounds = [(None, None), (None, None), RHO_BOUNDS] + [(None, None)] * (2 * n_teams)
+        result = minimize(
+            _negative_log_likelihood, x0, jac=True, method='L-BFGS-B', bounds=bounds,
+            args=(home, away, x, y, weights, n_teams)
+        )
+        return cls(teams, result.x, data_version(matches), decay)
+
+    def lambdas(self, home_teams, away_teams):
+        """Goles esperados (local, visitante) para lotes de equipos; los desconocidos valen la media"""
+        home_teams = np.atleast_1d(home_teams)
+        away_teams = np.atleast_1d(away_teams)
+        attack = np.append(self.attack, 0.0)
+        defense = np.append(self.defense, 0.0)
+        unknown = len(self.teams)
+        home = np.fromiter((self.index.get(team, unknown) for team in home_teams), dtype=np.int64, count=len(home_teams))
+        away = np.fromiter((self.index.get(team, unknown) for team in away_teams), dtype=np.int64, count=len(away_teams))
+
+        lambda_home = np.exp(self.intercept + self.home_advantage + attack[home] + defense[away])
+        lambda_away = np.exp(self.intercept + attack[away] + defense[home])
+        return lambda_home, lambda_away
+
+    def score_matrix(self, home_teams, away_teams, max_goals: int = MAX_GOALS) -> np.ndarray:
+        """Matrices de marcador (partidos × goles × goles) de un lote de partidos"""
+        return dixon_coles_matrix(*self.lambdas(home_teams, away_teams), self.rho, max_goals)
+
+    def to_dict(self) -> Dict:
+        return {'teams': self.teams, 'params': self.params.tolist(), 'version': self.version, 'decay': self.decay}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DixonColesModel':
+        return cls(data['teams'], data['params'], data.get('version', ''), data.get('decay', DC_DECAY_RATE))
+
+
+class DixonColesCache:
+    """Modelos ajustados por liga, en memoria y en disco.
+
+    Si la versión de los datos no cambia se reutiliza el ajuste; si llegan partidos
+    nuevos se reajusta partiendo de la solución anterior.
+    """
+
+    def __init__(self, root: str = MODEL_CACHE_DIR, decay: float = DC_DECAY_RATE):
+        self.root = root
+        self.decay = decay
+        self._models: Dict[str, DixonColesModel] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, league: str) -> str:
+        return os.path.join(self.root, f'dixon_coles_{league}.json')
+
+    def _load(self, league: str) -> Optional[DixonColesModel]:
+        try:
+            with open(self._path(league)) as f:
+                return DixonColesModel.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, league: str, model: DixonColesModel) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(league) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(model.to_dict(), f)
+        os.replace(tmp_path, self._path(league))
+
+    def get(self, league: str, matches: pd.DataFrame) -> DixonColesModel:
+        """Modelo de la liga para estos partidos (ajustado solo si los datos cambiaron)"""
+        version = data_version(matches.dropna(subset=['home_score', 'away_score']))
+        with self._lock:
+            previous = self._models.get(league) or self._load(league)
+            if previous is not None and previous.version == version and previous.decay == self.decay:
+                self._models[league] = previous
+                return previous
+
+            model = DixonColesModel.fit(matches, self.decay, previous)
+            self._models[league] = model
+            self._save(league, model)
+            return model
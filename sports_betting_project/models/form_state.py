@@ -0,0 +1,225 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+SIDE_KEYS = ('scored', 'conceded', 'consistency', 'n', 'form_scored', 'form_conceded', 'form_consistency', 'form_n')
+
+
+def row_hashes(fechas: np.ndarray, local: np.ndarray, visitante: np.ndarray,
+               goles_local: np.ndarray, goles_visitante: np.ndarray) -> np.ndarray:
+    """Hash uint64 de cada partido (fecha, equipos y marcador)"""
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        'fecha': fechas, 'local': local, 'visitante': visitante,
+        'goles_local': goles_local.astype(np.int64), 'goles_visitante': goles_visitante.astype(np.int64),
+    }), index=False).to_numpy()
+
+
+class FormState:
+    """Estado de forma por equipo actualizado partido a partido en O(1).
+
+    Para cada equipo y condición (local/visitante) mantiene medias móviles
+    exponenciales de goles a favor, en contra y victorias con dos horizontes
+    (`span` y `form_span`, equivalentes a las ventanas de 10 y 5 partidos), la
+    racha de resultados y las medias de goles de la liga. Las consultas son
+    lecturas vectorizadas de arrays por código de equipo, así que el motor de
+    value bets no recorre el historial, y se puede guardar en disco para no
+    repetir la temporada al reiniciar.
+    """
+
+    def __init__(self, span: int = 10, form_span: int = 5):
+        self.window = span
+        self.form_window = form_span
+        self.alpha = 2 / (span + 1)
+        self.form_alpha = 2 / (form_span + 1)
+
+        self.teams: Dict[str, int] = {}
+        self.home = {key: np.zeros(0, dtype=np.int64 if key.endswith('n') else float) for key in SIDE_KEYS}
+        self.away = {key: np.zeros(0, dtype=np.int64 if key.endswith('n') else float) for key in SIDE_KEYS}
+        self.streak = np.zeros(0, dtype=np.int64)  # +k victorias seguidas, -k derrotas, 0 tras empate
+
+        # Medias de la liga acumuladas
+        self.home_goals = 0.0
+        self.away_goals = 0.0
+        self.matches = 0
+
+        # Último partido aplicado, para no repetir partidos al añadir el historial
+        self.last_date: Optional[int] = None
+        self._last_keys: set = set()
+        # Suma (mód. 2**64) de los hashes de los partidos aplicados con `append`
+        self.digest = 0
+
+    @property
+    def avg_home_goals(self) -> float:
+        return self.home_goals / self.matches if self.matches else np.nan
+
+    @property
+    def avg_away_goals(self) -> float:
+        return self.away_goals / self.matches if self.matches else np.nan
+
+    def _team(self, team: str) -> int:
+        code = self.teams.get(team)
+        if code is None:
+            code = self.teams[team] = len(self.teams)
+            for side in (self.home, self.away):
+                for key in SIDE_KEYS:
+                    side[key] = np.append(side[key], 0 if key.endswith('n') else np.nan)
+            self.streak = np.append(self.streak, 0)
+        return code
+
+    def codes(self, teams: Iterable[str]) -> np.ndarray:
+        """Códigos de un lote de equipos (-1 para los que no están en el estado)"""
+        return np.fromiter((self.teams.get(team, -1) for team in teams), dtype=np.int64)
+
+    def take(self, side: Dict[str, np.ndarray], key: str, codes: np.ndarray, default=np.nan) -> np.ndarray:
+        """Lectura vectorizada de una estadística para un array de códigos"""
+        values = side[key][np.clip(codes, 0, None)] if len(side[key]) else np.full(len(codes), default)
+        return np.where(codes >= 0, values, default)
+
+    def fixture_stats(self, side: Dict[str, np.ndarray], codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Todas las estadísticas de un lado para un lote de códigos (n = 0 si el equipo no existe)"""
+        return {key: self.take(side, key, codes, 0 if key.endswith('n') else np.nan) for key in side}
+
+    def _update_side(self, side: Dict[str, np.ndarray], code: int, scored: float, conceded: float, win: float) -> None:
+        for prefix, alpha in (('', self.alpha), ('form_', self.form_alpha)):
+            first = side[prefix + 'n'][code] == 0
+            for key, value in (('scored', scored), ('conceded', conceded), ('consistency', win)):
+                values = side[prefix + key]
+                values[code] = value if first else values[code] + alpha * (value - values[code])
+            side[prefix + 'n'][code] += 1
+
+    def update(self, date, home_team: str, away_team: str, home_goals: int, away_goals: int) -> bool:
+        """Aplica un partido finalizado; devuelve False si ya estaba aplicado o es anterior al estado"""
+        date = pd.Timestamp(date).value
+        key = f'{home_team}|{away_team}'
+        if self.last_date is not None and (date < self.last_date or (date == self.last_date and key in self._last_keys)):
+            return False
+
+        home = self._team(home_team)
+        away = self._team(away_team)
+        self._update_side(self.home, home, home_goals, away_goals, float(home_goals > away_goals))
+        self._update_side(self.away, away, away_goals, home_goals, float(away_goals > home_goals))
+
+        # Rachas: se alargan con el mismo resultado y se reinician al cambiar
+        sign = int(np.sign(home_goals - away_goals))
+        for code, result in ((home, sign), (away, -sign)):
+            current = self.streak[code]
+            self.streak[code] = current + result if result and np.sign(current) == result else result
+
+        self.home_goals += home_goals
+        self.away_goals += away_goals
+        self.matches += 1
+
+        if date != self.last_date:
+            self.last_date = date
+            self._last_keys = set()
+        self._last_keys.add(key)
+        return True
+
+    def append(self, historial_data: pd.DataFrame) -> int:
+        """Aplica en orden los partidos del historial que aún no estén en el estado; devuelve cuántos.
+
+        Si los partidos ya aplicados no coinciden con los del historial (un resultado
+        corregido o un partido anterior añadido tarde), el estado se rehace desde cero.
+        """
+        data = historial_data.dropna(subset=['goles_local', 'goles_visitante'])
+        fechas = pd.to_datetime(data['fecha'], utc=True, cache=False).dt.as_unit('ns').astype('int64').to_numpy()
+        local = data['equipo_local'].astype(str).to_numpy()
+        visitante = data['equipo_visitante'].astype(str).to_numpy()
+        goles_local = data['goles_local'].to_numpy()
+        goles_visitante = data['goles_visitante'].to_numpy()
+        hashes = row_hashes(fechas, local, visitante, goles_local, goles_visitante)
+
+        if self.last_date is not None:
+            claves = np.array([f'{home}|{away}' for home, away in zip(local, visitante)], dtype=object)
+            aplicados = (fechas < self.last_date) | ((fechas == self.last_date) & np.isin(claves, list(self._last_keys)))
+            if aplicados.sum() != self.matches or int(hashes[aplicados].sum()) != self.digest:
+                self.__init__(self.window, self.form_window)  # Reconstrucción completa
+            else:
+                pendientes = np.flatnonzero(~aplicados)
+                fechas, local, visitante = fechas[pendientes], local[pendientes], visitante[pendientes]
+                goles_local, goles_visitante, hashes = goles_local[pendientes], goles_visitante[pendientes], hashes[pendientes]
+
+        nuevos = 0
+        for i in np.argsort(fechas, kind='stable'):
+            if self.update(fechas[i], local[i], visitante[i], int(goles_local[i]), int(goles_visitante[i])):
+                self.digest = (self.digest + int(hashes[i])) % 2 ** 64
+                nuevos += 1
+        return nuevos
+
+    def replay(self, historial_data: pd.DataFrame) -> Dict:
+        """Aplica el historial y devuelve, para cada fila, las estadísticas justo antes del partido.
+
+        Los partidos que empiezan a la misma hora no se ven entre sí (sin lookahead).
+        """
+        fechas = pd.to_datetime(historial_data['fecha'], utc=True, cache=False).dt.as_unit('ns').astype('int64').to_numpy()
+        n = len(historial_data)
+        features = {
+            'home': {key: np.zeros(n, dtype=self.home[key].dtype) for key in SIDE_KEYS},
+            'away': {key: np.zeros(n, dtype=self.away[key].dtype) for key in SIDE_KEYS},
+            'avg_home_goals': np.full(n, np.nan),
+            'avg_away_goals': np.full(n, np.nan),
+            'league_matches': np.zeros(n, dtype=np.int64),
+        }
+
+        local = historial_data['equipo_local'].astype(str).to_numpy()
+        visitante = historial_data['equipo_visitante'].astype(str).to_numpy()
+        goles_local = historial_data['goles_local'].to_numpy()
+        goles_visitante = historial_data['goles_visitante'].to_numpy()
+
+        order = np.argsort(fechas, kind='stable')
+        bounds = np.flatnonzero(np.diff(fechas[order])) + 1
+        for rows in np.split(order, bounds):
+            # Lectura de todos los partidos de la misma hora antes de aplicar ninguno
+            for i in rows:
+                home = self._team(local[i])
+                away = self._team(visitante[i])
+                for key in SIDE_KEYS:
+                    features['home'][key][i] = self.home[key][home]
+                    features['away'][key][i] = self.away[key][away]
+                features['avg_home_goals'][i] = self.avg_home_goals
+                features['avg_away_goals'][i] = self.avg_away_goals
+                features['league_matches'][i] = self.matches
+            for i in rows:
+                self.update(fechas[i], local[i], visitante[i], int(goles_local[i]), int(goles_visitante[i]))
+        return features
+
+    def streaks(self, codes: np.ndarray) -> np.ndarray:
+        """Racha actual de un lote de equipos (0 para los desconocidos)"""
+        return self.take({'streak': self.streak}, 'streak', codes, 0)
+
+    def save(self, path: str) -> None:
+        """Guarda el estado de forma atómica en un `.npz`"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {f'home_{key}': values for key, values in self.home.items()}
+        arrays.update({f'away_{key}': values for key, values in self.away.items()})
+        meta = {
+            'span': self.window, 'form_span': self.form_window, 'teams': list(self.teams),
+            'home_goals': self.home_goals, 'away_goals': self.away_goals, 'matches': self.matches,
+            'last_date': self.last_date, 'last_keys': sorted(self._last_keys),
+            'digest': self.digest,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, streak=self.streak, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'FormState':
+        """Recupera un estado guardado con `save`"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            state = cls(meta['span'], meta['form_span'])
+            state.teams = {team: i for i, team in enumerate(meta['teams'])}
+            state.home = {key: data[f'home_{key}'].copy() for key in SIDE_KEYS}
+            state.away = {key: data[f'away_{key}'].copy() for key in SIDE_KEYS}
+            state.streak = data['streak'].copy()
+        state.home_goals = meta['home_goals']
+        state.away_goals = meta['away_goals']
+        state.matches = meta['matches']
+        state.last_date = meta['last_date']
+        state._last_keys = set(meta['last_keys'])
+        state.digest = meta['digest']
+        return state
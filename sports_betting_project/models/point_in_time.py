@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+from models.form_state import FormState, SIDE_KEYS
+
+GROUP_STRIDE = 10 ** 10  # Separación entre grupos en la clave (grupo, segundos epoch)
+
+
+def prior_sums(groups: np.ndarray, times: np.ndarray, values: np.ndarray,
+               window: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma de `values` y número de filas del mismo grupo estrictamente anteriores a cada fila.
+
+    Con `window` solo cuentan las últimas `window` filas anteriores del grupo. Las
+    filas con la misma hora que la actual no cuentan (sin lookahead). Todo se
+    resuelve con una ordenación, una suma acumulada y búsquedas binarias.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+
+    order = np.lexsort((times, groups))
+    key = groups[order] * GROUP_STRIDE + times[order]
+
+    # Primera fila del grupo y primera fila con la misma hora (= filas anteriores)
+    group_start = np.searchsorted(key, groups[order] * GROUP_STRIDE, 'left')
+    end = np.searchsorted(key, key, 'left')
+    start = group_start if window is None else np.maximum(group_start, end - window)
+
+    cumsum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values[order], axis=0)])
+    sums = np.empty((len(key),) + values.shape[1:])
+    counts = np.empty(len(key), dtype=np.int64)
+    sums[order] = cumsum[end] - cumsum[start]
+    counts[order] = end - start
+    return sums, counts
+
+
+class PointInTimeStats:
+    """Estadísticas por partido calculadas solo con los partidos jugados antes de su inicio.
+
+    Para cada fila del historial devuelve, con los partidos jugados hasta ese
+    momento, los promedios del local en casa y del visitante fuera (últimos
+    `window` y `form_window` partidos), la consistencia y las medias de la liga.
+    Sirve para backtests sin lookahead.
+
+    Con `ewma` reproduce en su lugar el `FormState` que usa el motor de value bets
+    (medias exponenciales con `window` y `form_window` como horizontes).
+    """
+
+    def __init__(self, historial_data: pd.DataFrame, window: int = 10, form_window: int = 5, league_col: str = 'liga',
+                 ewma: bool = False):
+        self.window = window
+        self.form_window = form_window
+        if ewma:
+            self._replay_form_state(historial_data, league_col)
+            return
+
+        fechas = pd.to_datetime(historial_data['fecha'], utc=True, cache=False)
+        times = fechas.astype('int64').to_numpy() // 10 ** 9
+        leagues = (pd.factorize(historial_data[league_col])[0] if league_col in historial_data
+                   else np.zeros(len(historial_data), dtype=np.int64))
+
+        goles_local = historial_data['goles_local'].to_numpy(dtype=float)
+        goles_visitante = historial_data['goles_visitante'].to_numpy(dtype=float)
+
+        # Medias de la liga con los partidos anteriores
+        sums, counts = prior_sums(leagues, times, np.column_stack([goles_local, goles_visitante]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.avg_home_goals = sums[:, 0] / counts
+            self.avg_away_goals = sums[:, 1] / counts
+        self.league_matches = counts
+
+        # Equipos codificados por liga para que no se mezclen entre competiciones
+        equipos, _ = pd.factorize(pd.concat([historial_data['equipo_local'], historial_data['equipo_visitante']]))
+        home_codes = leagues * (equipos.max() + 1) + equipos[:len(historial_data)]
+        away_codes = leagues * (equipos.max() + 1) + equipos[len(historial_data):]
+
+        resultado = historial_data['resultado'].to_numpy()
+        self.home = self._side_stats(home_codes, times, goles_local, goles_visitante, resultado == '1')
+        self.away = self._side_stats(away_codes, times, goles_visitante, goles_local, resultado == '2')
+
+    def _side_stats(self, codes: np.ndarray, times: np.ndarray, scored: np.ndarray, conceded: np.ndarray,
+                    wins: np.ndarray) -> Dict[str, np.ndarray]:
+        """Estadísticas de un lado (local o visitante) con las mismas claves que `FormState`"""
+        values = np.column_stack([scored, conceded, wins.astype(float)])
+        stats = {}
+        for prefix, n in (('', self.window), ('form_', self.form_window)):
+            sums, counts = prior_sums(codes, times, values, n)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts[:, None]
+            stats[prefix + 'scored'] = means[:, 0]
+            stats[prefix + 'conceded'] = means[:, 1]
+            stats[prefix + 'consistency'] = means[:, 2]
+            stats[prefix + 'n'] = counts
+        return stats
+
+    def _replay_form_state(self, historial_data: pd.DataFrame, league_col: str) -> None:
+        """Estadísticas previas a cada partido con un `FormState` por liga"""
+        n = len(historial_data)
+        self.home = {}
+        self.away = {}
+        self.avg_home_goals = np.full(n, np.nan)
+        self.avg_away_goals = np.full(n, np.nan)
+        self.league_matches = np.zeros(n, dtype=np.int64)
+
+        leagues = (pd.factorize(historial_data[league_col])[0] if league_col in historial_data
+                   else np.zeros(n, dtype=np.int64))
+        for league in np.unique(leagues):
+            rows = np.flatnonzero(leagues == league)
+            features = FormState(self.window, self.form_window).replay(historial_data.iloc[rows])
+            for side, values in (('home', self.home), ('away', self.away)):
+                for key in SIDE_KEYS:
+                    column = features[side][key]
+                    values.setdefault(key, np.zeros(n, dtype=column.dtype))[rows] = column
+            self.avg_home_goals[rows] = features['avg_home_goals']
+            self.avg_away_goals[rows] = features['avg_away_goals']
+            self.league_matches[rows] = features['league_matches']
@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Dict, Tuple
+
+MAX_GOALS = 10  # Goles máximos por equipo en la matriz truncada
+
+
+def poisson_pmf(goles: np.ndarray, lambdas: np.ndarray) -> np.ndarray:
+    """PMF de Poisson para goles 0..n consecutivos; equivale a `scipy.stats.poisson.pmf` sin cargar SciPy"""
+    log_factorial = np.cumsum(np.log(np.maximum(goles, 1)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pmf = np.exp(goles * np.log(lambdas) - lambdas - log_factorial)
+    # λ = 0: todo el peso en 0 goles
+    return np.where(lambdas == 0, (goles == 0).astype(float), pmf)
+
+
+def score_matrix(lambda_home, lambda_away, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """Matriz exacta de probabilidades de marcador (local × visitante) para cada partido.
+
+    Recibe arrays de lambdas (uno por partido) y devuelve un array de forma
+    (n_partidos, max_goals + 1, max_goals + 1) normalizado para que cada matriz sume 1.
+    """
+    lambda_home = np.atleast_1d(np.asarray(lambda_home, dtype=float))
+    lambda_away = np.atleast_1d(np.asarray(lambda_away, dtype=float))
+    goles = np.arange(max_goals + 1)
+
+    pmf_home = poisson_pmf(goles[None, :], lambda_home[:, None])
+    pmf_away = poisson_pmf(goles[None, :], lambda_away[:, None])
+
+    matrix = pmf_home[:, :, None] * pmf_away[:, None, :]
+    # Redistribuimos la masa truncada para que cada matriz sume 1
+    return matrix / matrix.sum(axis=(1, 2), keepdims=True)
+
+
+def outcome_probabilities(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Probabilidades 1/X/2 a partir de un lote de matrices de marcador"""
+    prob_home = np.tril(matrix, -1).sum(axis=(1, 2))
+    prob_draw = np.trace(matrix, axis1=1, axis2=2)
+    prob_away = np.triu(matrix, 1).sum(axis=(1, 2))
+    return prob_home, prob_draw, prob_away
+
+
+def match_probabilities(lambda_home, lambda_away, max_goals: int = MAX_GOALS) -> Dict[str, np.ndarray]:
+    """Probabilidades 1X2 para todos los partidos del lote en una sola llamada vectorizada"""
+    prob_home, prob_draw, prob_away = outcome_probabilities(score_matrix(lambda_home, lambda_away, max_goals))
+    return {
+        'local': prob_home,
+        'empate': prob_draw,
+        'visitante': prob_away
+    }
+
+
+def _goal_grid(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Goles del local y del visitante para cada celda de la matriz"""
+    goles = np.arange(matrix.shape[-1])
+    return goles[:, None], goles[None, :]
+
+
+def total_goals_probabilities(matrix: np.ndarray, line: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Probabilidades Over/Under de una línea de goles (en líneas enteras se excluye el push)"""
+    home, away = _goal_grid(matrix)
+    total = home + away
+    return matrix[:, total > line].sum(axis=1), matrix[:, total < line].sum(axis=1)
+
+
+def handicap_probability(matrix: np.ndarray, point: float) -> np.ndarray:
+    """Probabilidad de que el local cubra un hándicap `point` (negativo = da ventaja)"""
+    home, away = _goal_grid(matrix)
+    return matrix[:, (home - away + point) > 0].sum(axis=1)
+
+
+def btts_probability(matrix: np.ndarray) -> np.ndarray:
+    """Probabilidad de que ambos equipos marquen"""
+    return matrix[:, 1:, 1:].sum(axis=(1, 2))
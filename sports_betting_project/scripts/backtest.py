@@ -0,0 +1,318 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple
+from config.settings import LEAGUES, LEAGUE_SPORTS, DEFAULT_SEASON, MIN_EDGE, COMPACT_HISTORY_DIR
+from utils import team_resolver
+from models.point_in_time import PointInTimeStats
+from models.fixture_model import expected_goals, confidence_scores, REGRESSION_WEIGHT, HOME_FACTOR
+from models.poisson import match_probabilities
+from storage.compact_history import CompactHistory
+from storage.history_store import HistoryStore
+from storage.odds_history import OddsHistoryStore
+from scripts.value_bet_finder import PARAMETROS, MERCADOS, score_value_bets
+
+BANKROLL = 100.0     # Banca inicial (unidades) para ROI y drawdown
+STAKE = 1.0          # Apuesta plana por value bet
+KICKOFF_LEAD = 3600  # Segundos antes del inicio en que se toma la cuota
+
+# Niveles de PARAMETROS más el filtro base de config/settings.py (solo MIN_EDGE)
+NIVELES_BACKTEST = {
+    **PARAMETROS,
+    'base': {'min_edge': MIN_EDGE, 'max_odd': np.inf, 'min_prob': 0.0, 'min_confidence': 0.0},
+}
+
+
+def result_sources(league: str, season: int, store: HistoryStore) -> Optional[str]:
+    """Archivo del que se leen los resultados de una liga/temporada (almacén local o CSV exportado)"""
+    for path in (store.path(league, season), os.path.join('data', f'{league}_{season}_matches.csv')):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_results(leagues: Optional[Iterable[str]] = None, seasons: Iterable[int] = (DEFAULT_SEASON,),
+                 store: Optional[HistoryStore] = None) -> pd.DataFrame:
+    """Resultados de varias ligas y temporadas en el formato del historial de ValueBetFinder.
+
+    Lee el almacén local y, si una liga/temporada no está, `data/<liga>_<temporada>_matches.csv`.
+    Cada liga/temporada es un grupo independiente ('liga'), igual que el historial en producción.
+    """
+    leagues = LEAGUES if leagues is None else leagues
+    store = store or HistoryStore()
+    frames = []
+
+    for league in leagues:
+        for season in seasons:
+            matches = store.load(league, season)
+            if matches.empty:
+                path = os.path.join('data', f'{league}_{season}_matches.csv')
+                if not os.path.exists(path):
+                    continue
+                matches = pd.read_csv(path)
+
+            teams = team_resolver(league)
+            teams.register_all(pd.concat([matches['home_team'], matches['away_team']]))
+            frames.append(pd.DataFrame({
+                'liga': f'{league}_{season}',
+                'fecha': pd.to_datetime(matches['date'], utc=True),
+                'equipo_local': matches['home_team'].astype(str).map(teams.canonical),
+                'equipo_visitante': matches['away_team'].astype(str).map(teams.canonical),
+                'goles_local': matches['home_score'].to_numpy(),
+                'goles_visitante': matches['away_score'].to_numpy(),
+            }))
+
+    if not frames:
+        return pd.DataFrame(columns=['liga', 'fecha', 'equipo_local', 'equipo_visitante', 'goles_local', 'goles_visitante', 'resultado'])
+
+    results = pd.concat(frames, ignore_index=True).dropna(subset=['goles_local', 'goles_visitante'])
+    results['resultado'] = np.select(
+        [results['goles_local'] > results['goles_visitante'], results['goles_local'] == results['goles_visitante']],
+        ['1', 'X'],
+        '2'
+    )
+    return results.sort_values('fecha', kind='stable').reset_index(drop=True)
+
+
+def load_history(leagues: Optional[Iterable[str]] = None, seasons: Iterable[int] = (DEFAULT_SEASON,),
+                 store: Optional[HistoryStore] = None, root: str = COMPACT_HISTORY_DIR) -> CompactHistory:
+    """Resultados de varias ligas y temporadas como `CompactHistory` abierto con mmap.
+
+    Se reconstruye solo si cambia algún archivo de origen; si no, se abre el que ya
+    está en disco (varios procesos comparten así las mismas páginas).
+    """
+    leagues = list(LEAGUES if leagues is None else leagues)
+    seasons = list(seasons)
+    store = store or HistoryStore()
+
+    sources = {}
+    for league in leagues:
+        for season in seasons:
+            path = result_sources(league, season, store)
+            if path:
+                stat = os.stat(path)
+                sources[f'{league}_{season}'] = [league, path, stat.st_mtime_ns, stat.st_size]
+    key = hashlib.sha1(json.dumps([leagues, seasons]).encode('utf-8')).hexdigest()[:12]
+    path = os.path.join(root, f'history_{key}')
+
+    try:
+        history = CompactHistory.load(path)
+    except (OSError, ValueError, KeyError):
+        history = None
+    if history is None or history.meta.get('sources') != sources:
+        history = CompactHistory.from_frame(load_results(leagues, seasons, store))
+        history.meta['sources'] = sources
+        history.save(path)
+        return CompactHistory.load(path)
+
+    # Sin pasar por load_results: dar de alta los nombres del historial en el resolvedor de cada liga
+    for group, (league, *_) in sources.items():
+        if group in history.leagues:
+            rows = history.league_rows(group)
+            codes = np.unique(np.concatenate([history.home_team[rows], history.away_team[rows]]))
+            team_resolver(league).register_all(history.teams[code] for code in codes)
+    return history
+
+
+def load_odds(lead: float = KICKOFF_LEAD, store: Optional[OddsHistoryStore] = None) -> pd.DataFrame:
+    """Cuotas 1X2 del histórico tal como estaban `lead` segundos antes de cada partido"""
+    history = store or OddsHistoryStore()
+    try:
+        prices = history.prices_before_kickoff(lead)
+    finally:
+        if store is None:
+            history.close()
+
+    # Solo eventos de ligas configuradas: sus nombres se resuelven con el resolvedor de la liga
+    ligas = {sport: league for league, sport in LEAGUE_SPORTS.items()}
+    prices = prices[prices['sport_key'].isin(list(ligas))]
+
+    mercado = np.select(
+        [prices['outcome'] == prices['home_team'], prices['outcome'] == 'Draw', prices['outcome'] == prices['away_team']],
+        ['1', 'X', '2'],
+        ''
+    )
+
+    # Nombres canónicos con el resolvedor de la liga de cada evento (por su deporte en la Odds API)
+    equipos = pd.DataFrame(index=prices.index, columns=['local', 'visitante'], dtype=object)
+    for sport, grupo in prices.groupby('sport_key', sort=False):
+        teams = team_resolver(ligas[sport])
+        equipos.loc[grupo.index, 'local'] = grupo['home_team'].map(teams.canonical)
+        equipos.loc[grupo.index, 'visitante'] = grupo['away_team'].map(teams.canonical)
+
+    return pd.DataFrame({
+        'fecha': pd.to_datetime(prices['commence_time'], unit='s', utc=True),
+        'equipo_local': equipos['local'],
+        'equipo_visitante': equipos['visitante'],
+        'Casa': prices['bookmaker'],
+        'Mercado': mercado,
+        'Odd': prices['price'],
+    })[mercado != '']
+
+
+def fixture_outputs(results: pd.DataFrame, window: int = 10, form_window: int = 5, weight: float = REGRESSION_WEIGHT,
+                    home_factor: float = HOME_FACTOR, ewma: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Probabilidades y confianza (partidos × 3) de cada partido con los datos previos a su inicio.
+
+    Por defecto la forma se calcula como en producción (`FormState`); con `ewma=False`
+    se usan las medias de los últimos `window` y `form_window` partidos.
+    """
+    stats = PointInTimeStats(results, window, form_window, ewma=ewma)
+    lambdas = expected_goals(stats.home, stats.away, stats.avg_home_goals, stats.avg_away_goals, weight, home_factor)
+    probs = match_probabilities(*lambdas)
+    prob = np.column_stack([probs[market] for market, _ in MERCADOS])
+    confidence = confidence_scores(stats.home, stats.away, stats.avg_home_goals, stats.avg_away_goals)
+    # Sin partidos previos en la liga no hay medias con las que predecir
+    return prob, confidence, stats.league_matches > 0
+
+
+def match_odds(results: pd.DataFrame, odds: pd.DataFrame) -> pd.DataFrame:
+    """Asigna a cada cuota el índice del partido (mismos equipos y mismo día), uniendo por claves enteras"""
+    def dia(fechas):
+        # Días desde epoch independientemente de la resolución (ns, us...) de las fechas
+        return pd.to_datetime(fechas, utc=True, cache=False).dt.tz_localize(None).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    # Un código entero por nombre canónico, común a resultados y cuotas
+    codes, _ = pd.factorize(pd.concat([
+        results['equipo_local'], results['equipo_visitante'], odds['equipo_local'], odds['equipo_visitante']
+    ], ignore_index=True))
+    n, m = len(results), len(odds)
+
+    fixtures = pd.DataFrame({
+        'fixture': np.arange(n),
+        'local_id': codes[:n],
+        'visitante_id': codes[n:2 * n],
+        'dia': dia(results['fecha']),
+    })
+    odds = odds.assign(local_id=codes[2 * n:2 * n + m], visitante_id=codes[2 * n + m:], dia=dia(odds['fecha']))
+    return odds.merge(fixtures, on=['local_id', 'visitante_id', 'dia'], how='inner').drop(columns=['local_id', 'visitante_id'])
+
+
+def evaluate_fixtures(results: pd.DataFrame, odds: pd.DataFrame, niveles: Optional[Dict] = None, window: int = 10,
+                      form_window: int = 5, weight: float = REGRESSION_WEIGHT, home_factor: float = HOME_FACTOR,
+                      ewma: bool = True) -> pd.DataFrame:
+    """Puntúa cada cuota histórica con el modelo del momento y marca los niveles que cumple.
+
+    `results` debe estar ordenado por fecha (ver `load_results`). Las filas quedan
+    ordenadas por partido, mercado y cuota descendente, de modo que la primera fila
+    marcada de cada (partido, mercado) es la mejor cuota disponible. Si `odds` ya
+    trae la columna 'fixture' (ver `match_odds`) no se vuelve a emparejar.
+    """
+    niveles = {} if niveles is None else niveles
+    prob, confidence, valid = fixture_outputs(results, window, form_window, weight, home_factor, ewma)
+
+    if 'fixture' not in odds:
+        odds = match_odds(results, odds)
+    odds = odds[valid[odds['fixture'].to_numpy()]]
+    odds = odds.sort_values(['fixture', 'Mercado', 'Odd'], ascending=[True, True, False], kind='stable').reset_index(drop=True)
+    fixture = odds['fixture'].to_numpy()
+    market = odds['Mercado'].map({code: i for i, (_, code) in enumerate(MERCADOS)}).to_numpy()
+
+    evaluacion = pd.DataFrame({
+        'Fecha': results['fecha'].array[fixture],
+        'Partido': results['equipo_local'].to_numpy()[fixture] + ' - ' + results['equipo_visitante'].to_numpy()[fixture],
+        'Mercado': odds['Mercado'],
+        'Casa': odds['Casa'],
+        'Odd': odds['Odd'],
+        'Prob. Real': prob[fixture, market],
+        'Confianza': confidence[fixture, market],
+    })
+    evaluacion = score_value_bets(evaluacion, niveles)
+    evaluacion['Liga'] = results['liga'].to_numpy()[fixture] if 'liga' in results else ''
+    evaluacion['Resultado'] = results['resultado'].to_numpy()[fixture]
+    evaluacion['acierto'] = evaluacion['Mercado'].to_numpy() == evaluacion['Resultado'].to_numpy()
+    evaluacion['fixture'] = fixture
+    evaluacion['seleccion'] = fixture * len(MERCADOS) + market
+    return evaluacion
+
+
+def settle_bets(evaluacion: pd.DataFrame, mask: np.ndarray, stake: float = STAKE,
+                best_price: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Filas apostadas (en orden cronológico), si se ganaron y el beneficio de cada una"""
+    rows = np.flatnonzero(mask)
+    if best_price and len(rows):
+        # Las filas ya vienen ordenadas por cuota: la primera de cada selección es la mejor
+        seleccion = evaluacion['seleccion'].to_numpy()[rows]
+        rows = rows[np.concatenate([[True], seleccion[1:] != seleccion[:-1]])]
+
+    ganada = evaluacion['acierto'].to_numpy()[rows]
+    beneficio = np.where(ganada, stake * (evaluacion['Odd'].to_numpy()[rows] - 1), -stake)
+    return rows, ganada, beneficio
+
+
+def run_backtest(results: pd.DataFrame, odds: pd.DataFrame, niveles: Optional[Dict] = None,
+                 stake: float = STAKE, bankroll: float = BANKROLL, best_price: bool = True,
+                 window: int = 10, form_window: int = 5, ewma: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Repite la búsqueda de value bets sobre partidos ya jugados y liquida las apuestas.
+
+    `results` es un historial ordenado por fecha (ver `load_results`) y `odds` tiene
+    'fecha', 'equipo_local', 'equipo_visitante', 'Casa', 'Mercado' y 'Odd'. El modelo
+    de cada partido solo usa partidos anteriores a su inicio. Con `best_price` se
+    apuesta una vez por partido y mercado a la mejor cuota entre las casas marcadas.
+    Devuelve las apuestas liquidadas y un resumen por nivel.
+    """
+    niveles = NIVELES_BACKTEST if niveles is None else niveles
+    results = results.sort_values('fecha', kind='stable').reset_index(drop=True)
+    evaluacion = evaluate_fixtures(results, odds, niveles, window, form_window, ewma=ewma)
+
+    apuestas, resumen = [], []
+    for nivel in niveles:
+        rows, ganada, beneficio = settle_bets(evaluacion, evaluacion[nivel].to_numpy(), stake, best_price)
+        bets = evaluacion.iloc[rows].drop(columns=list(niveles) + ['fixture', 'seleccion', 'acierto'])
+        apuestas.append(bets.assign(Nivel=nivel, Ganada=ganada, Beneficio=beneficio))
+        resumen.append({'Nivel': nivel, **summarize(beneficio, ganada, stake, bankroll)})
+
+    return pd.concat(apuestas, ignore_index=True), pd.DataFrame(resumen)
+
+
+def summarize(beneficio: np.ndarray, ganada: np.ndarray, stake: float, bankroll: float) -> Dict[str, float]:
+    """ROI, tasa de acierto, yield y drawdown máximo de una secuencia de apuestas liquidadas"""
+    apostado = stake * len(beneficio)
+    total = float(beneficio.sum())
+
+    # Drawdown sobre la banca acumulada, partiendo de la banca inicial
+    banca = bankroll + np.concatenate([[0.0], np.cumsum(beneficio)])
+    picos = np.maximum.accumulate(banca)
+    drawdown = picos - banca
+
+    return {
+        'Apuestas': len(beneficio),
+        'Aciertos': int(ganada.sum()),
+        'Tasa Acierto': float(ganada.mean()) if len(ganada) else np.nan,
+        'Apostado': apostado,
+        'Beneficio': total,
+        'Yield': total / apostado if apostado else np.nan,
+        'ROI': total / bankroll,
+        'Drawdown Máx': float(drawdown.max()),
+        'Drawdown Máx %': float((drawdown / picos).max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest de los niveles de value bets sobre temporadas pasadas")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[DEFAULT_SEASON], help="Temporadas a repetir")
+    parser.add_argument("--lead", type=float, default=KICKOFF_LEAD / 60, help="Minutos antes del inicio en que se toma la cuota")
+    parser.add_argument("--all-prices", action="store_true", help="Apostar en cada casa marcada, no solo a la mejor cuota")
+    parser.add_argument("--window-stats", action="store_true", help="Forma por ventanas de partidos en lugar de medias exponenciales")
+    args = parser.parse_args()
+
+    print("📊 Cargando resultados y cuotas históricas...")
+    results = load_history(seasons=args.seasons).to_frame()
+    odds = load_odds(lead=args.lead * 60)
+    if results.empty or odds.empty:
+        print("❌ Faltan resultados o cuotas históricas (ejecuta get_odds.py o live_odds.py para acumular snapshots)")
+        return
+
+    bets, resumen = run_backtest(results, odds, best_price=not args.all_prices, ewma=not args.window_stats)
+    print(f"\n🧪 Backtest sobre {len(results)} partidos y {len(odds)} cuotas:")
+    print(resumen.to_string(index=False))
+
+    filename = os.path.join("data", "backtest_bets.csv")
+    bets.to_csv(filename, index=False)
+    print(f"\n💾 Apuestas liquidadas guardadas en {filename}")
+
+if __name__ == "__main__":
+    main()
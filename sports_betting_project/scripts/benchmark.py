@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+from config.settings import BOOKMAKERS, DEFAULT_SEASON
+from models.dixon_coles import DixonColesCache
+from storage.fixture_cache import FixtureCache
+from models.poisson import score_matrix, outcome_probabilities, total_goals_probabilities, handicap_probability
+from storage.odds_table import OddsTable
+from storage.price_index import PriceIndex
+from scripts import filter_bets
+from scripts.value_bet_finder import ValueBetFinder, PARAMETROS
+from utils import team_resolver
+
+# Tamaños predefinidos: de la configuración actual hasta 50 ligas × 50 casas × 10 temporadas
+TAMANOS = {
+    'small': {'leagues': 1, 'bookmakers': 12, 'seasons': 1},
+    'medium': {'leagues': 10, 'bookmakers': 25, 'seasons': 3},
+    'large': {'leagues': 50, 'bookmakers': 50, 'seasons': 10},
+}
+
+TEAMS_PER_LEAGUE = 20
+TOLERANCE = 0.25  # Empeoramiento relativo (tiempo o memoria) que se marca como regresión
+BASELINE_DIR = os.path.join("data", "benchmarks")
+
+SILABAS = ['ar', 'be', 'ca', 'do', 'el', 'fa', 'go', 'ha', 'il', 'jo', 'ka', 'lu', 'ma', 'no', 'or', 'pe',
+           'ra', 'sa', 'ti', 'ur', 'va', 'za', 'nt', 'ri', 'lo', 'mi', 'so', 'te']
+SUFIJOS = ['CF', 'FC', 'United', 'Athletic', 'SC', 'Club', 'Sporting', 'Real', 'City', 'Racing']
+
+
+# ----------------------------
+# 1. GENERADOR SINTÉTICO
+# ----------------------------
+def team_names(rng: np.random.Generator, n: int, usados: set) -> List[str]:
+    """Nombres de equipo inventados y únicos (ciudad de sílabas + sufijo)"""
+    names = []
+    while len(names) < n:
+        ciudad = ''.join(rng.choice(SILABAS, rng.integers(2, 4))).capitalize()
+        name = f"{ciudad} {rng.choice(SUFIJOS)}"
+        if name not in usados:
+            usados.add(name)
+            names.append(name)
+    return names
+
+
+def round_robin(n_teams: int) -> List[List[tuple]]:
+    """Calendario de ida y vuelta por el método del círculo: jornadas de (local, visitante)"""
+    teams = list(range(n_teams))
+    jornadas = []
+    for r in range(n_teams - 1):
+        pares = [(teams[i], teams[n_teams - 1 - i]) for i in range(n_teams // 2)]
+        jornadas.append([(a, b) if r % 2 else (b, a) for a, b in pares])
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    return jornadas + [[(b, a) for a, b in jornada] for jornada in jornadas]
+
+
+def lambdas(strength: Dict[str, np.ndarray], home: np.ndarray, away: np.ndarray):
+    lambda_home = np.exp(0.15 + 0.25 + strength['attack'][home] + strength['defense'][away])
+    lambda_away = np.exp(0.15 + strength['attack'][away] + strength['defense'][home])
+    return lambda_home, lambda_away
+
+
+def generate_season(rng: np.random.Generator, teams: List[str], strength: Dict[str, np.ndarray],
+                    season: int) -> pd.DataFrame:
+    """Temporada completa con marcadores Poisson según la fuerza de cada equipo"""
+    inicio = datetime(season, 8, 15, 17, tzinfo=timezone.utc)
+    filas = []
+    for j, jornada in enumerate(round_robin(len(teams))):
+        for k, (home, away) in enumerate(jornada):
+            filas.append((inicio + timedelta(days=7 * j, hours=2 * (k % 4)), home, away))
+    fechas, home, away = zip(*filas)
+    home, away = np.array(home), np.array(away)
+    lambda_home, lambda_away = lambdas(strength, home, away)
+    return pd.DataFrame({
+        'date': [fecha.isoformat() for fecha in fechas],
+        'home_team': np.asarray(teams, dtype=object)[home],
+        'away_team': np.asarray(teams, dtype=object)[away],
+        'home_score': rng.poisson(lambda_home),
+        'away_score': rng.poisson(lambda_away),
+    })
+
+
+def generate_events(rng: np.random.Generator, teams: List[str], strength: Dict[str, np.ndarray],
+                    bookmakers: List[str], sport: str, kickoff: datetime) -> List[Dict]:
+    """Próxima jornada en formato de la Odds API: h2h, hándicap y totales para cada casa"""
+    jornada = round_robin(len(teams))[0]
+    home = np.array([h for h, _ in jornada])
+    away = np.array([a for _, a in jornada])
+    matrices = score_matrix(*lambdas(strength, home, away))
+    prob_1x2 = np.column_stack(outcome_probabilities(matrices))
+    prob_over, prob_under = total_goals_probabilities(matrices, 2.5)
+    points = np.where(prob_1x2[:, 0] >= prob_1x2[:, 2], -0.5, 0.5)
+    prob_spread = np.array([handicap_probability(matrices[i:i + 1], points[i])[0] for i in range(len(jornada))])
+    margins = rng.uniform(0.02, 0.08, len(bookmakers))
+
+    def price(prob, margin):
+        ruido = rng.lognormal(0, 0.03, np.shape(prob))
+        return np.round(np.maximum(1 / (np.asarray(prob) * (1 + margin) * ruido), 1.01), 2)
+
+    events = []
+    for i, (h, a) in enumerate(jornada):
+        commence = (kickoff + timedelta(hours=2 * (i % 4))).strftime('%Y-%m-%dT%H:%M:%SZ')
+        home_team, away_team = teams[h], teams[a]
+        books = []
+        for key, margin in zip(bookmakers, margins):
+            p1, px, p2 = price(prob_1x2[i], margin)
+            spread_home, spread_away = price([prob_spread[i], 1 - prob_spread[i]], margin)
+            over, under = price([prob_over[i], prob_under[i]], margin)
+            books.append({
+                'key': key, 'title': key.title(), 'last_update': commence,
+                'markets': [
+                    {'key': 'h2h', 'outcomes': [
+                        {'name': home_team, 'price': float(p1)}, {'name': away_team, 'price': float(p2)},
+                        {'name': 'Draw', 'price': float(px)}]},
+                    {'key': 'spreads', 'outcomes': [
+                        {'name': home_team, 'price': float(spread_home), 'point': float(points[i])},
+                        {'name': away_team, 'price': float(spread_away), 'point': float(-points[i])}]},
+                    {'key': 'totals', 'outcomes': [
+                        {'name': 'Over', 'price': float(over), 'point': 2.5},
+                        {'name': 'Under', 'price': float(under), 'point': 2.5}]},
+                ],
+            })
+        events.append({
+            'id': f"{sport}_{i:03d}", 'sport_key': sport, 'commence_time': commence,
+            'home_team': home_team, 'away_team': away_team, 'bookmakers': books,
+        })
+    return events
+
+
+def generate_dataset(root: str, leagues: int = 1, bookmakers: int = 12, seasons: int = 1,
+                     seed: int = 0) -> Dict[str, str]:
+    """Escribe `odds.json` y `<liga>_<temporada>_matches.csv` sintéticos en `root`.
+
+    Mismo `seed` y tamaño => mismos archivos. Devuelve {liga: sport_key}.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(root, exist_ok=True)
+    keys = (list(BOOKMAKERS) + [f"book{i:02d}" for i in range(bookmakers)])[:bookmakers]
+    usados: set = set()
+    ligas, events = {}, []
+
+    for n in range(leagues):
+        league = f"liga_{n:02d}"
+        sport = f"soccer_synthetic_{n:02d}"
+        teams = team_names(rng, TEAMS_PER_LEAGUE, usados)
+        strength = {'attack': rng.normal(0, 0.2, len(teams)), 'defense': rng.normal(0, 0.2, len(teams))}
+        for season in range(DEFAULT_SEASON - seasons + 1, DEFAULT_SEASON + 1):
+            matches = generate_season(rng, teams, strength, season)
+            matches.to_csv(os.path.join(root, f"{league}_{season}_matches.csv"), index=False)
+        kickoff = datetime(DEFAULT_SEASON + 1, 6, 1, 17, tzinfo=timezone.utc)
+        events.extend(generate_events(rng, teams, strength, keys, sport, kickoff))
+        ligas[league] = sport
+
+    with open(os.path.join(root, "odds.json"), "w") as f:
+        json.dump(events, f)
+    return ligas
+
+
+# ----------------------------
+# 2. ETAPAS MEDIDAS
+# ----------------------------
+def historial_from_matches(matches: pd.DataFrame) -> pd.DataFrame:
+    """Historial en el formato de ValueBetFinder (como `get_historical_data`)"""
+    historial = pd.DataFrame({
+        'fecha': pd.to_datetime(matches['date'], utc=True),
+        'equipo_local': matches['home_team'],
+        'equipo_visitante': matches['away_team'],
+        'goles_local': matches['home_score'],
+        'goles_visitante': matches['away_score'],
+    })
+    historial['resultado'] = np.select(
+        [historial['goles_local'] > historial['goles_visitante'], historial['goles_local'] == historial['goles_visitante']],
+        ['1', 'X'], '2'
+    )
+    return historial
+
+
+def build_stages(root: str, ligas: Dict[str, str], bookmakers: List[str], seasons: int,
+                 cache_dir: str) -> Dict[str, Callable]:
+    """Etapas del pipeline sobre los datos generados; cada una procesa todas las ligas"""
+    state: Dict = {}
+
+    def load_odds():
+        state['table'] = OddsTable.from_json(os.path.join(root, "odds.json"))
+        with open(os.path.join(root, "odds.json")) as f:
+            eventos = json.load(f)
+        state['events'] = {league: [e for e in eventos if e['sport_key'] == sport] for league, sport in ligas.items()}
+
+    def load_history():
+        # Todas las temporadas generadas, concatenadas por liga
+        state['matches'] = {}
+        for league in ligas:
+            frames = [pd.read_csv(os.path.join(root, f"{league}_{season}_matches.csv"))
+                      for season in range(DEFAULT_SEASON - seasons + 1, DEFAULT_SEASON + 1)]
+            state['matches'][league] = pd.concat(frames, ignore_index=True)
+        state['finders'] = {}
+        for league, matches in state['matches'].items():
+            team_resolver(league).register_all(pd.concat([matches['home_team'], matches['away_team']]))
+            vbf = ValueBetFinder()
+            vbf.league = league
+            vbf.fixture_cache = None  # Se mide el modelo, no la caché por partido
+            vbf.historial_data = historial_from_matches(matches)
+            state['finders'][league] = vbf
+        return sum(len(matches) for matches in state['matches'].values())
+
+    def process_odds():
+        for league, vbf in state['finders'].items():
+            vbf.odds_data = state['events'][league]
+            vbf.process_odds()
+
+    def calculate_probabilities():
+        for league, vbf in state['finders'].items():
+            fixtures = [(vbf.normalize_team_name(e['home_team']), vbf.normalize_team_name(e['away_team']))
+                        for e in state['events'][league]]
+            vbf.calculate_slate_probabilities(fixtures)
+
+    def find_value_bets():
+        for vbf in state['finders'].values():
+            vbf.evaluate_value_bets(PARAMETROS)
+
+    def price_index():
+        index = PriceIndex(state['table'], bookmakers)
+        index.is_best()
+        index.beats_consensus()
+        index.arbitrages()
+
+    def filter_bets_find_value_bets():
+        # Caché de modelos vacía y fuera del proyecto: se mide el ajuste en frío
+        root = tempfile.mkdtemp(dir=cache_dir)
+        filter_bets._model_cache = DixonColesCache(root=root)
+        filter_bets._fixture_cache = FixtureCache('dixon_coles', filter_bets._fixture_cache.shape, root=root)
+        for league in ligas:
+            table = OddsTable.from_events(state['events'][league])
+            filter_bets.find_value_bets(table, state['matches'][league], league, PriceIndex(table, bookmakers))
+
+    return {
+        'load_odds': load_odds,
+        'load_history': load_history,
+        'process_odds': process_odds,
+        'calculate_probabilities': calculate_probabilities,
+        'find_value_bets': find_value_bets,
+        'price_index': price_index,
+        'filter_bets.find_value_bets': filter_bets_find_value_bets,
+    }
+
+
+def run_benchmark(root: str, ligas: Dict[str, str], bookmakers: List[str], seasons: int = 1,
+                  repeats: int = 3) -> Dict[str, Dict]:
+    """Mejor tiempo de `repeats` pasadas y pico de memoria (tracemalloc, pasada aparte) por etapa.
+
+    Las etapas que devuelven un entero (filas procesadas) lo guardan en `rows`.
+    """
+    resultados = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stages = build_stages(root, ligas, bookmakers, seasons, cache_dir)
+        for name, stage in stages.items():
+            tiempos = []
+            for _ in range(repeats):
+                inicio = time.perf_counter()
+                filas = stage()
+                tiempos.append(time.perf_counter() - inicio)
+
+            tracemalloc.start()
+            stage()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            resultados[name] = {'seconds': min(tiempos), 'peak_mb': peak / 2 ** 20}
+            if isinstance(filas, int):
+                resultados[name]['rows'] = filas
+    return resultados
+
+
+# ----------------------------
+# 3. LÍNEAS BASE Y REGRESIONES
+# ----------------------------
+def baseline_path(name: str, directory: str = BASELINE_DIR) -> str:
+    return os.path.join(directory, f"baseline_{name}.json")
+
+
+def compare(resultados: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = TOLERANCE) -> List[str]:
+    """Etapas cuyo tiempo o memoria empeoran más de `tolerance` respecto a la línea base"""
+    regresiones = []
+    for stage, actual in resultados.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            if base[metric] > 0 and actual[metric] > base[metric] * (1 + tolerance):
+                regresiones.append(f"{stage} {metric}: {base[metric]:.4g} -> {actual[metric]:.4g}")
+    return regresiones
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de value bets con datos sintéticos")
+    parser.add_argument("--size", choices=list(TAMANOS), default="small", help="Tamaño predefinido")
+    parser.add_argument("--leagues", type=int, default=None, help="Ligas (sustituye al tamaño predefinido)")
+    parser.add_argument("--bookmakers", type=int, default=None, help="Casas de apuestas por partido")
+    parser.add_argument("--seasons", type=int, default=None, help="Temporadas de historial por liga")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador")
+    parser.add_argument("--repeats", type=int, default=3, help="Pasadas por etapa (se usa la mejor)")
+    parser.add_argument("--data-dir", default=None, help="Dónde generar los datos (por defecto un directorio temporal)")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como nueva línea base")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Empeoramiento relativo tolerado")
+    args = parser.parse_args()
+
+    tamano = dict(TAMANOS[args.size])
+    for key in tamano:
+        if getattr(args, key) is not None:
+            tamano[key] = getattr(args, key)
+    nombre = f"{tamano['leagues']}l_{tamano['bookmakers']}b_{tamano['seasons']}s_seed{args.seed}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.data_dir or tmp
+        print(f"🧪 Generando datos sintéticos: {tamano['leagues']} ligas, {tamano['bookmakers']} casas, "
+              f"{tamano['seasons']} temporadas (seed {args.seed})...")
+        ligas = generate_dataset(root, seed=args.seed, **tamano)
+        bookmakers = (list(BOOKMAKERS) + [f"book{i:02d}" for i in range(tamano['bookmakers'])])[:tamano['bookmakers']]
+        resultados = run_benchmark(root, ligas, bookmakers, tamano['seasons'], args.repeats)
+
+    print(f"\n⏱️ Resultados ({nombre}):")
+    for stage, r in resultados.items():
+        filas = f"  {r['rows']:>9} filas" if 'rows' in r else ''
+        print(f"  {stage:<30} {r['seconds'] * 1000:9.1f} ms  {r['peak_mb']:8.1f} MB{filas}")
+
+    path = baseline_path(nombre)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                         'fecha': datetime.now(timezone.utc).isoformat(), **tamano, 'seed': args.seed},
+                'stages': resultados,
+            }, f, indent=2)
+        print(f"\n💾 Línea base guardada en {path}")
+        return 0
+
+    if not os.path.exists(path):
+        print(f"\nℹ️ Sin línea base para {nombre} (usa --save-baseline)")
+        return 0
+
+    with open(path) as f:
+        regresiones = compare(resultados, json.load(f)['stages'], args.tolerance)
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones (tolerancia {args.tolerance:.0%}):")
+        for regresion in regresiones:
+            print(f"  - {regresion}")
+        return 1
+    print(f"\n✅ Sin regresiones frente a {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,62 +1,131 @@
-import requests 
 import pandas as pd
 import os 
-from typing import Dict, List, Optional
-from config.settings import FD_API_KEY, FD_BASE_URL, LEAGUES, DEFAULT_SEASON
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from config.settings import FD_API_KEY, FD_BASE_URL, LEAGUES, DEFAULT_SEASON, FD_CALLS_PER_MINUTE, FD_MAX_WORKERS
+from clients.session import ApiClient
+from storage.history_store import HistoryStore
+from metrics import stage, count
 # from config.settings import API_KEY, SPORT, REGION, MARKETS, BOOKMAKERS, MIN_EDGE
 
-def fetch_matches(competition: str, season: int = DEFAULT_SEASON) -> None:
+def league_name_for(competition: str) -> str:
+    """Nombre de liga configurado para un código de competición (p. ej. 'PD' -> 'la_liga')"""
+    return next((k for k, v in LEAGUES.items() if v == competition), competition)
+
+def parse_matches(data: Dict) -> List[Dict]:
+    """Extrae los partidos finalizados de la respuesta de FootballData.org"""
+    return [
+        {
+            'date': match['utcDate'],
+            'home_team': match['homeTeam']['name'],
+            'away_team': match['awayTeam']['name'],
+            'home_score': match['score']['fullTime']['home'],
+            'away_score': match['score']['fullTime']['away'],
+        }
+        for match in data['matches']
+        if match['status'] == 'FINISHED'
+    ]
+
+_client: Optional[ApiClient] = None
+_client_lock = threading.Lock()
+
+def football_data_client() -> ApiClient:
+    """Sesión compartida (keep-alive, límite de llamadas y reintentos) para FootballData.org"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ApiClient(
+                FD_BASE_URL,
+                headers={'X-Auth-Token': FD_API_KEY}, # Usas la clave de API de FootballData.org para autenticarte
+                calls_per_minute=FD_CALLS_PER_MINUTE
+            )
+        return _client
+
+def sync_matches(competition: str, season: int = DEFAULT_SEASON, store: Optional[HistoryStore] = None,
+                 client: Optional[ApiClient] = None, league_name: Optional[str] = None) -> Tuple[pd.DataFrame, int]:
+    """ Sincroniza el almacén local de una competición y temporada pidiendo a la API
+    solo los partidos posteriores al último guardado.
+
+    Devuelve el historial completo de la liga/temporada y el número de partidos nuevos. """
+
+    store = store or HistoryStore()
+    client = client or football_data_client()
+    league_name = league_name or league_name_for(competition)
+    previous = len(store.load(league_name, season))
+
+    params = {'season': season}
+
+    # Delta: solo desde el día del último partido sincronizado
+    last_date = store.last_match_date(league_name, season)
+    if last_date is not None:
+        params['dateFrom'] = last_date.strftime('%Y-%m-%d')
+        params['dateTo'] = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    response = client.get(f'competitions/{competition}/matches', params=params)
+    response.raise_for_status()  # Lanza un error si la respuesta no es exitosa 
+
+    df = store.append(league_name, season, pd.DataFrame(parse_matches(response.json())))
+    return df, len(df) - previous
+
+def fetch_matches(competition: str, season: int = DEFAULT_SEASON, client: Optional[ApiClient] = None,
+                  league_name: Optional[str] = None) -> Optional[pd.DataFrame]:
     """ Obtiene los partidos finalizados de una competición y temporada determinadas,
-    y los guarda en un archivo CSV.
+    los añade al almacén local y exporta el CSV de la liga si hubo partidos nuevos.
 
     Args:
-    competición: Código de competición (por defecto: "PL" para Premier League)
-    season: Año de la temporada (por defecto: 2023) """
-
-    url = f'{FD_BASE_URL}competitions/{LEAGUES['la_liga']}/matches?season={DEFAULT_SEASON}'
-    headers = {
-        'X-Auth-Token': FD_API_KEY} # Usas la clave de API de FootballData.org para autenticarte
+    competición: Código de competición (por ejemplo: "PD" para La Liga)
+    season: Año de la temporada (por defecto: DEFAULT_SEASON) """
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Lanza un error si la respuesta no es exitosa 
-        data = response.json()
-
-        matches = [
-            {
-                'date': match['utcDate'],
-                'home_team': match['homeTeam']['name'],
-                'away_team': match['awayTeam']['name'],
-                'home_score': match['score']['fullTime']['home'],
-                'away_score': match['score']['fullTime']['away'],
-            }
-            for match in data['matches']
-            if match['status'] == 'FINISHED'
-        ]    
-
-        df = pd.DataFrame(matches)
-
-        #  Convierte la fecha a tipo datetime y ordena
-        df['date'] = pd.to_datetime(df['date'])
-        df.sort_values(by='date', inplace=True)
-
-        # Guardar el DataFrame a un archivo CSV
-        os.makedirs('data', exist_ok=True)
-        league_name = [k for k, v in LEAGUES.items() if v == competition][0]
+        league_name = league_name or league_name_for(competition)
+        with stage('fetch_matches', league=league_name) as info:
+            df, nuevos = sync_matches(competition, season, client=client, league_name=league_name)
+            info.update(season=season, matches=len(df), new_matches=nuevos)
+        count('matches_synced_total', nuevos, league=league_name)
+
+        # Exportar CSV solo si cambió el historial (o si aún no existe)
         csv_path = f'data/{league_name}_{season}_matches.csv'
-        df.to_csv(csv_path, index=False)
-        print(f"✅ Datos de partidos guardados en {csv_path}")
+        if nuevos or not os.path.exists(csv_path):
+            os.makedirs('data', exist_ok=True)
+            with stage('write_matches_csv', league=league_name):
+                df.to_csv(csv_path, index=False)
+            print(f"✅ {nuevos} partidos nuevos, datos guardados en {csv_path}")
+        else:
+            print(f"✅ {league_name} {season} ya estaba actualizado ({len(df)} partidos)")
         return df
 
     except Exception as e:
         print(f"❌ Error al descargar {competition}: {str (e)}")
         return None
     
+def fetch_all_leagues(leagues: Optional[Dict[str, str]] = None, seasons: Optional[List[int]] = None,
+                      max_workers: int = FD_MAX_WORKERS, client: Optional[ApiClient] = None) -> Dict[Tuple[str, int], Optional[pd.DataFrame]]:
+    """ Descarga en paralelo todas las ligas y temporadas configuradas con una sesión compartida.
+    Cada liga/temporada se guarda de forma independiente; un fallo no afecta al resto. """
+
+    leagues = leagues or LEAGUES
+    seasons = seasons or [DEFAULT_SEASON]
+    client = client or football_data_client()
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_matches, league_code, season, client, league_name): (league_name, season)
+            for league_name, league_code in leagues.items()
+            for season in seasons
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
 if __name__ == '__main__':
     
     # Descargar datos para todas la ligas configuradas
-    for league_name, league_code in LEAGUES.items():
-        print(f"\n⏳ Descargando partidos de {league_name}...")
-        fetch_matches(competition=league_code, season=DEFAULT_SEASON)
-        print(f"✅ Partidos de {league_name} descargados y guardados.")
-        print("____________________________________________________________________________________")
\ No newline at end of file
+    print(f"\n⏳ Descargando partidos de {', '.join(LEAGUES)}...")
+    results = fetch_all_leagues()
+    for (league_name, season), df in sorted(results.items()):
+        estado = "✅" if df is not None else "❌"
+        print(f"{estado} {league_name} {season}: {0 if df is None else len(df)} partidos")
+    print("____________________________________________________________________________________")
\ No newline at end of file
@@ -1,12 +1,25 @@
 import json
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
-from typing import List, Dict, Union
-from datetime import datetime, timedelta
-import pytz
-from utils import normalize_team_name, filter_duplicate_bets
-from config.settings import BOOKMAKERS, MIN_EDGE
+from typing import List, Dict, Optional
+from utils import normalize_team_name, team_resolver
+from config.settings import MIN_EDGE, DEFAULT_SEASON
+from models.dixon_coles import DixonColesCache, DixonColesModel, data_version
+from storage.history_store import HistoryStore
+from storage.odds_table import OddsTable
+from storage.price_index import PriceIndex
+from storage.fixture_cache import FixtureCache, config_key
+from metrics import METRICS, stage, count, timed
+from models.poisson import (
+    MAX_GOALS,
+    outcome_probabilities,
+    total_goals_probabilities,
+    handicap_probability,
+    btts_probability
+)
+
+_model_cache = DixonColesCache()  # Ajustes por liga compartidos entre llamadas
+_fixture_cache = FixtureCache('dixon_coles', (MAX_GOALS + 1, MAX_GOALS + 1))  # Matrices de marcador por partido
 
 # ----------------------------
 # 1. CARGAR Y PREPROCESAR DATOS
@@ -14,14 +27,18 @@ from config.settings import BOOKMAKERS, MIN_EDGE
 def load_data():
     """Carga datos de partidos y cuotas con validación robusta"""
     try:
-        with open('data/odds.json') as f:
-            odds_data = json.load(f)
+        # Lectura en streaming a una tabla columnar compacta
+        odds_data = OddsTable.from_json('data/odds.json')
         
-        league_data = pd.read_csv('data/la_liga_2024_matches.csv')
+        # Almacén local columnar; CSV exportado como respaldo
+        league_data = HistoryStore().load('la_liga', DEFAULT_SEASON)
+        if league_data.empty:
+            league_data = pd.read_csv(f'data/la_liga_{DEFAULT_SEASON}_matches.csv')
         league_data['date'] = pd.to_datetime(league_data['date'], errors='coerce')
         league_data = league_data.dropna(subset=['date'])
         
-        # Normalizar nombres
+        # Normalizar nombres (los del historial se dan de alta como canónicos)
+        team_resolver('la_liga').register_all(pd.concat([league_data['home_team'], league_data['away_team']]))
         league_data['home_team'] = league_data['home_team'].apply(normalize_team_name)
         league_data['away_team'] = league_data['away_team'].apply(normalize_team_name)
         
@@ -33,130 +50,165 @@ def load_data():
 # ----------------------------
 # 2. MODELOS DE PROBABILIDAD
 # ----------------------------
-def calculate_h2h_probabilities(home_team: str, away_team: str, league_data: pd.DataFrame) -> Dict[str, float]:
-    """Calcula probabilidades para el mercado 1X2 usando modelo Dixon-Coles simplificado"""
-    recent_matches = get_recent_matches(league_data, days=180)
-    
-    # Obtener fuerza ofensiva/defensiva
-    home_attack = recent_matches[recent_matches['home_team'] == home_team]['home_score'].mean()
-    home_defense = recent_matches[recent_matches['home_team'] == home_team]['away_score'].mean()
-    away_attack = recent_matches[recent_matches['away_team'] == away_team]['away_score'].mean()
-    away_defense = recent_matches[recent_matches['away_team'] == away_team]['home_score'].mean()
-    
-    # Ajustar por promedio general (evitar divisiones por cero)
-    avg_home = league_data['home_score'].mean()
-    avg_away = league_data['away_score'].mean()
-    
-    home_str = (home_attack / avg_home) * (away_defense / avg_away) * avg_home
-    away_str = (away_attack / avg_away) * (home_defense / avg_home) * avg_away
-    
-    # Normalizar probabilidades
-    total = home_str + away_str + 0.3 * (home_str + away_str)  # Empate como 30% del total
-    return {
-        home_team: max(min(home_str / total, 0.85), 0.15),
-        away_team: max(min(away_str / total, 0.85), 0.15),
-        'draw': max(min(0.3 * (home_str + away_str) / total, 0.35), 0.05)
-    }
+def fit_league_model(league_data: pd.DataFrame, league: str = 'la_liga') -> DixonColesModel:
+    """Modelo Dixon-Coles de la liga (reutiliza el ajuste si los partidos no cambiaron)"""
+    return _model_cache.get(league, league_data)
 
-def calculate_over_under_probability(home_team: str, away_team: str, league_data: pd.DataFrame, line: float = 2.5) -> Dict[str, float]:
-    """Modelo Poisson para Over/Under"""
-    recent_matches = get_recent_matches(league_data, days=180)
+def fixture_score_matrices(league_data: pd.DataFrame, league: str, home_teams: List[str], away_teams: List[str]) -> np.ndarray:
+    """Matrices de marcador de cada partido; el modelo solo se ajusta y evalúa para los que no están en caché"""
+    config = config_key(model='dixon_coles', decay=_model_cache.decay, max_goals=MAX_GOALS)
+    version = data_version(league_data.dropna(subset=['home_score', 'away_score']))
+    keys = [FixtureCache.key(home, away, config, version) for home, away in zip(home_teams, away_teams)]
+
+    def compute(posiciones):
+        with stage('fit_league_model', league=league):
+            model = fit_league_model(league_data, league)
+        return model.score_matrix([home_teams[i] for i in posiciones], [away_teams[i] for i in posiciones])
+
+    return _fixture_cache.lookup(keys, compute)
+
+def calculate_outcome_probabilities(matrix: np.ndarray, table: OddsTable, event: int) -> np.ndarray:
+    """Probabilidad del modelo para cada fila (resultado) de un evento, leída de la matriz compartida"""
+    rows = table.event_rows(event)
+    market = table.market[rows]
+    outcome = table.outcome[rows]
+    point = table.point[rows].astype(float)
+    probs = np.full(len(market), np.nan)
     
-    # Lambda (promedio de goles)
-    home_avg = recent_matches[recent_matches['home_team'] == home_team]['home_score'].mean()
-    away_avg = recent_matches[recent_matches['away_team'] == away_team]['away_score'].mean()
-    total_avg = (home_avg + away_avg) * 0.95  # Factor de ajuste
+    batch = matrix[None, :, :]
+    home = outcome == table.code('outcome', table.home_teams[event])
+    away = outcome == table.code('outcome', table.away_teams[event])
     
-    # Calcular probabilidades
-    prob_over = 1 - poisson.cdf(line, total_avg)
-    return {
-        f"over_{line}": prob_over,
-        f"under_{line}": 1 - prob_over
-    }
-
-def calculate_btts_probability(home_team: str, away_team: str, league_data: pd.DataFrame) -> Dict[str, float]:
-    """Probabilidad de Both Teams to Score (BTTS)"""
-    recent_matches = get_recent_matches(league_data, days=180)
+    # 1X2
+    is_h2h = market == table.code('market', 'h2h')
+    if is_h2h.any():
+        prob_home, prob_draw, prob_away = (p[0] for p in outcome_probabilities(batch))
+        probs[is_h2h & home] = prob_home
+        probs[is_h2h & away] = prob_away
+        probs[is_h2h & (outcome == table.code('outcome', 'Draw'))] = prob_draw
+    
+    # Over/Under en cualquier línea
+    is_totals = market == table.code('market', 'totals')
+    for line in np.unique(point[is_totals]):
+        prob_over, prob_under = (p[0] for p in total_goals_probabilities(batch, line))
+        at_line = is_totals & (point == line)
+        probs[at_line & (outcome == table.code('outcome', 'Over'))] = prob_over
+        probs[at_line & (outcome == table.code('outcome', 'Under'))] = prob_under
     
-    # Filtrar partidos relevantes
-    home_games = recent_matches[
-        (recent_matches['home_team'] == home_team) | 
-        (recent_matches['away_team'] == home_team)
-    ]
-    away_games = recent_matches[
-        (recent_matches['home_team'] == away_team) | 
-        (recent_matches['away_team'] == away_team)
-    ]
+    # Hándicap: el visitante es el local con la matriz transpuesta
+    is_spreads = market == table.code('market', 'spreads')
+    for line in np.unique(point[is_spreads]):
+        at_line = is_spreads & (point == line)
+        probs[at_line & home] = handicap_probability(batch, line)[0]
+        probs[at_line & away] = handicap_probability(batch.transpose(0, 2, 1), line)[0]
     
-    # Calcular frecuencia de BTTS
-    home_btts = (home_games['home_score'] > 0) & (home_games['away_score'] > 0)
-    away_btts = (away_games['home_score'] > 0) & (away_games['away_score'] > 0)
+    # Ambos marcan
+    is_btts = market == table.code('market', 'btts')
+    if is_btts.any():
+        prob_yes = btts_probability(batch)[0]
+        probs[is_btts & (outcome == table.code('outcome', 'Yes'))] = prob_yes
+        probs[is_btts & (outcome == table.code('outcome', 'No'))] = 1 - prob_yes
     
-    prob_yes = np.mean([home_btts.mean(), away_btts.mean()])
-    return {'yes': prob_yes, 'no': 1 - prob_yes}
+    return probs
 
 # ----------------------------
 # 3. DETECCIÓN DE VALUE BETS
 # ----------------------------
-def find_value_bets(odds_data: List[Dict], league_data: pd.DataFrame) -> List[Dict]:
-    """Busca value bets en todos los mercados disponibles"""
-    value_bets = []
+@timed('find_value_bets')
+def find_value_bets(odds_data: OddsTable, league_data: pd.DataFrame, league: str = 'la_liga',
+                    index: Optional[PriceIndex] = None, min_consensus_edge: Optional[float] = None,
+                    errors: Optional[List[Dict]] = None) -> List[Dict]:
+    """Busca value bets en todos los mercados disponibles, una por selección a su mejor cuota.
+
+    Con `min_consensus_edge` la cuota además debe superar la probabilidad de consenso
+    del mercado (sin margen) en ese valor esperado. Con `errors` un partido que falla
+    se omite y se anota en esa lista ({'liga', 'partido', 'etapa', 'error'}) en lugar de
+    interrumpir la búsqueda; si falla el ajuste del modelo se anotan todos los partidos
+    de la liga con `etapa` 'modelo' y no se devuelve ninguna apuesta.
+    """
+    index = index or PriceIndex(odds_data)
+    n_events = len(odds_data.event_ids)
     
-    for match in odds_data:
-        home_team = normalize_team_name(match['home_team'])
-        away_team = normalize_team_name(match['away_team'])
-        
-        # Calcular todas las probabilidades
-        probs = {
-            'h2h': calculate_h2h_probabilities(home_team, away_team, league_data),
-            'totals': calculate_over_under_probability(home_team, away_team, league_data),
-            'btts': calculate_btts_probability(home_team, away_team, league_data)
-        }
-        
-        for bookmaker in match['bookmakers']:
-            if bookmaker['title'] not in BOOKMAKERS:
-                continue
-                
-            for market in bookmaker['markets']:
-                market_key = market['key']
-                if market_key not in probs:
-                    continue
-                    
-                for outcome in market['outcomes']:
-                    process_outcome(outcome, market_key, home_team, away_team, probs[market_key], bookmaker['title'], value_bets)
+    def anotar(event: int, etapa: str, e: Exception) -> None:
+        errors.append({'liga': league, 'partido': f"{odds_data.home_teams[event]} - {odds_data.away_teams[event]}",
+                       'etapa': etapa, 'error': f"{type(e).__name__}: {e}"})
+        count('fixture_errors_total', league=league)
+    
+    # Una sola distribución de goles por partido para todos los mercados y casas (en caché por versión del historial)
+    try:
+        matrices = fixture_score_matrices(
+            league_data, league,
+            [normalize_team_name(team) for team in odds_data.home_teams],
+            [normalize_team_name(team) for team in odds_data.away_teams]
+        )
+    except Exception as e:
+        if errors is None:
+            raise
+        # Sin modelo no se evalúa ningún partido de la liga
+        for event in range(n_events):
+            anotar(event, 'modelo', e)
+        return []
+    real_prob = np.full(len(odds_data), np.nan)
+    for event in range(n_events):
+        try:
+            real_prob[odds_data.event_rows(event)] = calculate_outcome_probabilities(matrices[event], odds_data, event)
+        except Exception as e:
+            if errors is None:
+                raise
+            anotar(event, 'probabilidades', e)
+    
+    # Evaluación vectorizada de las mejores cuotas de cada selección (casas de BOOKMAKERS)
+    odds = odds_data.price
+    with np.errstate(divide='ignore', invalid='ignore'):
+        implied_prob = np.where(odds > 1, 1 / odds, np.nan)
+        edge = real_prob - implied_prob
+        candidates = index.allowed & index.is_best() & (edge > MIN_EDGE) & (real_prob >= 0.30)  # Umbral mínimo de probabilidad
+    if min_consensus_edge is not None:
+        candidates &= index.beats_consensus(min_consensus_edge)
     
+    value_bets = []
+    for i in np.flatnonzero(candidates):
+        value_bets.append(build_value_bet(odds_data, i, real_prob[i], implied_prob[i], edge[i], index))
+    count('odds_rows_processed_total', len(odds_data), league=league)
+    count('bets_emitted_total', len(value_bets), league=league, source='filter_bets')
     return value_bets
 
-def process_outcome(outcome: Dict, market_key: str, home_team: str, away_team: str, probs: Dict, bookmaker: str, value_bets: List):
-    """Evalúa si una cuota es value bet"""
-    odds = outcome.get('price', 0)
-    if odds <= 1:
-        return
+def build_value_bet(table: OddsTable, row: int, real_prob: float, implied_prob: float, edge: float,
+                    index: Optional[PriceIndex] = None) -> Dict:
+    """Construye el registro de una value bet a partir de una fila de la tabla"""
+    event = table.event[row]
+    home_team = normalize_team_name(table.home_teams[event])
+    away_team = normalize_team_name(table.away_teams[event])
+    market_key = table.markets[table.market[row]]
+    name = table.outcomes[table.outcome[row]]
+    point = table.point[row]
+    odds = float(table.price[row])
     
-    # Mapear nombres de outcomes a claves de probabilidades
+    # Mapear nombres de outcomes a claves de selección
     selection_map = {
-        'h2h': lambda x: normalize_team_name(x),
-        'totals': lambda x: x.lower().replace(" ", "_"),
+        'h2h': lambda x: 'draw' if x.lower() == 'draw' else normalize_team_name(x),
+        'totals': lambda x: f"{x.lower()}_{point}",
+        'spreads': lambda x: f"{normalize_team_name(x)}_{point}",
         'btts': lambda x: x.lower()
     }
     
-    selection = selection_map[market_key](outcome['name'])
-    implied_prob = 1 / odds
-    real_prob = probs.get(selection, 0)
-    edge = real_prob - implied_prob
-    
-    if edge > MIN_EDGE and real_prob >= 0.30:  # Umbral mínimo de probabilidad
-        value_bets.append({
-            'match': f"{home_team} vs {away_team}",
-            'market': market_key,
-            'selection': selection,
-            'bookmaker': bookmaker,
-            'odds': odds,
-            'edge': round(edge, 4),
-            'implied_prob': round(implied_prob, 4),
-            'real_prob': round(real_prob, 4),
-            'expected_value': round((odds * real_prob) - 1, 4)  # EV = (Odds * Prob) - 1
-        })
+    bet = {
+        'match': f"{home_team} vs {away_team}",
+        'market': market_key,
+        'selection': selection_map[market_key](name),
+        'bookmaker': table.bookmaker_titles[table.bookmaker[row]],
+        'odds': odds,
+        'edge': round(float(edge), 4),
+        'implied_prob': round(float(implied_prob), 4),
+        'real_prob': round(float(real_prob), 4),
+        'expected_value': round((odds * float(real_prob)) - 1, 4)  # EV = (Odds * Prob) - 1
+    }
+    if index is not None:
+        # Referencias del mercado: consenso sin margen y casa sharp (None si no hay libro completo)
+        selection = index.selection[row]
+        for key, values in (('consensus_prob', index.consensus), ('sharp_prob', index.sharp)):
+            bet[key] = round(float(values[selection]), 4) if np.isfinite(values[selection]) else None
+    return bet
 
 # ----------------------------
 # 4. EJECUCIÓN PRINCIPAL
@@ -167,8 +219,18 @@ if __name__ == "__main__":
         odds_data, league_data = load_data()
         
         print("🔍 Analizando value bets...")
-        value_bets = find_value_bets(odds_data, league_data)
-        final_bets = filter_duplicate_bets(value_bets)
+        index = PriceIndex(odds_data)
+        errores = []
+        final_bets = find_value_bets(odds_data, league_data, index=index, errors=errores)
+        if errores:
+            with open('data/value_bets_errors.json', 'w') as f:
+                json.dump(errores, f, indent=2, ensure_ascii=False)
+            print(f"⚠️ {len(errores)} partidos omitidos por errores (detalle en 'data/value_bets_errors.json')")
+        
+        arbitrajes = index.arbitrages()
+        if not arbitrajes.empty:
+            print(f"💰 {arbitrajes['partido'].nunique()} posibles arbitrajes entre casas:")
+            print(arbitrajes[['partido', 'market', 'outcome', 'best_bookmaker', 'best_price', 'stake_share', 'arbitrage_margin']].to_string(index=False))
         
         if not final_bets:
             print("⚠️ No se encontraron value bets. Revisa:")
@@ -179,6 +241,7 @@ if __name__ == "__main__":
             with open('data/value_bets.json', 'w') as f:
                 json.dump(final_bets, f, indent=2)
             print("📊 Resultados guardados en 'data/value_bets.json'")
+        METRICS.write()
             
     except Exception as e:
         print(f"❌ Error crítico: {str(e)}")
\ No newline at end of file
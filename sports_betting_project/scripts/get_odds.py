@@ -1,26 +1,31 @@
-import requests
+import argparse
 import json 
-from config.settings import API_KEY, SPORT, REGION, MARKETS, BOOKMAKERS
+import os
+from config.settings import ODDS_CACHE_TTL
+from clients.odds_api import fetch_odds
+from metrics import stage, count
 
 
-def get_odds():
-     """Obtiene las cuotas de la API y las guarda en un archivo JSON."""
-     url = f"https://api.the-odds-api.com/v4/sports/{SPORT}/odds/?regions={REGION}&markets={','.join(MARKETS)}&bookmakers={','.join(BOOKMAKERS)}&apiKey={API_KEY}"
-     response = requests.get(url)
-
-     if response.status_code == 200:
-        data = response.json()
+def get_odds(force_refresh: bool = False, ttl: float = ODDS_CACHE_TTL):
+     """Obtiene las cuotas (caché local o API) y las guarda en un archivo JSON."""
+     with stage('get_odds') as info:
+        data = fetch_odds(ttl=ttl, force_refresh=force_refresh)
+        info['events'] = 0 if data is None else len(data)
 
+     if data is not None:
+        count('odds_events_total', len(data))
         #Guardar en un archivo JSON
         
-        with open(r"data\odds.json", "w") as file:
-            json.dump(data, file, indent=4)
+        with stage('write_odds_json'):
+            with open(os.path.join("data", "odds.json"), "w") as file:
+                json.dump(data, file, indent=4)
         
-        print("✅ Cuotas guardadas en 'data\\odds.json'")
+        print("✅ Cuotas guardadas en 'data/odds.json'")
         return data
 
-     else:
-        print(f"❌ Error al obtener cuotas: {response.status_code}")
-
 if __name__ == "__main__":
-    get_odds()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Descarga las cuotas de la Odds API")
+    parser.add_argument("--refresh", action="store_true", help="Ignora la caché local y consulta la API")
+    parser.add_argument("--ttl", type=float, default=ODDS_CACHE_TTL, help="Segundos de vigencia de la caché")
+    args = parser.parse_args()
+    get_odds(force_refresh=args.refresh, ttl=args.ttl)
\ No newline at end of file
@@ -0,0 +1,181 @@
+import argparse
+import json
+import time
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from config.settings import LEAGUES, LIVE_POLL_INTERVAL
+from clients.odds_api import fetch_odds
+from scripts.value_bet_finder import ValueBetFinder, PARAMETROS, MERCADOS, score_value_bets
+
+CLAVE = ['Partido', 'Casa', 'Mercado']  # Identidad de una cuota entre snapshots
+
+
+class LiveValueBetMonitor:
+    """Sondea las odds periódicamente y re-evalúa solo las cuotas que cambiaron.
+
+    Cada snapshot se compara con el anterior por (partido, casa, mercado); las
+    probabilidades del modelo se cachean por partido mientras el historial no
+    cambie, así el coste de cada sondeo depende del número de cambios y no del
+    tamaño de la jornada. Las value bets que aparecen o desaparecen en cada nivel
+    se emiten como eventos.
+    """
+
+    def __init__(self, vbf: ValueBetFinder, niveles: Optional[Dict] = None,
+                 on_event: Optional[Callable[[Dict], None]] = None):
+        self.vbf = vbf
+        self.niveles = PARAMETROS if niveles is None else niveles
+        self.on_event = on_event or print_event
+
+        self._prices: Optional[pd.Series] = None  # Cuotas del último snapshot
+        self._active: Dict[tuple, Dict] = {}       # Value bets vigentes por clave
+        self._model: Dict[str, tuple] = {}         # Partido -> (probabilidades, confianza)
+        self._stats = None                         # Índice con el que se calculó la caché
+
+    def _model_for(self, partidos) -> Dict[str, tuple]:
+        """Salidas del modelo por partido, calculando solo los que no están en caché"""
+        if self._stats is not self.vbf.team_stats:
+            # Historial recargado: el modelo cacheado ya no es válido
+            self._model = {}
+            self._stats = self.vbf.team_stats
+
+        nuevos = [partido for partido in partidos if partido not in self._model]
+        if nuevos:
+            probs, confidence = self.vbf.model_outputs(nuevos)
+            for i, partido in enumerate(nuevos):
+                self._model[partido] = (probs[i], confidence[i])
+        return self._model
+
+    def process_snapshot(self, odds_data) -> List[Dict]:
+        """Procesa un snapshot de odds y devuelve los eventos generados"""
+        self.vbf.odds_data = odds_data
+        odds_df = self.vbf.process_odds()
+        if odds_df.empty:
+            current = pd.DataFrame(columns=['Fecha'] + CLAVE + ['Odd'])
+        else:
+            current, _ = self.vbf.odds_long(odds_df)
+            current = current.astype({'Partido': str, 'Casa': str})
+        current = current.set_index(CLAVE)
+        prices = current['Odd']
+
+        # Diferencias con el snapshot anterior
+        if self._prices is None:
+            changed = current
+            removed = []
+        else:
+            previous = self._prices.reindex(prices.index)
+            changed = current[previous.isna().to_numpy() | (previous.to_numpy() != prices.to_numpy())]
+            removed = self._prices.index.difference(prices.index)
+        self._prices = prices
+
+        eventos = []
+        for key in removed:
+            if key in self._active:
+                registro = self._active.pop(key)
+                eventos.append(self._event('desaparece', registro, registro['niveles'], 'cuota retirada'))
+
+        if len(changed):
+            eventos.extend(self._evaluate_changes(changed.reset_index()))
+
+        for evento in eventos:
+            self.on_event(evento)
+        return eventos
+
+    def _evaluate_changes(self, changed: pd.DataFrame) -> List[Dict]:
+        """Evalúa solo las cuotas nuevas o modificadas con el modelo cacheado"""
+        model = self._model_for(changed['Partido'].unique())
+        market = changed['Mercado'].map({code: i for i, (_, code) in enumerate(MERCADOS)}).to_numpy()
+        changed['Prob. Real'] = [model[partido][0][j] for partido, j in zip(changed['Partido'], market)]
+        changed['Confianza'] = [model[partido][1][j] for partido, j in zip(changed['Partido'], market)]
+
+        evaluacion = score_value_bets(changed, self.niveles)
+
+        eventos = []
+        for row in evaluacion.to_dict('records'):
+            key = (row['Partido'], row['Casa'], row['Mercado'])
+            niveles_actuales = {nivel for nivel in self.niveles if row[nivel]}
+            anterior = self._active.get(key)
+            niveles_previos = set(anterior['niveles']) if anterior else set()
+
+            registro = self._record(row, niveles_actuales)
+            if niveles_actuales - niveles_previos:
+                eventos.append(self._event('aparece', registro, sorted(niveles_actuales - niveles_previos)))
+            if niveles_previos - niveles_actuales:
+                eventos.append(self._event('desaparece', registro, sorted(niveles_previos - niveles_actuales), 'cambio de cuota'))
+
+            if niveles_actuales:
+                self._active[key] = registro
+            else:
+                self._active.pop(key, None)
+        return eventos
+
+    @staticmethod
+    def _record(row: Dict, niveles) -> Dict:
+        return {
+            'fecha': row['Fecha'],
+            'partido': row['Partido'],
+            'casa': row['Casa'],
+            'mercado': row['Mercado'],
+            'odd': float(row['Odd']),
+            'prob_real': float(row['Prob. Real']),
+            'edge': float(row['Edge']),
+            'valor_esperado': float(row['Valor Esperado']),
+            'confianza': float(row['Confianza']),
+            'niveles': sorted(niveles),
+        }
+
+    @staticmethod
+    def _event(tipo: str, registro: Dict, niveles: List[str], motivo: Optional[str] = None) -> Dict:
+        evento = {'tipo': tipo, 'niveles': niveles, 'ts': datetime.now(timezone.utc).isoformat(), 'apuesta': registro}
+        if motivo:
+            evento['motivo'] = motivo
+        return evento
+
+    @property
+    def active_bets(self) -> List[Dict]:
+        """Value bets vigentes tras el último sondeo"""
+        return list(self._active.values())
+
+    def poll(self, force_refresh: bool = False) -> List[Dict]:
+        """Un ciclo de sondeo: obtiene las odds (respetando la caché) y procesa el snapshot"""
+        odds_data = fetch_odds(ttl=0 if force_refresh else LIVE_POLL_INTERVAL, force_refresh=force_refresh)
+        if odds_data is None:
+            return []
+        return self.process_snapshot(odds_data)
+
+    def run(self, interval: float = LIVE_POLL_INTERVAL, max_polls: Optional[int] = None) -> None:
+        """Bucle de sondeo hasta `max_polls` ciclos o Ctrl+C"""
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                inicio = time.monotonic()
+                eventos = self.poll()
+                polls += 1
+                print(f"🔁 Sondeo {polls}: {len(eventos)} eventos, {len(self._active)} value bets activas "
+                      f"({time.monotonic() - inicio:.2f}s)")
+                if max_polls is None or polls < max_polls:
+                    time.sleep(max(0.0, interval - (time.monotonic() - inicio)))
+        except KeyboardInterrupt:
+            print("\n⏹️ Monitor detenido")
+
+
+def print_event(evento: Dict) -> None:
+    """Emisor por defecto: una línea JSON por evento"""
+    print(json.dumps(evento, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor de value bets en vivo")
+    parser.add_argument("--interval", type=float, default=LIVE_POLL_INTERVAL, help="Segundos entre sondeos")
+    parser.add_argument("--polls", type=int, default=None, help="Número máximo de sondeos")
+    args = parser.parse_args()
+
+    vbf = ValueBetFinder()
+    liga = list(LEAGUES.values())[0]
+    if not vbf.get_historical_data(liga):
+        raise SystemExit(1)
+
+    LiveValueBetMonitor(vbf).run(interval=args.interval, max_polls=args.polls)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from config.settings import LEAGUES, LEAGUE_SPORTS, SPORT, ODDS_CACHE_TTL, METRICS_DIR
+from metrics import METRICS, configure_logging, count, enable_profiling, stage
+
+# pandas, NumPy y el modelo solo se cargan en `run`; `odds` y `show` arrancan sin ellos
+if TYPE_CHECKING:
+    import pandas as pd
+    from storage.compact_history import CompactHistory
+
+# Códigos de salida para cron / contenedores
+EXIT_OK = 0       # Todas las ligas procesadas
+EXIT_PARTIAL = 1  # Alguna liga falló; el resto se guardó
+EXIT_FAILED = 2   # Ninguna liga pudo procesarse
+
+OUTPUT_PATH = os.path.join("data", "value_bets.jsonl")
+SUMMARY_PATH = os.path.join("data", "run_summary.json")
+
+
+# Historial compartido por los procesos del pool: cada uno lo abre con mmap al arrancar
+_history: Optional['CompactHistory'] = None
+
+
+def league_summary(league: str, niveles: Dict) -> Dict:
+    """Resumen inicial de una liga (se completa al descargar y al evaluar)"""
+    return {'liga': league, 'estado': 'ok', 'apuestas': 0, 'niveles': {nivel: 0 for nivel in niveles}}
+
+
+def fetch_league(league: str, code: str, force_refresh: bool = False) -> Tuple[Optional[List], Optional['pd.DataFrame'], Dict]:
+    """Cuotas e historial de una liga, en el proceso principal (cachés, cuota de la API y límite de llamadas).
+
+    Devuelve (eventos, historial, resumen); si falta algo los dos primeros son None
+    y el resumen lleva el estado y, si lo hay, el error.
+    """
+    from scripts.value_bet_finder import ValueBetFinder
+
+    resumen = {'estado': 'ok'}
+    try:
+        vbf = ValueBetFinder()
+        if not vbf.get_odds(force_refresh=force_refresh, sport=LEAGUE_SPORTS.get(league, SPORT)):
+            resumen['estado'] = 'sin_cuotas'
+            return None, None, resumen
+        if not vbf.get_historical_data(code):
+            resumen['estado'] = 'sin_historial'
+            return None, None, resumen
+        return vbf.odds_data, vbf.historial_data, resumen
+    except Exception as e:
+        resumen['estado'] = 'error'
+        resumen['error'] = f"{type(e).__name__}: {e}"
+        return None, None, resumen
+
+
+def evaluate_league(league: str, odds_data: List, historial: 'pd.DataFrame',
+                    niveles: Optional[Dict] = None) -> Tuple[Optional['pd.DataFrame'], Dict]:
+    """Evalúa todos los niveles de una liga con cuotas e historial ya cargados (sin red ni disco compartido).
+
+    Devuelve las value bets (una fila por nivel que cumplen, con 'Liga' y 'Nivel')
+    y el resumen de la evaluación; si algo falla las apuestas son None y el resumen
+    lleva el estado y el error.
+    """
+    import pandas as pd
+    from scripts.value_bet_finder import ValueBetFinder, PARAMETROS, select_value_bets
+
+    niveles = PARAMETROS if niveles is None else niveles
+    resumen = {'estado': 'ok', 'apuestas': 0, 'niveles': {nivel: 0 for nivel in niveles}}
+    try:
+        vbf = ValueBetFinder()
+        vbf.use_history(historial, league)
+        vbf.odds_data = odds_data
+        resumen['cuotas'] = len(vbf.odds_table)
+        resumen['partidos_historial'] = len(historial)
+        evaluacion = vbf.evaluate_value_bets(niveles)
+
+        apuestas = []
+        for nivel in niveles:
+            value_bets = select_value_bets(evaluacion, nivel) if evaluacion is not None else None
+            if value_bets is not None:
+                apuestas.append(value_bets.assign(Liga=league, Nivel=nivel))
+                resumen['niveles'][nivel] = len(value_bets)
+                count('bets_emitted_total', len(value_bets), league=league, nivel=nivel)
+        bets = pd.concat(apuestas, ignore_index=True) if apuestas else pd.DataFrame()
+        resumen['apuestas'] = len(bets)
+        return bets, resumen
+
+    except Exception as e:
+        resumen['estado'] = 'error'
+        resumen['error'] = f"{type(e).__name__}: {e}"
+        return None, resumen
+
+
+def finish_league(resumen: Dict, segundos: float) -> None:
+    """Cierra el resumen de una liga con su duración y registra sus métricas"""
+    resumen['segundos'] = round(segundos, 3)
+    METRICS.observe('league_seconds', resumen['segundos'], league=resumen['liga'])
+    count('league_runs_total', league=resumen['liga'], estado=resumen['estado'])
+
+
+def _init_worker(history_path: str) -> None:
+    """Abre el historial compartido una vez por proceso, con mmap (sin copiarlo ni serializarlo)"""
+    global _history
+    from storage.compact_history import CompactHistory
+    _history = CompactHistory.load(history_path)
+
+
+def _evaluate_shard(league: str, odds_data: List, niveles: Dict) -> Tuple[Optional['pd.DataFrame'], Dict, Dict, float]:
+    """Tarea del pool: evalúa una liga con sus filas del historial compartido.
+
+    Devuelve además las métricas del proceso para esta tarea y su duración, que el
+    proceso principal acumula.
+    """
+    from utils import team_resolver
+
+    METRICS.reset()
+    inicio = time.perf_counter()
+    historial = _history.to_frame(_history.league_rows(league))
+    # Con 'spawn' el proceso no hereda el resolvedor: los nombres del historial son los canónicos
+    team_resolver(league).register_all(list(historial['equipo_local']) + list(historial['equipo_visitante']))
+    bets, resumen = evaluate_league(league, odds_data, historial, niveles)
+    return bets, resumen, METRICS.snapshot(), time.perf_counter() - inicio
+
+
+def evaluate_leagues(datos: Dict[str, Tuple[List, 'pd.DataFrame']], niveles: Dict,
+                     workers: Optional[int] = None) -> Dict[str, Tuple[Optional['pd.DataFrame'], Dict, float]]:
+    """Evalúa cada liga (cuotas, historial) en un pool de procesos, una liga por tarea.
+
+    Los historiales se escriben una vez en un `CompactHistory` temporal que cada
+    proceso abre con mmap. Con un solo proceso (o una sola liga) todo se hace aquí.
+    Devuelve, por liga, (value bets, resumen de la evaluación, segundos).
+    """
+    workers = min(workers or os.cpu_count() or 1, len(datos))
+    resultados = {}
+    if workers <= 1:
+        for league, (odds_data, historial) in datos.items():
+            inicio = time.perf_counter()
+            bets, resumen = evaluate_league(league, odds_data, historial, niveles)
+            resultados[league] = bets, resumen, time.perf_counter() - inicio
+        return resultados
+
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+    from storage.compact_history import CompactHistory
+
+    with tempfile.TemporaryDirectory(prefix='historial_') as path:
+        historiales = [historial.assign(liga=league) for league, (_, historial) in datos.items()]
+        CompactHistory.from_frame(pd.concat(historiales, ignore_index=True)).save(path)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+            futures = {league: pool.submit(_evaluate_shard, league, odds_data, niveles)
+                       for league, (odds_data, _) in datos.items()}
+            for league, future in futures.items():
+                try:
+                    bets, resumen, metricas, segundos = future.result()
+                    METRICS.merge(metricas)
+                except Exception as e:
+                    # El proceso murió o la tarea no se pudo enviar: la liga falla, el resto sigue
+                    bets, resumen, segundos = None, {'estado': 'error', 'error': f"{type(e).__name__}: {e}", 'etapa': 'proceso'}, 0.0
+                resultados[league] = bets, resumen, segundos
+    return resultados
+
+
+def write_jsonl(bets: List['pd.DataFrame'], path: str) -> int:
+    """Guarda todas las value bets en un único archivo JSON lines (escritura atómica)"""
+    import pandas as pd
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    frames = [df for df in bets if not df.empty]
+    tabla = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if not tabla.empty:
+            tabla = tabla.astype({col: str for col in ('Partido', 'Casa') if col in tabla})
+            tabla.to_json(f, orient='records', lines=True, force_ascii=False)
+    os.replace(tmp_path, path)
+    return len(tabla)
+
+
+def run(leagues: Optional[Dict[str, str]] = None, niveles: Optional[Dict] = None, output: str = OUTPUT_PATH,
+        summary_path: str = SUMMARY_PATH, force_refresh: bool = False,
+        metrics_dir: Optional[str] = METRICS_DIR, workers: Optional[int] = None) -> Tuple[int, Dict]:
+    """Ejecución completa sin interacción: todas las ligas y niveles, una salida consolidada y un resumen.
+
+    Cuotas e historiales se descargan aquí, liga a liga; la evaluación se reparte
+    por ligas entre `workers` procesos (por defecto todos los núcleos) y se une en
+    el orden de `leagues`, así que la salida no depende de qué proceso acabe antes.
+    Los fallos quedan en la lista 'errores' del resumen. Con `metrics_dir` deja
+    además las métricas de la ejecución (textfile de Prometheus y JSON).
+    """
+    from scripts.value_bet_finder import PARAMETROS
+
+    leagues = LEAGUES if leagues is None else leagues
+    niveles = PARAMETROS if niveles is None else niveles
+    inicio = datetime.now(timezone.utc)
+    reloj = time.perf_counter()
+
+    ligas, datos, descarga_segundos = {}, {}, {}
+    for league, code in leagues.items():
+        print(f"\n⚽ {league} ({code})")
+        inicio_liga = time.perf_counter()
+        ligas[league] = league_summary(league, niveles)
+        odds_data, historial, descarga = fetch_league(league, code, force_refresh)
+        ligas[league].update(descarga)
+        if historial is not None:
+            datos[league] = odds_data, historial
+        descarga_segundos[league] = time.perf_counter() - inicio_liga
+
+    evaluaciones = evaluate_leagues(datos, niveles, workers) if datos else {}
+
+    # Unión determinista: orden de la configuración, no de finalización
+    bets, errores = [], []
+    for league in leagues:
+        resumen = ligas[league]
+        segundos = descarga_segundos[league]
+        if league in evaluaciones:
+            league_bets, evaluado, evaluacion_segundos = evaluaciones[league]
+            resumen.update(evaluado)
+            segundos += evaluacion_segundos
+            if league_bets is not None:
+                bets.append(league_bets)
+        etapa = resumen.pop('etapa', 'evaluacion' if league in datos else 'descarga')
+        if resumen['estado'] != 'ok':
+            errores.append({'liga': league, 'etapa': etapa, 'estado': resumen['estado'],
+                            'error': resumen.get('error', resumen['estado'])})
+        finish_league(resumen, segundos)
+    ligas = list(ligas.values())
+
+    correctas = sum(resumen['estado'] == 'ok' for resumen in ligas)
+    if correctas == len(ligas) and ligas:
+        exit_code = EXIT_OK
+    elif correctas:
+        exit_code = EXIT_PARTIAL
+    else:
+        exit_code = EXIT_FAILED
+
+    total = 0
+    if correctas:
+        with stage('write_output') as info:
+            total = write_jsonl(bets, output)
+            info['bets'] = total
+    summary = {
+        'inicio': inicio.isoformat(),
+        'segundos': round(time.perf_counter() - reloj, 3),
+        'codigo_salida': exit_code,
+        'apuestas': total,
+        'salida': output if correctas else None,
+        'ligas': ligas,
+        'errores': errores,
+    }
+    if metrics_dir:
+        METRICS.observe('run_seconds', summary['segundos'])
+        summary['metricas'] = METRICS.write(metrics_dir)[0]
+    if summary_path:
+        if os.path.dirname(summary_path):
+            os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return exit_code, summary
+
+
+def read_jsonl(path: str, league: Optional[str] = None, nivel: Optional[str] = None) -> List[Dict]:
+    """Lee las value bets guardadas por `run` (solo con json, sin cargar pandas)"""
+    bets = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                bet = json.loads(line)
+                if (league is None or bet.get('Liga') == league) and (nivel is None or bet.get('Nivel') == nivel):
+                    bets.append(bet)
+    return bets
+
+
+def show(path: str = OUTPUT_PATH, summary_path: str = SUMMARY_PATH, league: Optional[str] = None,
+         nivel: Optional[str] = None, top: int = 20) -> int:
+    """Muestra la última ejecución guardada: resumen y mejores value bets por confianza"""
+    if not os.path.exists(path):
+        print(f"❌ No hay value bets guardadas en {path} (ejecuta primero `run`)")
+        return EXIT_FAILED
+
+    if os.path.exists(summary_path):
+        with open(summary_path, encoding='utf-8') as f:
+            summary = json.load(f)
+        print(f"🕒 Ejecución del {summary['inicio']} ({summary['segundos']}s, código {summary['codigo_salida']})")
+
+    bets = sorted(read_jsonl(path, league, nivel), key=lambda bet: (-bet['Confianza'], -bet['Valor Esperado']))
+    print(f"🎯 {len(bets)} value bets guardadas")
+    for bet in bets[:top]:
+        print(f"{bet['Fecha']}  {bet['Partido']:<45} {bet['Mercado']}  {bet['Casa']:<12} {bet['Odd']:>6.2f}  "
+              f"edge {bet['Edge'] * 100:5.1f}%  conf {bet['Confianza'] * 100:5.1f}%  [{bet['Liga']}/{bet['Nivel']}]")
+    return EXIT_OK
+
+
+def run_command(args: argparse.Namespace) -> int:
+    leagues = LEAGUES
+    if args.leagues:
+        desconocidas = [league for league in args.leagues if league not in LEAGUES]
+        if desconocidas:
+            print(f"❌ Ligas no configuradas: {', '.join(desconocidas)}")
+            return EXIT_FAILED
+        leagues = {league: LEAGUES[league] for league in args.leagues}
+
+    exit_code, summary = run(leagues, output=args.output, summary_path=args.summary, force_refresh=args.refresh,
+                             metrics_dir=args.metrics_dir, workers=args.workers)
+
+    print("\n📋 Resumen de la ejecución:")
+    for resumen in summary['ligas']:
+        estado = "✅" if resumen['estado'] == 'ok' else "❌"
+        detalle = resumen.get('error', resumen['estado'])
+        niveles = ', '.join(f"{nivel}: {n}" for nivel, n in resumen['niveles'].items())
+        print(f"{estado} {resumen['liga']}: {resumen['apuestas']} apuestas ({niveles}) [{detalle}, {resumen['segundos']}s]")
+    if summary['salida']:
+        print(f"💾 {summary['apuestas']} value bets guardadas en {summary['salida']}")
+    if summary.get('metricas'):
+        print(f"📈 Métricas guardadas en {summary['metricas']}")
+    return exit_code
+
+
+def odds_command(args: argparse.Namespace) -> int:
+    from scripts.get_odds import get_odds
+    data = get_odds(force_refresh=args.refresh, ttl=args.ttl)
+    METRICS.write(METRICS_DIR, name='odds')
+    return EXIT_OK if data is not None else EXIT_FAILED
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Búsqueda de value bets por lotes en todas las ligas y niveles")
+    commands = parser.add_subparsers(dest="command")
+
+    # Opciones de observabilidad comunes a los comandos que trabajan
+    observabilidad = argparse.ArgumentParser(add_help=False)
+    observabilidad.add_argument("--log", default=None, metavar="PATH", help="Logs estructurados (JSON lines) en PATH, o '-' para stderr")
+    observabilidad.add_argument("--profile", default=None, metavar="ETAPAS", help="Perfila con cProfile estas etapas ('all' o separadas por comas)")
+
+    run_parser = commands.add_parser("run", parents=[observabilidad], help="Evalúa todas las ligas y niveles (por defecto)")
+    run_parser.add_argument("--leagues", nargs="+", default=None, help="Ligas a procesar (por defecto todas las configuradas)")
+    run_parser.add_argument("--output", default=OUTPUT_PATH, help="Archivo JSON lines con todas las value bets")
+    run_parser.add_argument("--summary", default=SUMMARY_PATH, help="Archivo JSON con el resumen de la ejecución")
+    run_parser.add_argument("--refresh", action="store_true", help="Ignora la caché local de cuotas")
+    run_parser.add_argument("--workers", type=int, default=None, help="Procesos para evaluar ligas en paralelo (por defecto todos los núcleos)")
+    run_parser.add_argument("--metrics-dir", default=METRICS_DIR, help="Directorio de métricas ('' para no exportarlas)")
+    run_parser.set_defaults(handler=run_command)
+
+    odds_parser = commands.add_parser("odds", parents=[observabilidad], help="Descarga las cuotas (caché local o API) sin evaluar")
+    odds_parser.add_argument("--refresh", action="store_true", help="Ignora la caché local y consulta la API")
+    odds_parser.add_argument("--ttl", type=float, default=ODDS_CACHE_TTL, help="Segundos de vigencia de la caché")
+    odds_parser.set_defaults(handler=odds_command)
+
+    show_parser = commands.add_parser("show", help="Muestra las value bets de la última ejecución")
+    show_parser.add_argument("--input", default=OUTPUT_PATH, help="Archivo JSON lines generado por `run`")
+    show_parser.add_argument("--summary", default=SUMMARY_PATH, help="Resumen generado por `run`")
+    show_parser.add_argument("--league", default=None, help="Solo esta liga")
+    show_parser.add_argument("--tier", default=None, help="Solo este nivel")
+    show_parser.add_argument("--top", type=int, default=20, help="Value bets a mostrar")
+    show_parser.set_defaults(handler=lambda args: show(args.input, args.summary, args.league, args.tier, args.top))
+
+    # Sin subcomando (o solo con opciones) se mantiene la ejecución por lotes
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ['run'] + argv
+    args = parser.parse_args(argv)
+    if getattr(args, 'log', None):
+        configure_logging(None if args.log == '-' else args.log)
+    if getattr(args, 'profile', None):
+        enable_profiling(args.profile)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import argparse
+import itertools
+import os
+import random
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from config.settings import DEFAULT_SEASON
+from scripts.value_bet_finder import tier_mask
+from scripts.backtest import (
+    load_results, load_odds, match_odds, evaluate_fixtures, settle_bets, summarize,
+    STAKE, BANKROLL, KICKOFF_LEAD
+)
+
+# Umbrales de find_value_bets
+UMBRALES = {
+    'min_edge': [0.02, 0.03, 0.05, 0.08],
+    'max_odd': [3.0, 4.0, 5.0, 6.0],
+    'min_prob': [0.25, 0.30, 0.35, 0.40],
+    'min_confidence': [0.30, 0.35, 0.45],
+}
+
+# Parámetros del modelo (regresión a la media, localía y ventanas de partidos)
+MODELO = {
+    'weight': [0.5, 0.6, 0.7, 0.8],
+    'home_factor': [1.1, 1.2, 1.3, 1.4],
+    'window': [6, 10, 15],
+    'form_window': [3, 5, 8],
+}
+
+MIN_BETS = 30  # Configuraciones con menos apuestas no se clasifican
+
+# Datos compartidos de solo lectura: se cargan una vez por proceso
+_results: Optional[pd.DataFrame] = None
+_odds: Optional[pd.DataFrame] = None
+
+
+def _init_worker(results: pd.DataFrame, odds: pd.DataFrame) -> None:
+    """Recibe el historial y las cuotas una sola vez al arrancar cada proceso"""
+    global _results, _odds
+    _results, _odds = results, odds
+
+
+def _grid(space: Dict[str, list]) -> List[Dict]:
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+
+def build_tasks(umbrales: Dict[str, list] = UMBRALES, modelo: Dict[str, list] = MODELO,
+                samples: Optional[int] = None, seed: int = 0) -> List[tuple]:
+    """Agrupa las configuraciones por parámetros del modelo: (modelo, [umbrales, ...]).
+
+    El modelo se evalúa una vez por tarea y todos sus umbrales se filtran sobre esa
+    evaluación. Con `samples` se toma una muestra aleatoria de la rejilla completa.
+    """
+    configs = [(m, u) for m in _grid(modelo) for u in _grid(umbrales)]
+    if samples is not None and samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+
+    tasks: Dict[tuple, List[Dict]] = {}
+    for m, u in configs:
+        tasks.setdefault(tuple(sorted(m.items())), []).append(u)
+    return [(dict(m), us) for m, us in tasks.items()]
+
+
+def evaluate_task(task: tuple, stake: float = STAKE, bankroll: float = BANKROLL) -> List[Dict]:
+    """Evalúa un modelo sobre el histórico y liquida cada conjunto de umbrales"""
+    modelo, umbrales = task
+    evaluacion = evaluate_fixtures(_results, _odds, **modelo)
+    filas = []
+    for params in umbrales:
+        _, ganada, beneficio = settle_bets(evaluacion, tier_mask(evaluacion, params), stake)
+        filas.append({**params, **modelo, **summarize(beneficio, ganada, stake, bankroll)})
+    return filas
+
+
+def run_sweep(results: pd.DataFrame, odds: pd.DataFrame, tasks: List[tuple],
+              workers: Optional[int] = None) -> pd.DataFrame:
+    """Reparte las tareas en un pool de procesos y devuelve una tabla con todas las configuraciones"""
+    results = results.sort_values('fecha', kind='stable').reset_index(drop=True)
+    # El emparejamiento cuota-partido no depende del modelo: se hace una sola vez
+    odds = match_odds(results, odds)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _init_worker(results, odds)
+        filas = [fila for task in tasks for fila in evaluate_task(task)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(results, odds)) as pool:
+            filas = [fila for lote in pool.map(evaluate_task, tasks) for fila in lote]
+    return pd.DataFrame(filas)
+
+
+def rank(tabla: pd.DataFrame, by: str = 'ROI', min_bets: int = MIN_BETS) -> pd.DataFrame:
+    """Clasificación de configuraciones con suficientes apuestas (desempate por drawdown)"""
+    tabla = tabla[tabla['Apuestas'] >= min_bets]
+    return tabla.sort_values([by, 'Drawdown Máx'], ascending=[False, True]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de umbrales y parámetros del modelo sobre el backtest")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[DEFAULT_SEASON], help="Temporadas a repetir")
+    parser.add_argument("--samples", type=int, default=None, help="Configuraciones aleatorias (por defecto la rejilla completa)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto todos los núcleos)")
+    parser.add_argument("--sort", default="ROI", help="Columna por la que clasificar")
+    parser.add_argument("--min-bets", type=int, default=MIN_BETS, help="Apuestas mínimas para clasificar")
+    parser.add_argument("--top", type=int, default=20, help="Configuraciones a mostrar")
+    args = parser.parse_args()
+
+    print("📊 Cargando resultados y cuotas históricas...")
+    results = load_results(seasons=args.seasons)
+    odds = load_odds(lead=KICKOFF_LEAD)
+    if results.empty or odds.empty:
+        print("❌ Faltan resultados o cuotas históricas (ejecuta get_odds.py o live_odds.py para acumular snapshots)")
+        return
+
+    tasks = build_tasks(samples=args.samples)
+    total = sum(len(umbrales) for _, umbrales in tasks)
+    print(f"🔁 Evaluando {total} configuraciones ({len(tasks)} modelos)...")
+
+    inicio = time.perf_counter()
+    tabla = rank(run_sweep(results, odds, tasks, args.workers), args.sort, args.min_bets)
+    print(f"⏱️ Completado en {time.perf_counter() - inicio:.1f}s")
+    print(tabla.head(args.top).to_string(index=False))
+
+    filename = os.path.join("data", "param_sweep.csv")
+    tabla.to_csv(filename, index=False)
+    print(f"\n💾 Clasificación guardada en {filename}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+from config.settings import STARTUP_BUDGET, IMPORT_BUDGET
+
+# Comandos ligeros que se lanzan desde cron o bucles de shell: (argumentos de python, módulos que cargan).
+# `show` se ejecuta de verdad sobre una salida vacía; `odds` no se lanza (iría a la red), se importa
+# todo lo que carga su camino de ejecución.
+COMANDOS = {
+    'main show': (['-m', 'scripts.main', 'show', '--input', '{vacio}', '--summary', '{vacio}.summary'], ('scripts.main',)),
+    'main odds': (['-c', 'import scripts.main, scripts.get_odds'], ('scripts.main', 'scripts.get_odds')),
+    'get_odds': (['-c', 'import scripts.get_odds'], ('scripts.get_odds',)),
+}
+
+# Scripts que sí necesitan pandas/NumPy: se mide su importación real con `-X importtime`
+SCRIPTS_PESADOS = ('scripts.filter_bets', 'scripts.backtest')
+
+# Módulos pesados que un comando ligero no debe cargar al arrancar
+MODULOS_PESADOS = ('pandas', 'numpy', 'scipy')
+
+# Módulos que ni los scripts pesados deben cargar al importarse (solo al reajustar modelos)
+MODULOS_DIFERIDOS = ('scipy',)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(args: List[str], repeats: int = 5) -> float:
+    """Mediana del tiempo total (segundos) de lanzar `python <args>` en un proceso nuevo"""
+    tiempos = []
+    for _ in range(repeats):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def heavy_imports(modules, pesados=MODULOS_PESADOS) -> List[str]:
+    """Módulos pesados que quedan cargados tras importar `modules` en un proceso nuevo"""
+    code = (f"import sys, {', '.join(modules)}; "
+            f"print(','.join(m for m in {tuple(pesados)!r} if m in sys.modules))")
+    salida = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    return [m for m in salida.stdout.strip().split(',') if m]
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, str, float]]:
+    """Líneas de `-X importtime` como (profundidad, módulo, segundos acumulados)"""
+    filas = []
+    for linea in stderr.splitlines():
+        if not linea.startswith('import time:') or '|' not in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        if not acumulado.strip().isdigit():
+            continue  # Cabecera
+        profundidad = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        filas.append((profundidad, nombre.strip(), int(acumulado) / 1e6))
+    return filas
+
+
+def import_time(module: str, repeats: int = 5) -> Tuple[float, List[Tuple[str, float]]]:
+    """Mediana del tiempo de importar `module` y sus dependencias directas más costosas"""
+    tiempos, hijos = [], {}
+    for _ in range(repeats):
+        salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+        filas = parse_importtime(salida.stderr)
+        tiempos.append(next(s for profundidad, nombre, s in filas if profundidad == 0 and nombre == module))
+        for profundidad, nombre, s in filas:
+            if profundidad == 1:
+                hijos.setdefault(nombre, []).append(s)
+    costosos = sorted(((nombre, statistics.median(s)) for nombre, s in hijos.items()), key=lambda x: -x[1])
+    return statistics.median(tiempos), costosos[:3]
+
+
+def check(budget: float = STARTUP_BUDGET, repeats: int = 5,
+          import_budget: float = IMPORT_BUDGET) -> Tuple[bool, Dict[str, Dict]]:
+    """Mide comandos ligeros e importaciones pesadas; falla si superan su presupuesto o cargan módulos de más"""
+    base = measure(['-c', 'pass'], repeats)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        vacio = os.path.join(tmp, 'value_bets.jsonl')
+        open(vacio, 'w').close()
+        for nombre, (args, modules) in COMANDOS.items():
+            segundos = measure([arg.format(vacio=vacio) for arg in args], repeats)
+            pesados = heavy_imports(modules)
+            resultados[nombre] = {
+                'segundos': segundos,
+                'sobre_interprete': segundos - base,
+                'pesados': pesados,
+                'ok': segundos <= budget and not pesados,
+            }
+
+    for module in SCRIPTS_PESADOS:
+        segundos, costosos = import_time(module, repeats)
+        pesados = heavy_imports([module], MODULOS_DIFERIDOS)
+        resultados[module] = {
+            'segundos': segundos,
+            'importacion': True,
+            'costosos': costosos,
+            'pesados': pesados,
+            'ok': segundos <= import_budget and not pesados,
+        }
+    return all(r['ok'] for r in resultados.values()), resultados
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Comprueba el tiempo de arranque de los comandos ligeros y de importación de los scripts")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="Segundos máximos por comando ligero")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="Segundos máximos de importación por script pesado")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeticiones por comando (se usa la mediana)")
+    args = parser.parse_args()
+
+    ok, resultados = check(args.budget, args.repeats, args.import_budget)
+    print(f"⏱️ Arranque de comandos ligeros (presupuesto {args.budget * 1000:.0f} ms) "
+          f"e importación de scripts pesados (presupuesto {args.import_budget * 1000:.0f} ms):")
+    for nombre, r in resultados.items():
+        estado = "✅" if r['ok'] else "❌"
+        pesados = f"  carga {', '.join(r['pesados'])}" if r['pesados'] else ""
+        if r.get('importacion'):
+            costosos = ', '.join(f"{modulo} {s * 1000:.0f} ms" for modulo, s in r['costosos'])
+            print(f"{estado} {nombre:<20} {r['segundos'] * 1000:6.0f} ms de importación ({costosos}){pesados}")
+        else:
+            print(f"{estado} {nombre:<20} {r['segundos'] * 1000:6.0f} ms (+{r['sobre_interprete'] * 1000:.0f} ms sobre el intérprete){pesados}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
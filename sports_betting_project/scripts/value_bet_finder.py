@@ -1,71 +1,170 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
-from scipy.stats import poisson
-import requests
 from datetime import datetime
-from config.settings import FD_API_KEY, FD_BASE_URL, LEAGUES, DEFAULT_SEASON, API_KEY, SPORT, REGION, MARKETS, BOOKMAKERS
+from config.settings import LEAGUES, DEFAULT_SEASON, HISTORY_STORE_DIR, SPORT
+from clients.odds_api import fetch_odds
+from models.form_state import FormState
+from models.poisson import match_probabilities
+from models.dixon_coles import data_version
+from models.fixture_model import expected_goals, confidence_scores, REGRESSION_WEIGHT, HOME_FACTOR, DRAW_CONSISTENCY
+from storage.fixture_cache import FixtureCache, config_key
+from storage.odds_table import OddsTable
+from storage.odds_history import OddsHistoryStore
+from scripts.download_data import sync_matches, league_name_for
+from utils import team_resolver
+from metrics import METRICS, stage, count
+
+# Parámetros ajustables por nivel de riesgo
+PARAMETROS = {
+    'conservador': {'min_edge': 0.05, 'max_odd': 4.0, 'min_prob': 0.35, 'min_confidence': 0.45},
+    'equilibrado': {'min_edge': 0.03, 'max_odd': 5.0, 'min_prob': 0.30, 'min_confidence': 0.35},
+    'agresivo': {'min_edge': 0.02, 'max_odd': 6.0, 'min_prob': 0.25, 'min_confidence': 0.30}
+}
+
+# Mercado 1X2: (clave de columna, código de mercado)
+MERCADOS = (('local', '1'), ('empate', 'X'), ('visitante', '2'))
+
+# Configuración del modelo de forma; forma parte de la clave de la caché por partido
+MODEL_CONFIG = config_key(
+    model='form_poisson', weight=REGRESSION_WEIGHT, home_factor=HOME_FACTOR,
+    draw_consistency=DRAW_CONSISTENCY, span=10, form_span=5
+)
+
+# Probabilidades y confianza (2 × mercados) por partido, compartidas entre ejecuciones
+_fixture_cache = FixtureCache('form_poisson', (2, len(MERCADOS)))
+
+def history_seasons(historial):
+    """Temporada(s) que cubre un historial ('2024' o '2023-2024'); cada temporada empieza en julio"""
+    fechas = pd.to_datetime(historial['fecha'], utc=True, cache=False)
+    if fechas.empty:
+        return str(DEFAULT_SEASON)
+    temporadas = fechas.dt.year - (fechas.dt.month < 7)
+    primera, ultima = int(temporadas.min()), int(temporadas.max())
+    return str(primera) if primera == ultima else f'{primera}-{ultima}'
 
 class ValueBetFinder:
     def __init__(self):
         self.odds_data = None
         self.historial_data = None
-        self.team_name_mapping = {
-            'Atletico Madrid': 'Atlético Madrid',
-            'Alaves': 'Alavés',
-            'Leganes': 'Leganés'
-            # Agrega más mapeos según sea necesario
-        }
+        self._team_stats = None
+        self.league = 'la_liga'
+        self.fixture_cache = _fixture_cache  # None para calcular siempre el modelo
+
+    @property
+    def historial_data(self):
+        return self._historial_data
+
+    @historial_data.setter
+    def historial_data(self, data):
+        """Al recargar el historial se invalida el estado de forma"""
+        self._historial_data = data
+        self._team_stats = None
+        self._form_state_path = None
+        self._history_version = None
+
+    @property
+    def odds_data(self):
+        return self._odds_data
+
+    @odds_data.setter
+    def odds_data(self, data):
+        """Al recibir nuevas odds se invalida la tabla columnar"""
+        self._odds_data = data
+        self._odds_table = None
+
+    @property
+    def odds_table(self):
+        """Tabla columnar de cuotas, construida una vez por conjunto de odds"""
+        if self._odds_table is None and self.odds_data:
+            self._odds_table = OddsTable.from_events(self.odds_data)
+        return self._odds_table
+
+    def load_odds_file(self, path='data/odds.json'):
+        """Carga las odds desde un volcado JSON en streaming, sin mantener los dicts en memoria"""
+        self.odds_data = None
+        self._odds_table = OddsTable.from_json(path)
+        return len(self._odds_table) > 0
+
+    @property
+    def team_stats(self):
+        """Estado de forma por equipo; parte de la instantánea en disco y solo aplica los partidos nuevos"""
+        if self._team_stats is None:
+            path = self._form_state_path
+            state = FormState.load(path) if path and os.path.exists(path) else FormState()
+            if state.append(self.historial_data) and path:
+                state.save(path)
+            self._team_stats = state
+        return self._team_stats
+
+    @property
+    def history_version(self):
+        """Huella del historial cargado: si no cambia, las salidas del modelo en caché siguen valiendo"""
+        if self._history_version is None:
+            historial = self.historial_data
+            self._history_version = data_version(pd.DataFrame({
+                'date': historial['fecha'],
+                'home_team': historial['equipo_local'],
+                'away_team': historial['equipo_visitante'],
+                'home_score': historial['goles_local'].fillna(-1),
+                'away_score': historial['goles_visitante'].fillna(-1),
+            }))
+        return self._history_version
 
     def normalize_team_name(self, name):
         """Normaliza nombres de equipos para consistencia"""
-        return self.team_name_mapping.get(name, name)
+        return team_resolver(self.league).canonical(name)
 
-    def get_odds(self):
-        """Obtiene las cuotas desde la API de Odds"""
-        url = f"https://api.the-odds-api.com/v4/sports/{SPORT}/odds/?regions={REGION}&markets={','.join(MARKETS)}&bookmakers={','.join(BOOKMAKERS)}&apiKey={API_KEY}"
-        response = requests.get(url)
+    def get_odds(self, force_refresh=False, sport=SPORT):
+        """Obtiene las cuotas desde la API de Odds (o la caché local si siguen vigentes)"""
+        data = fetch_odds(sport=sport, force_refresh=force_refresh)
 
-        if response.status_code == 200:
-            self.odds_data = response.json()
+        if data is not None:
+            self.odds_data = data
             print("✅ Odds obtenidas correctamente")
             return True
         else:
-            print(f"❌ Error al obtener odds: {response.status_code}")
             return False
 
     def get_historical_data(self, league):
         """Obtiene historial de partidos desde Football Data API"""
-        url = f'{FD_BASE_URL}competitions/{league}/matches?season={DEFAULT_SEASON}'
-        headers = {'X-Auth-Token': FD_API_KEY}
-
         try:
-            response = requests.get(url, headers=headers, timeout=15)
-            data = response.json()
-
-            matches = []
-            for match in data['matches']:
-                if match['status'] == 'FINISHED':
-                    home_team = self.normalize_team_name(match['homeTeam']['name'])
-                    away_team = self.normalize_team_name(match['awayTeam']['name'])
-                    
-                    matches.append({
-                        'fecha': match['utcDate'],
-                        'equipo_local': home_team,
-                        'equipo_visitante': away_team,
-                        'goles_local': match['score']['fullTime']['home'] if match['score']['fullTime']['home'] is not None else 0,
-                        'goles_visitante': match['score']['fullTime']['away'] if match['score']['fullTime']['away'] is not None else 0,
-                        'resultado': self._determine_result(match['score']['fullTime']['home'], match['score']['fullTime']['away'])
-                    })
-
-            self.historial_data = pd.DataFrame(matches)
-            self.historial_data['fecha'] = pd.to_datetime(self.historial_data['fecha'])
-            print(f"✅ Historial de {league} obtenido ({len(self.historial_data)} partidos)")
+            # Sincroniza solo los partidos nuevos contra el almacén local
+            with stage('get_historical_data', league=league_name_for(league)) as info:
+                matches, nuevos = sync_matches(league, DEFAULT_SEASON)
+                info.update(matches=len(matches), new_matches=nuevos)
+            league_name = league_name_for(league)
+            team_resolver(league_name).register_all(pd.concat([matches['home_team'], matches['away_team']]))
+
+            teams = team_resolver(league_name)
+            historial = pd.DataFrame({
+                'fecha': matches['date'],
+                'equipo_local': matches['home_team'].astype(str).map(teams.canonical),
+                'equipo_visitante': matches['away_team'].astype(str).map(teams.canonical),
+                'goles_local': matches['home_score'],
+                'goles_visitante': matches['away_score'],
+            })
+            historial['resultado'] = np.select(
+                [historial['goles_local'] > historial['goles_visitante'], historial['goles_local'] == historial['goles_visitante']],
+                ['1', 'X'],
+                '2'
+            )
+
+            self.use_history(historial, league_name)
+            print(f"✅ Historial de {league} obtenido ({len(self.historial_data)} partidos, {nuevos} nuevos)")
             return True
 
         except Exception as e:
             print(f"❌ Error obteniendo historial: {str(e)}")
             return False
 
+    def use_history(self, historial, league):
+        """Usa un historial ya cargado (p. ej. desde el historial compacto compartido) como el de `league`"""
+        self.league = league
+        self.historial_data = historial
+        self._form_state_path = os.path.join(HISTORY_STORE_DIR, f'form_{league}_{history_seasons(historial)}.npz')
+
     def _determine_result(self, home_goals, away_goals):
         """Determina el resultado del partido (1, X, 2)"""
         if home_goals is None or away_goals is None:
@@ -78,218 +177,300 @@ class ValueBetFinder:
             return '2'
 
     def process_odds(self):
-        """Procesa las odds crudas a un DataFrame estructurado"""
-        partidos = []
-
-        for evento in self.odds_data:
-            home_team = self.normalize_team_name(evento['home_team'])
-            away_team = self.normalize_team_name(evento['away_team'])
-            partido = f"{home_team} - {away_team}"
-            fecha = datetime.fromisoformat(evento['commence_time'][:-1]).strftime('%Y-%m-%d %H:%M')
-
-            for bookmaker in evento['bookmakers']:
-                casa = bookmaker['key']
-                odds = {'local': None, 'empate': None, 'visitante': None}
-
-                for market in bookmaker['markets']:
-                    if market['key'] == 'h2h':
-                        for outcome in market['outcomes']:
-                            if outcome['name'] == evento['home_team']:
-                                odds['local'] = outcome['price']
-                            elif outcome['name'] == evento['away_team']:
-                                odds['visitante'] = outcome['price']
-                            elif outcome['name'] == 'Draw':
-                                odds['empate'] = outcome['price']
-
-                if None not in odds.values():
-                    partidos.append({
-                        'partido': partido,
-                        'casa_apuestas': casa,
-                        'odd_local': odds['local'],
-                        'odd_empate': odds['empate'],
-                        'odd_visitante': odds['visitante'],
-                        'fecha': fecha
-                    })
-
-        return pd.DataFrame(partidos)
+        """Procesa las odds (tabla columnar) a un DataFrame con una fila por partido y casa"""
+        table = self.odds_table
+        if table is None or not len(table):
+            return pd.DataFrame()
+
+        # Filas del mercado 1X2 y papel de cada resultado (0 local, 1 empate, 2 visitante)
+        rows = table.market == table.code('market', 'h2h')
+        event = table.event[rows].astype(np.int64)
+        outcome = table.outcome[rows]
+        home_outcome = np.array([table.code('outcome', team) for team in table.home_teams])
+        away_outcome = np.array([table.code('outcome', team) for team in table.away_teams])
+        role = np.select(
+            [outcome == home_outcome[event], outcome == table.code('outcome', 'Draw'), outcome == away_outcome[event]],
+            [0, 1, 2],
+            -1
+        )
+
+        h2h = pd.DataFrame({
+            'event': event,
+            'bookmaker': table.bookmaker[rows],
+            'role': role,
+            'price': table.price[rows]
+        })
+        h2h = h2h[h2h['role'] >= 0]
+        if h2h.empty:
+            return pd.DataFrame()
+
+        # Una fila por (evento, casa) en el orden de llegada; la última cuota repetida prevalece
+        orden = h2h.reset_index().groupby(['event', 'bookmaker'])['index'].min().sort_values().index
+        odds = h2h.pivot_table(
+            index=['event', 'bookmaker'], columns='role', values='price', aggfunc='last'
+        ).reindex(index=orden, columns=[0, 1, 2]).dropna()
+        if odds.empty:
+            return pd.DataFrame()
+
+        # Datos por evento, calculados una sola vez
+        partidos = np.array([
+            f"{self.normalize_team_name(home)} - {self.normalize_team_name(away)}"
+            for home, away in zip(table.home_teams, table.away_teams)
+        ], dtype=object)
+        fechas = np.array([
+            datetime.fromisoformat(commence_time[:-1]).strftime('%Y-%m-%d %H:%M')
+            for commence_time in table.commence_times
+        ], dtype=object)
+
+        events = odds.index.get_level_values('event').to_numpy()
+        return pd.DataFrame({
+            'partido': partidos[events],
+            'casa_apuestas': np.asarray(table.bookmakers, dtype=object)[odds.index.get_level_values('bookmaker').to_numpy()],
+            'odd_local': odds[0].to_numpy(),
+            'odd_empate': odds[1].to_numpy(),
+            'odd_visitante': odds[2].to_numpy(),
+            'fecha': fechas[events]
+        })
+
+    def calculate_lambdas(self, home_codes, away_codes):
+        """Goles esperados (local, visitante) con regresión a la media y ajuste por localía"""
+        stats = self.team_stats
+        return expected_goals(
+            stats.fixture_stats(stats.home, home_codes), stats.fixture_stats(stats.away, away_codes),
+            stats.avg_home_goals, stats.avg_away_goals
+        )
 
     def calculate_probabilities(self, home_team, away_team):
         """Calcula probabilidades usando modelo Poisson mejorado con regresión a la media"""
-        # Obtenemos últimos 10 partidos como local y visitante
-        home_local = self.historial_data[
-            (self.historial_data['equipo_local'] == home_team)
-        ].tail(10)
-        
-        away_away = self.historial_data[
-            (self.historial_data['equipo_visitante'] == away_team)
-        ].tail(10)
+        return self.calculate_slate_probabilities([(home_team, away_team)])[(home_team, away_team)]
 
-        # Promedios de la liga
-        avg_home_goals = self.historial_data['goles_local'].mean()
-        avg_away_goals = self.historial_data['goles_visitante'].mean()
+    def calculate_slate_probabilities(self, fixtures):
+        """Probabilidades 1X2 exactas para todos los partidos de la jornada en una sola pasada"""
+        fixtures = list(fixtures)
+        if not fixtures:
+            return {}
 
-        # Ataque y defensa con regresión a la media
-        home_attack = (home_local['goles_local'].mean() * 0.7 + avg_home_goals * 0.3) if not home_local.empty else avg_home_goals
-        away_defense = (away_away['goles_local'].mean() * 0.7 + avg_home_goals * 0.3) if not away_away.empty else avg_home_goals
-        
-        away_attack = (away_away['goles_visitante'].mean() * 0.7 + avg_away_goals * 0.3) if not away_away.empty else avg_away_goals
-        home_defense = (home_local['goles_visitante'].mean() * 0.7 + avg_away_goals * 0.3) if not home_local.empty else avg_away_goals
+        probs, _ = self.fixture_outputs(fixtures)
 
-        # Calculamos lambdas con ajuste por localía
-        lambda_home = 1.3 * (home_attack / avg_home_goals) * (away_defense / avg_home_goals) * avg_home_goals
-        lambda_away = 1.0 * (away_attack / avg_away_goals) * (home_defense / avg_away_goals) * avg_away_goals
-
-        # Simulación Monte Carlo
-        np.random.seed(42)  # Para reproducibilidad
-        home_goals = np.random.poisson(lambda_home, 10000)
-        away_goals = np.random.poisson(lambda_away, 10000)
-
-        prob_home = np.mean(home_goals > away_goals)
-        prob_draw = np.mean(home_goals == away_goals)
-        prob_away = np.mean(home_goals < away_goals)
-
-        # Normalizamos para que sumen 1
-        total = prob_home + prob_draw + prob_away
         return {
-            'local': prob_home / total,
-            'empate': prob_draw / total,
-            'visitante': prob_away / total
+            fixture: {market: float(probs[i, j]) for j, (market, _) in enumerate(MERCADOS)}
+            for i, fixture in enumerate(fixtures)
         }
 
+    def _slate_probabilities(self, home_codes, away_codes):
+        """Matriz (partidos × 3) de probabilidades local/empate/visitante"""
+        probs = match_probabilities(*self.calculate_lambdas(home_codes, away_codes))
+        return np.column_stack([probs[market] for market, _ in MERCADOS])
+
     def calculate_confidence(self, home_team, away_team, market):
         """Cálculo mejorado de confianza con múltiples factores"""
-        # Datos de rendimiento reciente
-        home_local = self.historial_data[
-            (self.historial_data['equipo_local'] == home_team)
-        ].tail(5)
-        
-        away_away = self.historial_data[
-            (self.historial_data['equipo_visitante'] == away_team)
-        ].tail(5)
-
-        # Si no hay suficientes datos, confianza mínima
-        if len(home_local) < 3 or len(away_away) < 3:
-            return 0.3
-
-        # 1. Factor de rendimiento (diferencia de goles)
-        home_perf = home_local['goles_local'].mean() - home_local['goles_visitante'].mean()
-        away_perf = away_away['goles_visitante'].mean() - away_away['goles_local'].mean()
-
-        # 2. Factor de consistencia (% de resultados esperados)
-        if market == '1':
-            consistency = (home_local['resultado'] == '1').mean()
-            perf_factor = home_perf * 0.15
-        elif market == '2':
-            consistency = (away_away['resultado'] == '2').mean()
-            perf_factor = away_perf * 0.15
-        else:  # Empate
-            consistency = 0.3  # Los empates son menos consistentes
-            perf_factor = -abs(home_perf - away_perf) * 0.1
-
-        # 3. Factor de forma (últimos 5 partidos)
-        home_form = home_local['goles_local'].mean() / self.historial_data['goles_local'].mean()
-        away_form = away_away['goles_visitante'].mean() / self.historial_data['goles_visitante'].mean()
-
-        # Cálculo final de confianza
-        if market == '1':
-            confidence = 0.4 + perf_factor + (consistency * 0.3) + (home_form * 0.1)
-        elif market == '2':
-            confidence = 0.4 + perf_factor + (consistency * 0.3) + (away_form * 0.1)
+        _, confidence = self.fixture_outputs([(home_team, away_team)])
+        return float(confidence[0, {'1': 0, '2': 2}.get(market, 1)])
+
+    def _slate_confidence(self, home_codes, away_codes):
+        """Matriz (partidos × 3) de confianza para los mercados 1, X y 2"""
+        stats = self.team_stats
+        return confidence_scores(
+            stats.fixture_stats(stats.home, home_codes), stats.fixture_stats(stats.away, away_codes),
+            stats.avg_home_goals, stats.avg_away_goals
+        )
+
+    def fixture_outputs(self, fixtures):
+        """Probabilidades y confianza (partidos × 3) de pares (local, visitante); el modelo solo corre para los que no están en caché"""
+        fixtures = [tuple(fixture) for fixture in fixtures]
+
+        def compute(posiciones):
+            stats = self.team_stats
+            home_codes = stats.codes(fixtures[i][0] for i in posiciones)
+            away_codes = stats.codes(fixtures[i][1] for i in posiciones)
+            return np.stack([self._slate_probabilities(home_codes, away_codes),
+                             self._slate_confidence(home_codes, away_codes)], axis=1)
+
+        if self.fixture_cache is None:
+            outputs = compute(range(len(fixtures)))
         else:
-            confidence = 0.4 + perf_factor + (consistency * 0.2)
+            version = self.history_version
+            keys = [FixtureCache.key(home, away, MODEL_CONFIG, version) for home, away in fixtures]
+            outputs = self.fixture_cache.lookup(keys, compute)
+        return outputs[:, 0], outputs[:, 1]
+
+    def model_outputs(self, partidos):
+        """Probabilidades y confianza (partidos × 3, mercados 1/X/2) para partidos 'Local - Visitante'"""
+        return self.fixture_outputs(partido.split(' - ') for partido in partidos)
+
+    def odds_long(self, odds_df=None):
+        """Cuotas en formato largo (una fila por partido, casa y mercado) y código de partido por fila"""
+        odds_df = self.process_odds() if odds_df is None else odds_df
+        fixture_idx, partidos = pd.factorize(odds_df['partido'])
+        odds = odds_df[[f'odd_{market}' for market, _ in MERCADOS]].to_numpy(dtype=float)
+
+        n_mercados = len(MERCADOS)
+        long_df = pd.DataFrame({
+            'Fecha': np.repeat(odds_df['fecha'].to_numpy(), n_mercados),
+            'Partido': pd.Categorical.from_codes(np.repeat(fixture_idx, n_mercados), partidos),
+            'Mercado': np.tile([code for _, code in MERCADOS], len(odds_df)),
+            'Casa': pd.Categorical(np.repeat(odds_df['casa_apuestas'].to_numpy(), n_mercados)),
+            'Odd': odds.ravel()
+        })
+        return long_df, partidos
+
+    def evaluate_value_bets(self, niveles=None):
+        """Evalúa todas las cuotas (partido, casa, mercado) en columnas y marca cada nivel que cumplen"""
+        niveles = PARAMETROS if niveles is None else niveles
+        if self.odds_table is None or self.historial_data.empty:
+            print("❌ Primero carga datos de odds e historial")
+            return None
 
-        return max(0.3, min(0.9, confidence))
+        with stage('process_odds', league=self.league) as info:
+            odds_df = self.process_odds()
+            info.update(rows=len(self.odds_table), events=len(self.odds_table.event_ids), quotes=len(odds_df))
+        count('odds_rows_processed_total', len(self.odds_table), league=self.league)
+        if odds_df.empty:
+            return None
+
+        # Modelo una sola vez por partido
+        evaluacion, partidos = self.odds_long(odds_df)
+        with stage('model_outputs', league=self.league) as info:
+            prob, confidence = self.model_outputs(partidos)
+            info['fixtures'] = len(partidos)
+        count('fixtures_evaluated_total', len(partidos), league=self.league)
+
+        # Una fila por partido, casa y mercado: (código de partido, columna de mercado)
+        fixture = evaluacion['Partido'].cat.codes.to_numpy()
+        market = np.tile(np.arange(len(MERCADOS)), len(odds_df))
+        evaluacion['Prob. Real'] = prob[fixture, market]
+        evaluacion['Confianza'] = confidence[fixture, market]
+
+        with stage('score_value_bets', league=self.league) as info:
+            evaluacion = score_value_bets(evaluacion, niveles)
+            info['quotes'] = len(evaluacion)
+        return evaluacion[evaluacion[list(niveles)].any(axis=1)].reset_index(drop=True)
 
     def find_value_bets(self, min_edge=0.03, max_odd=5.0, min_prob=0.30, min_confidence=0.35):
         """Busca value bets con múltiples filtros y ordenamiento"""
-        if not self.odds_data or self.historial_data.empty:
-            print("❌ Primero carga datos de odds e historial")
+        params = {'min_edge': min_edge, 'max_odd': max_odd, 'min_prob': min_prob, 'min_confidence': min_confidence}
+        evaluacion = self.evaluate_value_bets({'seleccion': params})
+        if evaluacion is None:
             return None
+        return select_value_bets(evaluacion, 'seleccion')
 
-        odds_df = self.process_odds()
-        value_bets = []
-
-        for partido in odds_df['partido'].unique():
-            home_team, away_team = partido.split(' - ')
-
-            try:
-                probs = self.calculate_probabilities(home_team, away_team)
-                match_odds = odds_df[odds_df['partido'] == partido]
-
-                for _, row in match_odds.iterrows():
-                    for market in ['local', 'empate', 'visitante']:
-                        odd = row[f'odd_{market}']
-                        prob = probs[market]
-
-                        if odd and prob:
-                            implied_prob = 1 / odd
-                            edge = prob - implied_prob
-                            expected_value = prob * odd - 1
-                            market_code = '1' if market == 'local' else ('X' if market == 'empate' else '2')
-                            confidence = self.calculate_confidence(home_team, away_team, market_code)
-                            
-                            if (edge >= min_edge and 
-                                odd <= max_odd and 
-                                prob >= min_prob and
-                                confidence >= min_confidence):
-                                
-                                value_bets.append({
-                                    'Fecha': row['fecha'],
-                                    'Partido': partido,
-                                    'Mercado': market_code,
-                                    'Casa': row['casa_apuestas'],
-                                    'Odd': odd,
-                                    'Prob. Real': f"{prob*100:.1f}%",
-                                    'Prob. Implícita': f"{implied_prob*100:.1f}%",
-                                    'Edge': f"{edge*100:.1f}%",
-                                    'Valor Esperado': f"{expected_value*100:.1f}%",
-                                    'Confianza': f"{confidence*100:.1f}%"
-                                })
-            except Exception as e:
-                print(f"⚠️ Error procesando {partido}: {str(e)}")
-                continue
-
-        if value_bets:
-            df = pd.DataFrame(value_bets)
-            # Convertimos a valores numéricos para ordenar
-            df['Confianza_num'] = df['Confianza'].str.replace('%', '').astype(float)
-            df['Valor_Esperado_num'] = df['Valor Esperado'].str.replace('%', '').astype(float)
-            df['Prob_Real_num'] = df['Prob. Real'].str.replace('%', '').astype(float)
-            
-            # Ordenamos por combinación de factores
-            df = df.sort_values(
-                ['Confianza_num', 'Prob_Real_num', 'Valor_Esperado_num'], 
-                ascending=[False, False, False]
+    def closing_line_value(self, value_bets, history=None):
+        """Añade 'Odd Apertura', 'Odd Cierre' y 'CLV' a value bets ya encontradas usando el histórico de cuotas.
+
+        CLV = odd tomada / odd de cierre - 1; NaN si aún no hay cierre registrado.
+        """
+        store = history or OddsHistoryStore()
+        try:
+            # Identificar cada apuesta con su evento, casa y resultado en el histórico
+            eventos = store.events()
+            eventos['Partido'] = [
+                f"{self.normalize_team_name(home)} - {self.normalize_team_name(away)}"
+                for home, away in zip(eventos['home_team'], eventos['away_team'])
+            ]
+            eventos['Fecha'] = pd.to_datetime(eventos['commence_time'], unit='s').dt.strftime('%Y-%m-%d %H:%M')
+            bets = value_bets.reset_index(drop=True).astype({'Partido': str, 'Casa': str})
+            bets = bets.merge(eventos[['Partido', 'Fecha', 'event_key', 'home_team', 'away_team']],
+                              on=['Partido', 'Fecha'], how='left')
+            bets['outcome'] = np.select(
+                [bets['Mercado'] == '1', bets['Mercado'] == 'X'],
+                [bets['home_team'], 'Draw'],
+                bets['away_team']
             )
-            df = df.drop(columns=['Confianza_num', 'Valor_Esperado_num', 'Prob_Real_num'])
-            
-            return df
-        else:
-            return None
+
+            clv = store.closing_line_value(bets.dropna(subset=['event_key']).rename(columns={'Casa': 'bookmaker', 'Odd': 'odds'}))
+            clv = clv.rename(columns={'bookmaker': 'Casa', 'odds': 'Odd'})
+            bets = bets.merge(clv[['event_key', 'Casa', 'outcome', 'opening_price', 'closing_price', 'clv']],
+                              on=['event_key', 'Casa', 'outcome'], how='left')
+        finally:
+            if history is None:
+                store.close()
+
+        bets = bets.rename(columns={'opening_price': 'Odd Apertura', 'closing_price': 'Odd Cierre', 'clv': 'CLV'})
+        return bets.drop(columns=['event_key', 'home_team', 'away_team', 'outcome'])
+
+
+# Columnas de la evaluación, en orden de presentación
+COLUMNAS = ['Fecha', 'Partido', 'Mercado', 'Casa', 'Odd', 'Prob. Real', 'Prob. Implícita', 'Edge', 'Valor Esperado', 'Confianza']
+
+def score_value_bets(evaluacion, niveles):
+    """Calcula probabilidad implícita, edge y valor esperado como columnas y marca cada nivel que se cumple.
+
+    Recibe filas con 'Odd', 'Prob. Real' y 'Confianza' (y las columnas descriptivas).
+    """
+    odds = evaluacion['Odd'].to_numpy(dtype=float)
+    prob = evaluacion['Prob. Real'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore'):
+        implied_prob = 1 / odds
+
+    evaluacion = evaluacion.assign(**{
+        'Prob. Implícita': implied_prob,
+        'Edge': prob - implied_prob,
+        'Valor Esperado': prob * odds - 1
+    })[COLUMNAS]
+
+    for nivel, params in niveles.items():
+        evaluacion[nivel] = tier_mask(evaluacion, params)
+    return evaluacion
+
+def tier_mask(evaluacion, params):
+    """Array booleano de las filas (ya puntuadas) que cumplen los umbrales de un nivel"""
+    odds = evaluacion['Odd'].to_numpy(dtype=float)
+    prob = evaluacion['Prob. Real'].to_numpy(dtype=float)
+    return (
+        (odds > 0) & (prob > 0) &
+        (evaluacion['Edge'].to_numpy(dtype=float) >= params['min_edge']) &
+        (odds <= params['max_odd']) &
+        (prob >= params['min_prob']) &
+        (evaluacion['Confianza'].to_numpy(dtype=float) >= params['min_confidence'])
+    )
+
+def select_value_bets(evaluacion, nivel, top=None):
+    """Value bets de un nivel ya evaluado, ordenadas por confianza, probabilidad y valor esperado.
+
+    Las métricas se mantienen como floats (fracciones); el formato en % se aplica
+    solo al mostrar o guardar con `format_value_bets`.
+    """
+    df = evaluacion[evaluacion[nivel]]
+    if df.empty:
+        return None
+
+    df = df.drop(columns=[col for col in evaluacion.columns if evaluacion[col].dtype == bool])
+    df = df.sort_values(
+        ['Confianza', 'Prob. Real', 'Valor Esperado'],
+        ascending=[False, False, False]
+    )
+    return df.head(top) if top else df
+
+
+# Columnas de métricas expresadas como porcentaje al mostrarlas
+COLUMNAS_PORCENTAJE = ['Prob. Real', 'Prob. Implícita', 'Edge', 'Valor Esperado', 'Confianza', 'CLV']
+
+def format_value_bets(value_bets):
+    """Copia de las value bets con las métricas formateadas como porcentaje para mostrar/CSV"""
+    df = value_bets.copy()
+    for col in COLUMNAS_PORCENTAJE:
+        if col in df:
+            df[col] = df[col].map(lambda x: f"{x*100:.1f}%")
+    return df
 
 def main():
+    """Busca value bets de la primera liga configurada en todos los niveles; devuelve el código de salida"""
     print("🔍 Iniciando Value Bet Finder - Versión Optimizada")
     vbf = ValueBetFinder()
 
-    # Parámetros ajustables
-    PARAMETROS = {
-        'conservador': {'min_edge': 0.05, 'max_odd': 4.0, 'min_prob': 0.35, 'min_confidence': 0.45},
-        'equilibrado': {'min_edge': 0.03, 'max_odd': 5.0, 'min_prob': 0.30, 'min_confidence': 0.35},
-        'agresivo': {'min_edge': 0.02, 'max_odd': 6.0, 'min_prob': 0.25, 'min_confidence': 0.30}
-    }
-
     # 1. Obtener datos
     print("\n📡 Obteniendo datos de apuestas...")
     if not vbf.get_odds():
-        exit()
+        return 1
 
     print("\n📊 Obteniendo historial de partidos...")
     liga = list(LEAGUES.values())[0]
     if not vbf.get_historical_data(liga):
-        exit()
+        return 1
 
-    # 2. Búsqueda por niveles
+    # 2. Búsqueda por niveles (una sola evaluación para todos)
     print("\n🔎 Buscando value bets...")
+    evaluacion = vbf.evaluate_value_bets(PARAMETROS)
     for nivel, params in PARAMETROS.items():
         print(f"\n⚙️ Probando parámetros {nivel}:")
         print(f"- Edge mínimo: {params['min_edge']*100:.0f}%")
@@ -297,29 +478,31 @@ def main():
         print(f"- Prob. mínima: {params['min_prob']*100:.0f}%")
         print(f"- Confianza mínima: {params['min_confidence']*100:.0f}%")
         
-        value_bets = vbf.find_value_bets(**params)
+        value_bets = select_value_bets(evaluacion, nivel) if evaluacion is not None else None
         
         if value_bets is not None:
+            count('bets_emitted_total', len(value_bets), league=vbf.league, nivel=nivel)
             print(f"\n🎯 {len(value_bets)} VALUE BETS ENCONTRADOS (nivel {nivel}):")
-            print(value_bets[['Fecha', 'Partido', 'Mercado', 'Casa', 'Odd', 'Prob. Real', 'Edge', 'Confianza']])
+            tabla = format_value_bets(value_bets)
+            print(tabla[['Fecha', 'Partido', 'Mercado', 'Casa', 'Odd', 'Prob. Real', 'Edge', 'Confianza']])
             
             # Guardar resultados
             filename = f"data/value_bets_{nivel}.csv"
-            value_bets.to_csv(filename, index=False)
+            tabla.to_csv(filename, index=False)
             print(f"\n💾 Resultados guardados en {filename}")
             
             # Mostrar análisis
             print("\n📊 Análisis:")
-            print("- Odd promedio:", round(value_bets['Odd'].astype(float).mean(), 2))
-            print("- Edge promedio:", round(value_bets['Edge'].str.replace('%','').astype(float).mean(), 1), "%")
-            print("- Confianza promedio:", round(value_bets['Confianza'].str.replace('%','').astype(float).mean(), 1), "%")
+            print("- Odd promedio:", round(value_bets['Odd'].mean(), 2))
+            print("- Edge promedio:", round(value_bets['Edge'].mean() * 100, 1), "%")
+            print("- Confianza promedio:", round(value_bets['Confianza'].mean() * 100, 1), "%")
             print("\nDistribución de mercados:")
             print(value_bets['Mercado'].value_counts(normalize=True).apply(lambda x: f"{x*100:.1f}%"))
-            
-            if input("\n¿Continuar con siguiente nivel? (s/n): ").lower() != 's':
-                break
         else:
             print(f"⚠️ No se encontraron value bets con parámetros {nivel}")
+    prom_path, _ = METRICS.write()
+    print(f"\n📈 Métricas guardadas en {prom_path}")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,154 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Columnas del historial compacto: (nombre, dtype)
+COLUMNS = (
+    ('date', np.int64),        # Epoch en ns (UTC)
+    ('league', np.int16),      # Código del grupo liga/temporada
+    ('home_team', np.int16),   # Código del equipo local
+    ('away_team', np.int16),   # Código del equipo visitante
+    ('home_score', np.int8),
+    ('away_score', np.int8),
+    ('result', np.int8),       # 0 local, 1 empate, 2 visitante
+)
+RESULTS = ('1', 'X', '2')  # Código de resultado -> valor de 'resultado' en el historial
+
+
+class CompactHistory:
+    """Historial de varias ligas y temporadas en arrays compactos, ordenado por fecha.
+
+    Equipos y grupos liga/temporada son códigos int16 sobre tablas de nombres, los
+    goles int8, el resultado un código int8 y la fecha un epoch int64. Un índice
+    de desplazamientos por equipo (estilo CSR) da sus partidos en orden
+    cronológico sin recorrer el historial. Se guarda como un directorio de `.npy`
+    que se puede abrir con mmap, de modo que varios procesos comparten una copia.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], teams: List[str], leagues: List[str],
+                 team_offsets: np.ndarray, team_rows: np.ndarray, meta: Optional[Dict] = None):
+        self.columns = columns
+        self.teams = list(teams)
+        self.leagues = list(leagues)
+        self.team_offsets = team_offsets
+        self.team_rows = team_rows
+        self.meta = meta or {}
+        self._team_ids = {team: i for i, team in enumerate(self.teams)}
+
+    def __len__(self) -> int:
+        return len(self.columns['date'])
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Acceso a las columnas como atributos (`history.date`, `history.home_team`...)"""
+        columns = self.__dict__.get('columns')
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes de los arrays (sin las tablas de nombres)"""
+        return sum(a.nbytes for a in self.columns.values()) + self.team_offsets.nbytes + self.team_rows.nbytes
+
+    @staticmethod
+    def _team_index(home: np.ndarray, away: np.ndarray, n_teams: int):
+        """Desplazamientos por equipo y filas (local o visitante) de cada uno en orden cronológico"""
+        rows = np.concatenate([np.arange(len(home)), np.arange(len(away))]).astype(np.int32)
+        teams = np.concatenate([home, away])
+        order = np.lexsort((rows, teams))
+        offsets = np.zeros(n_teams + 1, dtype=np.int64)
+        np.cumsum(np.bincount(teams, minlength=n_teams), out=offsets[1:])
+        return offsets, rows[order]
+
+    @classmethod
+    def from_frame(cls, historial_data: pd.DataFrame, league_col: str = 'liga') -> 'CompactHistory':
+        """Construye el historial a partir del formato de `load_results` / ValueBetFinder"""
+        historial = historial_data.dropna(subset=['goles_local', 'goles_visitante'])
+        fechas = (pd.to_datetime(historial['fecha'], utc=True, cache=False).dt.tz_localize(None)
+                  .to_numpy(dtype='datetime64[ns]').astype(np.int64))
+        order = np.argsort(fechas, kind='stable')
+
+        leagues = historial[league_col] if league_col in historial else pd.Series('', index=historial.index)
+        league_codes, league_names = pd.factorize(leagues.astype(str).to_numpy()[order])
+        team_codes, team_names = pd.factorize(np.concatenate([
+            historial['equipo_local'].astype(str).to_numpy()[order],
+            historial['equipo_visitante'].astype(str).to_numpy()[order],
+        ]))
+        if len(team_names) > np.iinfo(np.int16).max or len(league_names) > np.iinfo(np.int16).max:
+            raise ValueError("Demasiados equipos o ligas para códigos int16")
+
+        n = len(historial)
+        home_score = historial['goles_local'].to_numpy(dtype=np.int64)[order]
+        away_score = historial['goles_visitante'].to_numpy(dtype=np.int64)[order]
+        columns = {
+            'date': fechas[order].astype(np.int64),
+            'league': league_codes.astype(np.int16),
+            'home_team': team_codes[:n].astype(np.int16),
+            'away_team': team_codes[n:].astype(np.int16),
+            'home_score': home_score.astype(np.int8),
+            'away_score': away_score.astype(np.int8),
+            'result': np.sign(away_score - home_score).astype(np.int8) + 1,
+        }
+        offsets, rows = cls._team_index(columns['home_team'], columns['away_team'], len(team_names))
+        return cls(columns, list(team_names), list(league_names), offsets, rows)
+
+    def to_frame(self, rows: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Historial en el formato de `load_results` (nombres y resultado como categorías)"""
+        columns = self.columns if rows is None else {name: values[rows] for name, values in self.columns.items()}
+        return pd.DataFrame({
+            'liga': pd.Categorical.from_codes(columns['league'], self.leagues),
+            'fecha': pd.to_datetime(columns['date'], utc=True),
+            'equipo_local': pd.Categorical.from_codes(columns['home_team'], self.teams),
+            'equipo_visitante': pd.Categorical.from_codes(columns['away_team'], self.teams),
+            'goles_local': columns['home_score'],
+            'goles_visitante': columns['away_score'],
+            'resultado': pd.Categorical.from_codes(columns['result'], RESULTS),
+        })
+
+    def team_id(self, team: str) -> int:
+        """Código del equipo (-1 si no está en el historial)"""
+        return self._team_ids.get(team, -1)
+
+    def team_matches(self, team: int) -> np.ndarray:
+        """Filas de los partidos del equipo (local o visitante) en orden cronológico"""
+        return self.team_rows[self.team_offsets[team]:self.team_offsets[team + 1]]
+
+    def league_rows(self, league: str) -> np.ndarray:
+        """Filas de un grupo liga/temporada"""
+        return np.flatnonzero(self.columns['league'] == self.leagues.index(league))
+
+    def save(self, path: str) -> None:
+        """Guarda un directorio con un `.npy` por array y las tablas de nombres en `meta.json`"""
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # Mientras se reescribe, el directorio no se da por completo
+        arrays = dict(self.columns, team_offsets=self.team_offsets, team_rows=self.team_rows)
+        for name, values in arrays.items():
+            tmp_path = os.path.join(path, f'{name}.npy.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(tmp_path, os.path.join(path, f'{name}.npy'))
+
+        # meta.json se escribe al final: marca el directorio como completo
+        tmp_path = os.path.join(path, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'teams': self.teams, 'leagues': self.leagues, 'rows': len(self), **self.meta}, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'CompactHistory':
+        """Abre un historial guardado; con `mmap` los arrays se leen del disco bajo demanda (solo lectura)"""
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name, _ in COLUMNS}
+        if any(len(values) != meta['rows'] for values in columns.values()):
+            raise ValueError(f"Historial compacto incompleto en {path}")
+        offsets = np.load(os.path.join(path, 'team_offsets.npy'), mmap_mode=mode)
+        rows = np.load(os.path.join(path, 'team_rows.npy'), mmap_mode=mode)
+        teams, leagues = meta.pop('teams'), meta.pop('leagues')
+        meta.pop('rows')
+        return cls(columns, teams, leagues, offsets, rows, meta)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from config.settings import MODEL_CACHE_DIR, FIXTURE_CACHE_SIZE
+from metrics import count
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def config_key(**config) -> str:
+    """Huella estable de la configuración de un modelo (independiente del orden de los parámetros)"""
+    raw = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+@contextmanager
+def file_lock(path: str):
+    """Bloqueo exclusivo entre procesos sobre `path` (se crea si no existe)"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FixtureCache:
+    """Caché LRU persistente de las salidas del modelo por partido.
+
+    Cada entrada se identifica por (local, visitante, configuración del modelo,
+    versión del historial) y guarda un array de forma fija (`shape`). Mientras el
+    historial no cambie, repetir el análisis entre jornadas no vuelve a ejecutar el
+    modelo: solo se recalculan los partidos que faltan. Al superar `max_entries` se
+    descartan los usados hace más tiempo. Se guarda en un `.npz` por espacio de nombres;
+    varios procesos pueden compartirlo porque cada guardado fusiona, bajo un bloqueo,
+    lo que otros hayan escrito desde la última lectura.
+    """
+
+    def __init__(self, name: str, shape: Tuple[int, ...], root: str = MODEL_CACHE_DIR,
+                 max_entries: int = FIXTURE_CACHE_SIZE):
+        self.name = name
+        self.shape = tuple(shape)
+        self.root = root
+        self.max_entries = max_entries
+        self._entries: Optional[OrderedDict] = None
+        self._dirty = False
+        self._cleared = False
+        self._disk_stamp: Optional[Tuple[int, int]] = None  # (mtime, tamaño) del archivo leído o escrito
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(home: str, away: str, config: str, version: str) -> str:
+        return '\x1f'.join((home, away, config, version))
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, f'fixtures_{self.name}.npz')
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> OrderedDict:
+        """Entradas guardadas en disco (vacío si no hay archivo o no es compatible)"""
+        entries = OrderedDict()
+        stamp = self._stamp()
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if tuple(data['values'].shape[1:]) == self.shape:
+                    entries.update(zip(data['keys'].tolist(), data['values']))
+        except (OSError, ValueError, KeyError):
+            pass
+        self._disk_stamp = stamp
+        return entries
+
+    def _load(self) -> OrderedDict:
+        """Entradas en orden de uso (la más antigua primero); se leen del disco una sola vez"""
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Valor guardado de cada clave (None si falta); marca las encontradas como recientes"""
+        with self._lock:
+            entries = self._load()
+            values = []
+            for key in keys:
+                value = entries.get(key)
+                if value is not None:
+                    entries.move_to_end(key)
+                    self._dirty = True
+                values.append(value)
+        encontrados = sum(value is not None for value in values)
+        self.hits += encontrados
+        self.misses += len(values) - encontrados
+        count('fixture_cache_total', encontrados, cache=self.name, result='hit')
+        count('fixture_cache_total', len(values) - encontrados, cache=self.name, result='miss')
+        return values
+
+    def put_many(self, keys: Iterable[str], values: Iterable[np.ndarray]) -> None:
+        """Añade entradas y descarta las menos recientes por encima de `max_entries`"""
+        with self._lock:
+            entries = self._load()
+            for key, value in zip(keys, values):
+                entries[key] = np.asarray(value, dtype=float).reshape(self.shape)
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._dirty = True
+
+    def lookup(self, keys: Sequence[str], compute) -> np.ndarray:
+        """Array (claves × shape) con las entradas guardadas; `compute(posiciones)` calcula solo las que faltan"""
+        values = self.get_many(keys)
+        faltan = [i for i, value in enumerate(values) if value is None]
+        if faltan:
+            nuevos = np.asarray(compute(faltan), dtype=float).reshape((len(faltan),) + self.shape)
+            self.put_many([keys[i] for i in faltan], nuevos)
+            for i, value in zip(faltan, nuevos):
+                values[i] = value
+        self.save()
+        if not values:
+            return np.zeros((0,) + self.shape)
+        return np.stack(values)
+
+    def save(self) -> None:
+        """Guarda las entradas de forma atómica (solo si cambiaron), fusionadas con las del disco"""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            with file_lock(f'{self.path}.lock'):
+                # Entradas que otros procesos guardaron desde la última lectura: quedan como las más antiguas
+                if not self._cleared and self._stamp() != self._disk_stamp:
+                    merged = self._read()
+                    for key in self._entries:
+                        merged.pop(key, None)
+                    merged.update(self._entries)
+                    while len(merged) > self.max_entries:
+                        merged.popitem(last=False)
+                    self._entries = merged
+
+                keys = np.array(list(self._entries), dtype=str)
+                values = np.stack(list(self._entries.values())) if self._entries else np.zeros((0,) + self.shape)
+                tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, keys=keys, values=values)
+                os.replace(tmp_path, self.path)
+                self._disk_stamp = self._stamp()
+            self._dirty = False
+            self._cleared = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = OrderedDict()
+            self._dirty = True
+            self._cleared = True  # El próximo guardado no recupera lo que hay en disco
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._load()), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+from config.settings import HISTORY_STORE_DIR
+
+COLUMNS = ['date', 'home_team', 'away_team', 'home_score', 'away_score']
+
+
+class HistoryStore:
+    """Almacén local de partidos finalizados por liga y temporada.
+
+    Cada liga/temporada se guarda en un archivo columnar `.npz` con fechas como
+    int64 (epoch en ns, UTC), equipos como códigos int16 sobre una tabla de
+    nombres y goles como int8. La fecha del último partido guardado permite
+    pedir a la API solo los partidos nuevos.
+    """
+
+    def __init__(self, root: str = HISTORY_STORE_DIR):
+        self.root = root
+        self._cache: Dict[str, tuple] = {}
+
+    def path(self, league: str, season: int) -> str:
+        """Ruta del archivo de una liga y temporada"""
+        return os.path.join(self.root, f'{league}_{season}.npz')
+
+    def load(self, league: str, season: int) -> pd.DataFrame:
+        """Carga los partidos guardados (DataFrame vacío si aún no hay datos)"""
+        path = self.path(league, season)
+        if not os.path.exists(path):
+            return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in (
+                ('date', 'datetime64[ns, UTC]'), ('home_team', 'category'), ('away_team', 'category'),
+                ('home_score', 'int8'), ('away_score', 'int8'))})
+
+        # Recargas dentro del mismo proceso sin volver a leer el disco
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1].copy()
+
+        with np.load(path) as data:
+            teams = data['teams']
+            df = pd.DataFrame({
+                'date': pd.to_datetime(data['date'], utc=True),
+                'home_team': pd.Categorical.from_codes(data['home_team'], teams),
+                'away_team': pd.Categorical.from_codes(data['away_team'], teams),
+                'home_score': data['home_score'],
+                'away_score': data['away_score'],
+            })
+
+        self._cache[path] = (mtime, df)
+        return df.copy()
+
+    def last_match_date(self, league: str, season: int) -> Optional[pd.Timestamp]:
+        """Fecha del último partido sincronizado o None si no hay datos"""
+        df = self.load(league, season)
+        return df['date'].max() if not df.empty else None
+
+    def append(self, league: str, season: int, matches: pd.DataFrame) -> pd.DataFrame:
+        """Añade partidos nuevos (sin duplicar) y reescribe el archivo de la liga/temporada"""
+        existing = self.load(league, season)
+        if matches is None or matches.empty:
+            return existing
+
+        new = matches[COLUMNS].copy()
+        new['date'] = pd.to_datetime(new['date'], utc=True)
+        new = new.dropna(subset=['home_score', 'away_score'])
+
+        # Mantener los códigos de equipos existentes y añadir los nuevos al final
+        teams = list(existing['home_team'].cat.categories) if not existing.empty else []
+        known = set(teams)
+        for team in pd.unique(pd.concat([new['home_team'], new['away_team']]).astype(str)):
+            if team not in known:
+                teams.append(team)
+                known.add(team)
+
+        df = pd.concat([
+            existing.astype({'home_team': str, 'away_team': str}),
+            new.astype({'home_team': str, 'away_team': str})
+        ], ignore_index=True)
+        df = df.drop_duplicates(subset=['date', 'home_team', 'away_team'], keep='last')
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+
+        self._save(league, season, df, teams)
+        return self.load(league, season)
+
+    def _save(self, league: str, season: int, df: pd.DataFrame, teams: list) -> None:
+        """Escritura atómica del archivo columnar"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(league, season)
+        tmp_path = path + '.tmp'
+
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                date=df['date'].dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+                home_team=pd.Categorical(df['home_team'], categories=teams).codes.astype(np.int16),
+                away_team=pd.Categorical(df['away_team'], categories=teams).codes.astype(np.int16),
+                home_score=df['home_score'].to_numpy(dtype=np.int8),
+                away_score=df['away_score'].to_numpy(dtype=np.int8),
+                teams=np.array(teams, dtype=str),
+            )
+        os.replace(tmp_path, path)
+        self._cache.pop(path, None)
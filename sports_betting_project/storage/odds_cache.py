@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional
+from config.settings import ODDS_CACHE_DIR
+
+QUOTA_HEADERS = {
+    'x-requests-remaining': 'remaining',
+    'x-requests-used': 'used',
+    'x-requests-last': 'last',
+}
+
+
+class OddsCache:
+    """Caché local de respuestas de la Odds API con TTL, validadores HTTP y registro de cuota.
+
+    Cada consulta se identifica por deporte, región, mercados y casas de apuestas;
+    se guarda el JSON de la respuesta junto a su ETag/Last-Modified para poder
+    hacer peticiones condicionales cuando la entrada ha caducado.
+    """
+
+    def __init__(self, root: str = ODDS_CACHE_DIR):
+        self.root = root
+
+    @staticmethod
+    def key(sport: str, region: str, markets: Iterable[str], bookmakers: Iterable[str]) -> str:
+        """Clave estable de la consulta (independiente del orden de mercados y casas)"""
+        raw = '|'.join([sport, region, ','.join(sorted(markets)), ','.join(sorted(bookmakers))])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f'odds_{key}.json')
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Entrada guardada (`data`, `fetched_at`, `etag`, `last_modified`) o None"""
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry: Optional[Dict], ttl: float) -> bool:
+        """Indica si la entrada sigue vigente según el TTL (segundos)"""
+        return entry is not None and ttl > 0 and time.time() - entry['fetched_at'] < ttl
+
+    def put(self, key: str, data, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Guarda la respuesta de forma atómica"""
+        self._write(self._path(key), {
+            'fetched_at': time.time(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'data': data,
+        })
+
+    def touch(self, key: str, entry: Dict) -> None:
+        """Renueva el TTL de una entrada tras un 304 Not Modified"""
+        entry['fetched_at'] = time.time()
+        self._write(self._path(key), entry)
+
+    def record_quota(self, headers) -> Dict:
+        """Guarda los encabezados x-requests-* de la última respuesta para planificar llamadas"""
+        quota = {name: headers[header] for header, name in QUOTA_HEADERS.items() if header in headers}
+        if quota:
+            quota['updated_at'] = time.time()
+            self._write(os.path.join(self.root, 'odds_quota.json'), quota)
+        return quota
+
+    def quota(self) -> Dict:
+        """Última cuota conocida de la Odds API ({} si aún no se ha registrado)"""
+        try:
+            with open(os.path.join(self.root, 'odds_quota.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path: str, payload: Dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,278 @@
+import os
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from config.settings import ODDS_HISTORY_DB
+from storage.odds_table import OddsTable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    event_key TEXT NOT NULL UNIQUE,
+    sport_key TEXT NOT NULL,
+    home_team TEXT NOT NULL,
+    away_team TEXT NOT NULL,
+    commence_time INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_teams ON events (home_team, away_team, commence_time);
+
+CREATE TABLE IF NOT EXISTS bookmakers (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT
+);
+
+CREATE TABLE IF NOT EXISTS selections (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    bookmaker_id INTEGER NOT NULL REFERENCES bookmakers (id),
+    market TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    point REAL,
+    last_price REAL
+);
+CREATE INDEX IF NOT EXISTS idx_selections_event ON selections (event_id, market);
+
+CREATE TABLE IF NOT EXISTS prices (
+    selection_id INTEGER NOT NULL REFERENCES selections (id),
+    ts INTEGER NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (selection_id, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    ts INTEGER PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+"""
+
+# Columnas comunes de las consultas por selección
+SELECTION_COLUMNS = """
+    e.event_key, e.sport_key, e.home_team, e.away_team, e.commence_time,
+    b.key AS bookmaker, s.market, s.outcome, s.point
+"""
+
+
+def to_epoch(commence_time: str) -> int:
+    """Fecha ISO de la Odds API ('2025-04-23T17:00:00Z') a segundos epoch UTC"""
+    return int(datetime.fromisoformat(commence_time.replace('Z', '+00:00')).timestamp())
+
+
+class OddsHistoryStore:
+    """Histórico de cuotas solo-añadir en SQLite.
+
+    Cada snapshot de la Odds API se descompone en selecciones (evento × casa ×
+    mercado × resultado × línea) y solo se añade una fila de precio cuando la
+    cuota cambia respecto a la última guardada, así una temporada de sondeos
+    cada pocos minutos ocupa lo que ocupan los movimientos de línea. Las
+    consultas se resuelven en SQLite sobre índices, sin cargar el histórico.
+    """
+
+    def __init__(self, path: str = ODDS_HISTORY_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _ids(self, table: str, key_col: str, values: Dict[str, tuple], columns: str) -> Dict[str, int]:
+        """Ids de eventos o casas, insertando los nuevos y actualizando sus datos (p. ej. partidos aplazados)"""
+        names = [column.strip() for column in columns.split(',')]
+        self.conn.executemany(
+            f'INSERT INTO {table} ({key_col}, {columns}) VALUES ({",".join("?" * (len(names) + 1))}) '
+            f'ON CONFLICT ({key_col}) DO UPDATE SET {", ".join(f"{name} = excluded.{name}" for name in names)}',
+            [(key, *extra) for key, extra in values.items()]
+        )
+        keys = list(values)
+        ids = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            ids.update(self.conn.execute(
+                f'SELECT {key_col}, id FROM {table} WHERE {key_col} IN ({",".join("?" * len(chunk))})', chunk
+            ).fetchall())
+        return ids
+
+    def record_snapshot(self, odds_data, ts: Optional[float] = None) -> int:
+        """Guarda un snapshot (eventos de la Odds API u OddsTable); devuelve cuántas cuotas cambiaron"""
+        table = odds_data if isinstance(odds_data, OddsTable) else OddsTable.from_events(odds_data)
+        ts = int(ts if ts is not None else time.time())
+        if not len(table):
+            return 0
+
+        with self.conn:
+            event_ids = self._ids('events', 'event_key', {
+                key: (sport, home, away, to_epoch(commence))
+                for key, sport, home, away, commence in zip(
+                    table.event_ids, table.sport_keys, table.home_teams, table.away_teams, table.commence_times)
+            }, 'sport_key, home_team, away_team, commence_time')
+            bookmaker_ids = self._ids('bookmakers', 'key', dict(
+                (key, (title,)) for key, title in zip(table.bookmakers, table.bookmaker_titles)
+            ), 'title')
+
+            # Selecciones ya conocidas de los eventos del snapshot, con su última cuota
+            events = [event_ids[key] for key in table.event_ids]
+            known = {}
+            for i in range(0, len(events), 500):
+                chunk = events[i:i + 500]
+                for sel_id, event, bookmaker, market, outcome, point, last_price in self.conn.execute(
+                    'SELECT id, event_id, bookmaker_id, market, outcome, point, last_price FROM selections '
+                    f'WHERE event_id IN ({",".join("?" * len(chunk))})', chunk
+                ):
+                    known[(event, bookmaker, market, outcome, point)] = (sel_id, last_price)
+
+            book_codes = np.array([bookmaker_ids[key] for key in table.bookmakers], dtype=np.int64)
+            points = table.point
+            changes = []
+            for event, bookmaker, market, outcome, point, price in zip(
+                np.asarray(events, dtype=np.int64)[table.event], book_codes[table.bookmaker],
+                table.market, table.outcome, points, table.price
+            ):
+                key = (int(event), int(bookmaker), table.markets[market], table.outcomes[outcome],
+                       None if np.isnan(point) else float(point))
+                price = float(price)
+                sel = known.get(key)
+                if sel is None:
+                    sel_id = self.conn.execute(
+                        'INSERT INTO selections (event_id, bookmaker_id, market, outcome, point, last_price) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', (*key, price)
+                    ).lastrowid
+                    known[key] = (sel_id, price)
+                    changes.append((sel_id, ts, price))
+                elif sel[1] != price:
+                    known[key] = (sel[0], price)
+                    changes.append((sel[0], ts, price))
+
+            self.conn.executemany('INSERT OR REPLACE INTO prices (selection_id, ts, price) VALUES (?, ?, ?)', changes)
+            self.conn.executemany('UPDATE selections SET last_price = ? WHERE id = ?',
+                                  [(price, sel_id) for sel_id, _, price in changes])
+            self.conn.execute('INSERT OR REPLACE INTO snapshots (ts, rows, changes) VALUES (?, ?, ?)',
+                              (ts, len(table), len(changes)))
+        return len(changes)
+
+    def events(self) -> pd.DataFrame:
+        """Eventos registrados (una fila por partido)"""
+        return pd.read_sql_query(
+            'SELECT id, event_key, sport_key, home_team, away_team, commence_time FROM events ORDER BY commence_time', self.conn
+        )
+
+    def _where(self, event_keys: Optional[Iterable[str]], market: Optional[str], **params) -> tuple:
+        """Filtro por eventos y mercado con parámetros con nombre"""
+        clauses = []
+        if event_keys is not None:
+            names = []
+            for i, key in enumerate(event_keys):
+                params[f'e{i}'] = key
+                names.append(f':e{i}')
+            clauses.append(f'e.event_key IN ({",".join(names)})')
+        if market is not None:
+            clauses.append('s.market = :market')
+            params['market'] = market
+        return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def opening_closing(self, event_keys: Optional[Iterable[str]] = None, market: Optional[str] = 'h2h') -> pd.DataFrame:
+        """Cuota de apertura (primera registrada) y de cierre (última antes del inicio) por selección"""
+        where, params = self._where(event_keys, market)
+        return pd.read_sql_query(f"""
+            SELECT {SELECTION_COLUMNS},
+                (SELECT ts FROM prices p WHERE p.selection_id = s.id ORDER BY ts LIMIT 1) AS opening_ts,
+                (SELECT price FROM prices p WHERE p.selection_id = s.id ORDER BY ts LIMIT 1) AS opening_price,
+                (SELECT ts FROM prices p WHERE p.selection_id = s.id AND p.ts <= e.commence_time
+                    ORDER BY ts DESC LIMIT 1) AS closing_ts,
+                (SELECT price FROM prices p WHERE p.selection_id = s.id AND p.ts <= e.commence_time
+                    ORDER BY ts DESC LIMIT 1) AS closing_price
+            FROM selections s
+            JOIN events e ON e.id = s.event_id
+            JOIN bookmakers b ON b.id = s.bookmaker_id
+            {where}
+            ORDER BY e.commence_time, e.id, s.id
+        """, self.conn, params=params)
+
+    def prices_before_kickoff(self, lead: float = 0, event_keys: Optional[Iterable[str]] = None,
+                              market: Optional[str] = 'h2h') -> pd.DataFrame:
+        """Cuota vigente `lead` segundos antes del inicio de cada evento (para backtests sin lookahead).
+
+        Solo cuentan los precios registrados estrictamente antes de ese momento: con
+        `lead=0` un snapshot tomado a la hora de inicio ya es del partido en juego.
+        """
+        where, params = self._where(event_keys, market, lead=int(lead))
+        df = pd.read_sql_query(f"""
+            SELECT {SELECTION_COLUMNS},
+                (SELECT price FROM prices p WHERE p.selection_id = s.id AND p.ts < e.commence_time - :lead
+                    ORDER BY ts DESC LIMIT 1) AS price
+            FROM selections s
+            JOIN events e ON e.id = s.event_id
+            JOIN bookmakers b ON b.id = s.bookmaker_id
+            {where}
+            ORDER BY e.commence_time, e.id, s.id
+        """, self.conn, params=params)
+        return df.dropna(subset=['price']).reset_index(drop=True)
+
+    def line_movement(self, event_keys: Optional[Iterable[str]] = None, start: Optional[float] = None,
+                      end: Optional[float] = None, market: Optional[str] = 'h2h') -> pd.DataFrame:
+        """Movimiento de línea por selección en una ventana [start, end] (segundos epoch).
+
+        Devuelve la cuota vigente al inicio y al final de la ventana, el mínimo, el
+        máximo, el número de cambios y la variación relativa.
+        """
+        start = int(start) if start is not None else 0
+        end = int(end) if end is not None else int(time.time())
+        where, params = self._where(event_keys, market, start=start, end=end)
+        df = pd.read_sql_query(f"""
+            SELECT {SELECTION_COLUMNS},
+                (SELECT price FROM prices p WHERE p.selection_id = s.id AND p.ts <= :start
+                    ORDER BY ts DESC LIMIT 1) AS price_before,
+                (SELECT price FROM prices p WHERE p.selection_id = s.id AND p.ts BETWEEN :start AND :end
+                    ORDER BY ts LIMIT 1) AS first_in_window,
+                (SELECT price FROM prices p WHERE p.selection_id = s.id AND p.ts <= :end
+                    ORDER BY ts DESC LIMIT 1) AS end_price,
+                (SELECT MIN(price) FROM prices p WHERE p.selection_id = s.id AND p.ts BETWEEN :start AND :end) AS min_price,
+                (SELECT MAX(price) FROM prices p WHERE p.selection_id = s.id AND p.ts BETWEEN :start AND :end) AS max_price,
+                (SELECT COUNT(*) FROM prices p WHERE p.selection_id = s.id AND p.ts > :start AND p.ts <= :end) AS changes
+            FROM selections s
+            JOIN events e ON e.id = s.event_id
+            JOIN bookmakers b ON b.id = s.bookmaker_id
+            {where}
+            ORDER BY e.commence_time, e.id, s.id
+        """, self.conn, params=params)
+
+        # Cuota vigente al abrir la ventana (la anterior o, si no había, la primera dentro)
+        df['start_price'] = df['price_before'].fillna(df['first_in_window'])
+        df = df.dropna(subset=['start_price']).drop(columns=['price_before', 'first_in_window'])
+        df['min_price'] = df[['min_price', 'start_price']].min(axis=1)
+        df['max_price'] = df[['max_price', 'start_price']].max(axis=1)
+        df['movement'] = df['end_price'] / df['start_price'] - 1
+        return df.reset_index(drop=True)
+
+    def price_series(self, event_key: str, market: Optional[str] = 'h2h') -> pd.DataFrame:
+        """Serie temporal completa de cuotas de un evento"""
+        where, params = self._where([event_key], market)
+        return pd.read_sql_query(f"""
+            SELECT {SELECTION_COLUMNS}, p.ts, p.price
+            FROM prices p
+            JOIN selections s ON s.id = p.selection_id
+            JOIN events e ON e.id = s.event_id
+            JOIN bookmakers b ON b.id = s.bookmaker_id
+            {where}
+            ORDER BY s.id, p.ts
+        """, self.conn, params=params)
+
+    def closing_line_value(self, bets: pd.DataFrame) -> pd.DataFrame:
+        """Añade la cuota de cierre y el CLV a apuestas identificadas por evento, casa y resultado.
+
+        `bets` debe tener 'event_key', 'bookmaker', 'outcome' y 'odds' (mercado h2h).
+        CLV = cuota tomada / cuota de cierre - 1; positivo si se batió al cierre.
+        """
+        closing = self.opening_closing(bets['event_key'].unique(), market='h2h')
+        closing = closing[['event_key', 'bookmaker', 'outcome', 'opening_price', 'closing_price']]
+        result = bets.merge(closing, on=['event_key', 'bookmaker', 'outcome'], how='left')
+        result['clv'] = result['odds'] / result['closing_price'] - 1
+        return result
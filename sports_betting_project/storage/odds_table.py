@@ -0,0 +1,176 @@
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List
+
+# Columnas de la tabla: (nombre, dtype)
+COLUMNS = (
+    ('event', np.int32),      # Código del evento
+    ('bookmaker', np.int16),  # Código de la casa de apuestas
+    ('market', np.int8),      # Código del mercado (h2h, spreads, totals...)
+    ('outcome', np.int32),    # Código del nombre del resultado
+    ('point', np.float32),    # Línea (NaN si el mercado no tiene)
+    ('price', np.float64),    # Cuota decimal
+)
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Recorre un array JSON de nivel superior elemento a elemento sin cargar el archivo entero"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+
+    with open(path, encoding='utf-8') as f:
+        while True:
+            # Saltar espacios y separadores
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != '[':
+                    raise ValueError("Se esperaba un array JSON")
+                started = True
+                pos += 1
+                continue
+            if started and pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("Buffer vacío", buffer, pos)
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    if started and not buffer[pos:].strip():
+                        raise ValueError("Array JSON sin cerrar")
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield item
+            pos = end
+
+
+class OddsTable:
+    """Tabla columnar compacta de cuotas: una fila por evento × casa × mercado × resultado.
+
+    Las columnas son arrays NumPy preasignados que crecen por duplicación; los textos
+    (casas, mercados, resultados) se guardan una sola vez y las filas solo llevan
+    códigos enteros. Los eventos quedan en filas contiguas, en el orden de llegada.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS}
+
+        # Tablas de eventos (una entrada por evento)
+        self.event_ids: List[str] = []
+        self.home_teams: List[str] = []
+        self.away_teams: List[str] = []
+        self.commence_times: List[str] = []
+        self.sport_keys: List[str] = []
+        self.event_offsets: List[int] = [0]
+
+        # Diccionarios de códigos
+        self.bookmakers: List[str] = []
+        self.bookmaker_titles: List[str] = []
+        self.markets: List[str] = []
+        self.outcomes: List[str] = []
+        self._codes: Dict[str, Dict[str, int]] = {'bookmaker': {}, 'market': {}, 'outcome': {}}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Acceso a las columnas como atributos (`table.price`, `table.event`...)"""
+        data = self.__dict__.get('_data')
+        if data is not None and name in data:
+            return data[name][:self.size]
+        raise AttributeError(name)
+
+    def _code(self, kind: str, value: str, values: List[str]) -> int:
+        codes = self._codes[kind]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def code(self, kind: str, value: str) -> int:
+        """Código de una casa, mercado o resultado (-1 si no aparece en la tabla)"""
+        return self._codes[kind].get(value, -1)
+
+    def _reserve(self, rows: int) -> None:
+        capacity = len(self._data['price'])
+        if self.size + rows <= capacity:
+            return
+        while capacity < self.size + rows:
+            capacity *= 2
+        for name, column in self._data.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._data[name] = grown
+
+    def append_event(self, evento: Dict) -> None:
+        """Aplana un evento de la Odds API (todas sus casas, mercados y resultados)"""
+        event = len(self.event_ids)
+        self.event_ids.append(evento.get('id', str(event)))
+        self.home_teams.append(evento['home_team'])
+        self.away_teams.append(evento['away_team'])
+        self.commence_times.append(evento['commence_time'])
+        self.sport_keys.append(evento.get('sport_key', ''))
+
+        for bookmaker in evento.get('bookmakers', []):
+            bookmaker_code = self._code('bookmaker', bookmaker['key'], self.bookmakers)
+            if bookmaker_code == len(self.bookmaker_titles):
+                self.bookmaker_titles.append(bookmaker.get('title', bookmaker['key']))
+
+            for market in bookmaker.get('markets', []):
+                market_code = self._code('market', market['key'], self.markets)
+                outcomes = market.get('outcomes', [])
+                self._reserve(len(outcomes))
+
+                for outcome in outcomes:
+                    i = self.size
+                    self._data['event'][i] = event
+                    self._data['bookmaker'][i] = bookmaker_code
+                    self._data['market'][i] = market_code
+                    self._data['outcome'][i] = self._code('outcome', outcome['name'], self.outcomes)
+                    self._data['point'][i] = outcome.get('point', np.nan)
+                    self._data['price'][i] = outcome.get('price', 0)
+                    self.size += 1
+
+        self.event_offsets.append(self.size)
+
+    @classmethod
+    def from_events(cls, eventos: Iterable[Dict], capacity: int = 1024) -> 'OddsTable':
+        """Construye la tabla a partir de eventos ya cargados o de un iterador"""
+        table = cls(capacity)
+        for evento in eventos:
+            table.append_event(evento)
+        return table
+
+    @classmethod
+    def from_json(cls, path: str, capacity: int = 1024) -> 'OddsTable':
+        """Construye la tabla leyendo el archivo JSON en streaming, evento a evento"""
+        return cls.from_events(iter_json_array(path), capacity)
+
+    def event_rows(self, event: int) -> slice:
+        """Filas contiguas de un evento"""
+        return slice(self.event_offsets[event], self.event_offsets[event + 1])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vista como DataFrame con columnas categóricas"""
+        return pd.DataFrame({
+            'event': self.event,
+            'event_id': np.asarray(self.event_ids, dtype=object)[self.event],
+            'bookmaker': pd.Categorical.from_codes(self.bookmaker, self.bookmakers),
+            'market': pd.Categorical.from_codes(self.market, self.markets),
+            'outcome': pd.Categorical.from_codes(self.outcome, self.outcomes),
+            'point': self.point,
+            'price': self.price,
+        })
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, Optional
+from config.settings import BOOKMAKERS, SHARP_BOOKMAKER
+from storage.odds_table import OddsTable
+
+
+class PriceIndex:
+    """Índice de precios por selección (evento × mercado × línea × resultado) sobre todas las casas.
+
+    Se construye en una sola pasada vectorizada sobre una `OddsTable` y guarda, para
+    cada selección, la mejor cuota y su casa, la probabilidad de consenso sin margen
+    (cada casa normalizada por su overround y promediada) y la de la casa de
+    referencia (Pinnacle). Deduplicar, detectar arbitrajes o exigir que una cuota
+    supere al consenso pasan a ser lecturas de arrays indexados por selección.
+    """
+
+    def __init__(self, table: OddsTable, bookmakers: Iterable[str] = BOOKMAKERS, sharp: str = SHARP_BOOKMAKER):
+        self.table = table
+        price = table.price
+        allowed = np.isin(table.bookmaker, [table.code('bookmaker', key) for key in bookmakers]) & (price > 1)
+        self.allowed = allowed
+
+        # Línea del mercado (0 si no tiene): Over/Under comparten el punto; en hándicap
+        # la línea es el punto del local, así que el del visitante cambia de signo
+        point = np.nan_to_num(table.point.astype(float))
+        away_outcome = np.array([table.code('outcome', team) for team in table.away_teams], dtype=np.int64)
+        spreads = table.market == table.code('market', 'spreads')
+        away = spreads & (table.outcome == away_outcome[table.event]) if len(away_outcome) else spreads
+        line = np.round(np.where(spreads, np.where(away, -point, point), np.abs(point)) * 100).astype(np.int64)
+        line_codes, line_values = pd.factorize(line)
+        n_markets = max(len(table.markets), 1)
+        n_outcomes = max(len(table.outcomes), 1)
+        n_bookmakers = max(len(table.bookmakers), 1)
+
+        # Claves enteras: línea de mercado, selección y libro (línea × casa)
+        line_key = (table.event.astype(np.int64) * n_markets + table.market) * len(line_values) + line_codes
+        self.keys, self.selection = np.unique(line_key * n_outcomes + table.outcome, return_inverse=True)
+        self.line_keys, self.line = np.unique(self.keys // n_outcomes, return_inverse=True)
+        _, book = np.unique(line_key * n_bookmakers + table.bookmaker, return_inverse=True)
+        n_selections = len(self.keys)
+
+        # Primera fila de cada selección (evento, mercado, resultado y punto)
+        self.first_row = np.zeros(n_selections, dtype=np.int64)
+        self.first_row[self.selection[::-1]] = np.arange(len(price))[::-1]
+
+        # Mejor cuota por selección: orden por (selección, cuota descendente)
+        ranked = np.where(allowed, price, -np.inf)
+        order = np.lexsort((-ranked, self.selection))
+        heads = order[np.r_[True, self.selection[order][1:] != self.selection[order][:-1]]] if len(order) else order
+        self.best_row = np.full(n_selections, -1, dtype=np.int64)
+        self.best_row[self.selection[heads]] = np.where(allowed[heads], heads, -1)
+        has_best = self.best_row >= 0
+        self.best_price = np.where(has_best, price[np.clip(self.best_row, 0, None)], np.nan)
+        self.best_bookmaker = np.where(has_best, table.bookmaker[np.clip(self.best_row, 0, None)], -1)
+
+        # Libros completos: la casa cotiza todos los resultados de la línea
+        selection_quoted = np.bincount(self.selection, allowed, n_selections) > 0
+        outcomes_per_line = np.bincount(self.line, selection_quoted, len(self.line_keys))
+        book_size = np.bincount(book, allowed)
+        with np.errstate(divide='ignore'):
+            implied = np.where(allowed, 1 / price, 0)
+        overround = np.bincount(book, implied)
+        complete = allowed & (book_size[book] == outcomes_per_line[self.line[self.selection]]) & (book_size[book] >= 2)
+        self.margin = np.where(complete, overround[book] - 1, np.nan)
+
+        # Probabilidad sin margen por fila y consenso por selección
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.fair_prob = np.where(complete, implied / overround[book], np.nan)
+            self.n_books = np.bincount(self.selection, complete, n_selections).astype(np.int64)
+            self.consensus = np.bincount(self.selection, np.where(complete, self.fair_prob, 0), n_selections) / self.n_books
+
+        # Referencia de la casa sharp
+        self.sharp = np.full(n_selections, np.nan)
+        sharp_rows = complete & (table.bookmaker == table.code('bookmaker', sharp))
+        self.sharp[self.selection[sharp_rows]] = self.fair_prob[sharp_rows]
+
+        # Arbitraje por línea: suma de inversas de las mejores cuotas de todos sus resultados
+        with np.errstate(divide='ignore'):
+            best_implied = np.where(has_best, 1 / self.best_price, 0)
+        self.line_book = np.bincount(self.line, best_implied, len(self.line_keys))
+        priced = np.bincount(self.line, has_best, len(self.line_keys))
+        self.line_complete = (priced == outcomes_per_line) & (priced >= 2)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def is_best(self) -> np.ndarray:
+        """Array booleano por fila: la fila es la mejor cuota de su selección (deduplicado)"""
+        return self.best_row[self.selection] == np.arange(len(self.selection))
+
+    def consensus_edge(self) -> np.ndarray:
+        """Valor esperado de cada fila frente a la probabilidad de consenso"""
+        return self.table.price * self.consensus[self.selection] - 1
+
+    def beats_consensus(self, min_edge: float = 0.0) -> np.ndarray:
+        """Array booleano por fila: cuota permitida que supera al consenso en más de `min_edge`"""
+        with np.errstate(invalid='ignore'):
+            return self.allowed & (self.consensus_edge() > min_edge)
+
+    def arbitrage_lines(self) -> np.ndarray:
+        """Líneas cuyas mejores cuotas suman menos de 1 en probabilidad implícita"""
+        return np.flatnonzero(self.line_complete & (self.line_book < 1))
+
+    def to_frame(self, selections: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Vista por selección: mejor cuota y casa, consenso y referencia sharp"""
+        table = self.table
+        selections = np.arange(len(self)) if selections is None else np.asarray(selections)
+        rows = self.first_row[selections]
+        events = table.event[rows]
+        return pd.DataFrame({
+            'event_id': np.asarray(table.event_ids, dtype=object)[events],
+            'partido': [f"{table.home_teams[e]} vs {table.away_teams[e]}" for e in events],
+            'market': np.asarray(table.markets, dtype=object)[table.market[rows]],
+            'outcome': np.asarray(table.outcomes, dtype=object)[table.outcome[rows]],
+            'point': table.point[rows],
+            'best_price': self.best_price[selections],
+            'best_bookmaker': [table.bookmaker_titles[b] if b >= 0 else None for b in self.best_bookmaker[selections]],
+            'consensus_prob': self.consensus[selections],
+            'sharp_prob': self.sharp[selections],
+            'n_books': self.n_books[selections],
+        })
+
+    def arbitrages(self) -> pd.DataFrame:
+        """Selecciones de las líneas con arbitraje, con el reparto del stake y el margen garantizado"""
+        lines = self.arbitrage_lines()
+        selections = np.flatnonzero(np.isin(self.line, lines))
+        frame = self.to_frame(selections)
+        book = self.line_book[self.line[selections]]
+        return frame.assign(
+            stake_share=(1 / frame['best_price'].to_numpy()) / book,
+            arbitrage_margin=1 / book - 1,
+        )
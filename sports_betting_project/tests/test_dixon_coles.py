@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import scipy.optimize
+from scipy.optimize import check_grad
+
+from models.dixon_coles import DixonColesCache, DixonColesModel, _negative_log_likelihood
+
+
+def league_matches(n, seed=0, start='2024-08-15'):
+    """Partidos sintéticos de seis equipos, uno por día"""
+    rng = np.random.default_rng(seed)
+    teams = [f'Equipo {i}' for i in range(6)]
+    home = rng.integers(0, 6, n)
+    away = (home + rng.integers(1, 6, n)) % 6
+    return pd.DataFrame({
+        'date': pd.date_range(start, periods=n, freq='D', tz='UTC'),
+        'home_team': [teams[i] for i in home],
+        'away_team': [teams[i] for i in away],
+        'home_score': rng.poisson(1.5, n),
+        'away_score': rng.poisson(1.1, n),
+    })
+
+
+def test_negative_log_likelihood_gradient_matches_finite_differences():
+    n_teams = 6
+    rng = np.random.default_rng(1)
+    home = np.repeat(np.arange(n_teams), 8)
+    away = (home + rng.integers(1, n_teams, len(home))) % n_teams
+    # Todos los marcadores con corrección τ (0-0, 0-1, 1-0, 1-1) y algunos sin ella
+    x = np.tile([0, 0, 1, 1, 2, 3], 8).astype(float)
+    y = np.tile([0, 1, 0, 1, 1, 0], 8).astype(float)
+    weights = np.exp(-0.01 * rng.uniform(0, 100, len(home)))
+    args = (home, away, x, y, weights, n_teams)
+
+    for rho in (-0.15, 0.0, 0.12):
+        params = np.concatenate([[0.2, 0.25, rho], rng.normal(0, 0.3, 2 * n_teams)])
+        error = check_grad(lambda p: _negative_log_likelihood(p, *args)[0],
+                           lambda p: _negative_log_likelihood(p, *args)[1], params)
+        assert error < 1e-5 * np.linalg.norm(_negative_log_likelihood(params, *args)[1]) + 1e-5
+
+
+def test_unchanged_matches_reuse_the_cached_fit(tmp_path, monkeypatch):
+    matches = league_matches(120)
+    cache = DixonColesCache(str(tmp_path))
+    model = cache.get('liga', matches)
+
+    def no_fit(*args, **kwargs):
+        raise AssertionError('reajuste con los mismos partidos')
+    monkeypatch.setattr(DixonColesModel, 'fit', no_fit)
+
+    assert cache.get('liga', matches.copy()) is model
+    # Otra instancia (otro proceso) lo recupera del disco
+    reloaded = DixonColesCache(str(tmp_path)).get('liga', matches)
+    assert reloaded.version == model.version
+    assert np.array_equal(reloaded.params, model.params)
+
+
+def test_appended_matches_warm_start_from_previous_parameters(tmp_path, monkeypatch):
+    matches = league_matches(120)
+    cache = DixonColesCache(str(tmp_path))
+    previous = cache.get('liga', matches)
+
+    starts = []
+    minimize = scipy.optimize.minimize
+    def spy(fun, x0, *args, **kwargs):
+        starts.append(np.array(x0))
+        return minimize(fun, x0, *args, **kwargs)
+    monkeypatch.setattr(scipy.optimize, 'minimize', spy)
+
+    updated = pd.concat([matches, league_matches(10, seed=1, start='2024-12-13')], ignore_index=True)
+    model = cache.get('liga', updated)
+
+    assert model is not previous and model.version != previous.version
+    x0 = starts[0]
+    assert np.array_equal(x0[:3], previous.params[:3])
+    n_teams = len(model.teams)
+    for team, i in model.index.items():
+        j = previous.index[team]
+        assert x0[3 + i] == previous.attack[j]
+        assert x0[3 + n_teams + i] == previous.defense[j]
+
+    # Parte de la solución anterior pero da las mismas predicciones que un ajuste desde cero
+    cold = DixonColesModel.fit(updated, cache.decay)
+    home, away = zip(*[(a, b) for a in model.teams for b in model.teams if a != b])
+    assert np.allclose(model.score_matrix(home, away), cold.score_matrix(home, away), atol=1e-3)
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from clients.session import ApiClient
+from scripts.download_data import fetch_all_leagues, sync_matches
+from storage.history_store import HistoryStore
+
+
+def match(date, home, away, home_score, away_score, status='FINISHED'):
+    """Partido con el formato de FootballData.org"""
+    return {'utcDate': date, 'status': status, 'homeTeam': {'name': home}, 'awayTeam': {'name': away},
+            'score': {'fullTime': {'home': home_score, 'away': away_score}}}
+
+
+class FootballDataStub(BaseHTTPRequestHandler):
+    """API local: `/competitions/<código>/matches` con las respuestas que fije cada test"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        competition = url.path.split('/')[2]
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        server = self.server
+        with server.lock:
+            server.requests.append((competition, params))
+            status, headers, body = server.respond(competition, params)
+        if server.barrier is not None:
+            server.barrier.wait()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        payload = json.dumps(body).encode()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Servidor HTTP en localhost y un `ApiClient` apuntando a él; el almacén y los CSV van a `tmp_path`"""
+    monkeypatch.chdir(tmp_path)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FootballDataStub)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.barrier = None
+    server.respond = lambda competition, params: (200, {}, {'matches': []})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = ApiClient(f'http://127.0.0.1:{server.server_address[1]}/', backoff=0)
+    yield server, client
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_all_leagues_writes_each_league_and_season_in_parallel(api):
+    server, client = api
+    # Las cuatro peticiones deben estar abiertas a la vez para pasar la barrera
+    server.barrier = threading.Barrier(4, timeout=5)
+    server.respond = lambda competition, params: (200, {}, {'matches': [
+        match(f"{params['season']}-09-01T19:00:00Z", f'{competition} A', f'{competition} B', 2, 1),
+        match(f"{params['season']}-09-08T19:00:00Z", f'{competition} B', f'{competition} A', 0, 0),
+        match(f"{params['season']}-09-15T19:00:00Z", f'{competition} A', f'{competition} B', None, None, 'SCHEDULED'),
+    ]})
+
+    results = fetch_all_leagues({'la_liga': 'PD', 'premier_league': 'PL'}, [2023, 2024], max_workers=4, client=client)
+
+    assert sorted(results) == [('la_liga', 2023), ('la_liga', 2024), ('premier_league', 2023), ('premier_league', 2024)]
+    store = HistoryStore()
+    for (league, season), df in results.items():
+        code = {'la_liga': 'PD', 'premier_league': 'PL'}[league]
+        assert len(df) == 2
+        guardado = store.load(league, season)
+        assert guardado['home_team'].astype(str).tolist() == [f'{code} A', f'{code} B']
+        assert (guardado['date'].dt.year == season).all()
+        assert len(pd.read_csv(f'data/{league}_{season}_matches.csv')) == 2
+
+
+def test_rate_limited_request_is_retried_after_retry_after(api):
+    server, client = api
+    def respond(competition, params):
+        if len(server.requests) == 1:
+            return 429, {'Retry-After': '1'}, {'message': 'Too many requests'}
+        return 200, {}, {'matches': [match('2024-08-18T19:00:00Z', 'A', 'B', 1, 0)]}
+    server.respond = respond
+
+    inicio = time.monotonic()
+    df, nuevos = sync_matches('PD', 2024, store=HistoryStore(), client=client)
+
+    assert time.monotonic() - inicio >= 1
+    assert len(server.requests) == 2
+    assert nuevos == 1 and len(df) == 1
+
+
+def test_sync_matches_only_requests_matches_since_the_last_one(api):
+    server, client = api
+    store = HistoryStore()
+    server.respond = lambda competition, params: (200, {}, {'matches': [
+        match('2024-08-18T19:00:00Z', 'A', 'B', 1, 0),
+        match('2024-08-25T17:30:00Z', 'B', 'A', 2, 2),
+    ]})
+    _, nuevos = sync_matches('PD', 2024, store=store, client=client)
+    assert nuevos == 2
+    assert 'dateFrom' not in server.requests[0][1]
+
+    # La API devuelve también el partido del día del último guardado, que no se duplica
+    server.respond = lambda competition, params: (200, {}, {'matches': [
+        match('2024-08-25T17:30:00Z', 'B', 'A', 2, 2),
+        match('2024-09-01T19:00:00Z', 'A', 'B', 0, 3),
+    ]})
+    df, nuevos = sync_matches('PD', 2024, store=store, client=client)
+
+    params = server.requests[1][1]
+    assert params['season'] == '2024'
+    assert params['dateFrom'] == '2024-08-25'
+    assert 'dateTo' in params
+    assert nuevos == 1
+    assert len(df) == 3
@@ -0,0 +1,58 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from storage.fixture_cache import FixtureCache
+
+SHAPE = (2, 3)
+
+
+def fill(root, worker, rounds=20, per_round=5):
+    """Tarea de un proceso: guarda `rounds` tandas de partidos propios en la caché compartida"""
+    cache = FixtureCache('compartida', SHAPE, root=root)
+    for r in range(rounds):
+        keys = [f'w{worker}_r{r}_{i}' for i in range(per_round)]
+        cache.lookup(keys, lambda posiciones: np.full((len(posiciones),) + SHAPE, worker))
+    return worker
+
+
+def test_concurrent_processes_merge_their_entries(tmp_path):
+    root = str(tmp_path)
+    with ProcessPoolExecutor(6) as pool:
+        assert sorted(pool.map(fill, [root] * 6, range(6))) == list(range(6))
+
+    cache = FixtureCache('compartida', SHAPE, root=root)
+    assert cache.stats()['entries'] == 6 * 20 * 5
+    values = cache.get_many([f'w{w}_r19_4' for w in range(6)])
+    assert [float(value[0, 0]) for value in values] == [0, 1, 2, 3, 4, 5]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['fixtures_compartida.npz', 'fixtures_compartida.npz.lock']
+
+
+def test_least_recently_used_entries_are_trimmed(tmp_path):
+    cache = FixtureCache('lru', SHAPE, root=str(tmp_path), max_entries=3)
+    cache.put_many(['a', 'b', 'c'], np.zeros((3,) + SHAPE))
+    cache.get_many(['a'])  # 'a' pasa a ser la más reciente
+    cache.put_many(['d'], np.ones((1,) + SHAPE))
+    cache.save()
+
+    reloaded = FixtureCache('lru', SHAPE, root=str(tmp_path), max_entries=3)
+    assert list(reloaded._load()) == ['c', 'a', 'd']
+    assert reloaded.get_many(['b'])[0] is None
+
+
+def test_save_trims_merged_entries_and_clear_discards_disk(tmp_path):
+    root = str(tmp_path)
+    fill(root, 0, rounds=4)  # 20 entradas en disco
+
+    small = FixtureCache('compartida', SHAPE, root=root, max_entries=10)
+    small._load()
+    fill(root, 1, rounds=1)  # Otro proceso escribe después de la lectura
+    small.put_many(['nueva'], np.zeros((1,) + SHAPE))
+    small.save()
+    entries = list(FixtureCache('compartida', SHAPE, root=root)._load())
+    assert len(entries) == 10
+    assert entries[-1] == 'nueva'
+
+    small.clear()
+    small.save()
+    assert FixtureCache('compartida', SHAPE, root=root).stats()['entries'] == 0
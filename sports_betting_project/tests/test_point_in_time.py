@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import SPORT
+from models.point_in_time import PointInTimeStats
+from scripts.backtest import fixture_outputs, load_odds
+from storage.odds_history import OddsHistoryStore, to_epoch
+
+KICKOFF = '2024-09-15T19:00:00Z'
+
+
+def results(rows):
+    """Historial con el formato del backtest a partir de (fecha, local, visitante, goles, goles)"""
+    df = pd.DataFrame(rows, columns=['fecha', 'equipo_local', 'equipo_visitante', 'goles_local', 'goles_visitante'])
+    df['fecha'] = pd.to_datetime(df['fecha'], utc=True)
+    df['resultado'] = np.select([df['goles_local'] > df['goles_visitante'], df['goles_local'] < df['goles_visitante']],
+                                ['1', '2'], 'X')
+    return df
+
+
+HISTORIAL = results([
+    ('2024-08-18T19:00:00Z', 'Real Madrid CF', 'FC Barcelona', 2, 1),
+    ('2024-08-25T19:00:00Z', 'FC Barcelona', 'Sevilla FC', 1, 1),
+    ('2024-09-01T19:00:00Z', 'Sevilla FC', 'Real Madrid CF', 0, 2),
+    (KICKOFF, 'Real Madrid CF', 'Sevilla FC', 1, 0),    # Partido evaluado
+    (KICKOFF, 'FC Barcelona', 'Valencia CF', 4, 0),     # Misma hora
+    (KICKOFF, 'Sevilla FC', 'FC Barcelona', 3, 3),      # Misma hora, mismos equipos
+    ('2024-09-22T19:00:00Z', 'Real Madrid CF', 'Sevilla FC', 5, 0),
+])
+FIXTURE = 3
+
+
+@pytest.mark.parametrize('ewma', [False, True])
+def test_features_ignore_matches_at_or_after_kickoff(ewma):
+    # Cambiar los marcadores desde el inicio del partido (incluido él mismo) no altera sus datos
+    alterado = HISTORIAL.copy()
+    desde = alterado['fecha'] >= pd.Timestamp(KICKOFF)
+    alterado.loc[desde, ['goles_local', 'goles_visitante']] = [[0, 6], [7, 7], [0, 0], [9, 1]]
+    alterado['resultado'] = results(alterado.iloc[:, :5].values.tolist())['resultado']
+
+    original = PointInTimeStats(HISTORIAL, ewma=ewma)
+    cambiado = PointInTimeStats(alterado, ewma=ewma)
+    assert original.league_matches[FIXTURE] == 3
+    assert original.home['n'][FIXTURE] == 1 and original.away['n'][FIXTURE] == 1
+    for side in ('home', 'away'):
+        for key, values in getattr(original, side).items():
+            np.testing.assert_array_equal(values[FIXTURE], getattr(cambiado, side)[key][FIXTURE])
+    assert original.avg_home_goals[FIXTURE] == cambiado.avg_home_goals[FIXTURE] == pytest.approx(1.0)
+
+    prob, confidence, valid = fixture_outputs(HISTORIAL, ewma=ewma)
+    prob_cambiado, confidence_cambiado, _ = fixture_outputs(alterado, ewma=ewma)
+    assert valid[FIXTURE]
+    np.testing.assert_array_equal(prob[FIXTURE], prob_cambiado[FIXTURE])
+    np.testing.assert_array_equal(confidence[FIXTURE], confidence_cambiado[FIXTURE])
+
+
+def snapshot(home_price):
+    """Snapshot de la Odds API del partido evaluado con una sola casa"""
+    return [{'id': 'e1', 'sport_key': SPORT, 'home_team': 'Real Madrid', 'away_team': 'Sevilla',
+             'commence_time': KICKOFF, 'bookmakers': [{'key': 'bet365', 'title': 'Bet365', 'markets': [
+                 {'key': 'h2h', 'outcomes': [{'name': 'Real Madrid', 'price': home_price},
+                                             {'name': 'Draw', 'price': 4.0}, {'name': 'Sevilla', 'price': 6.0}]},
+             ]}]}]
+
+
+@pytest.mark.parametrize('lead, expected', [(0, 1.60), (3600, 1.80)])
+def test_odds_ignore_prices_at_or_after_kickoff(tmp_path, lead, expected):
+    kickoff = to_epoch(KICKOFF)
+    store = OddsHistoryStore(str(tmp_path / 'odds.sqlite'))
+    for ts, price in ((kickoff - 7200, 1.80), (kickoff - 3600, 1.70), (kickoff - 60, 1.60),
+                      (kickoff, 1.50), (kickoff + 1800, 1.20)):
+        store.record_snapshot(snapshot(price), ts=ts)
+
+    odds = load_odds(lead, store=store)
+    store.close()
+
+    local = odds[odds['Mercado'] == '1']
+    assert local['Odd'].tolist() == [expected]
+    assert local['equipo_local'].tolist() == ['Real Madrid CF']
+    assert (odds['fecha'] == pd.Timestamp(KICKOFF)).all()
@@ -0,0 +1,42 @@
+import numpy as np
+from storage.odds_table import OddsTable
+from storage.price_index import PriceIndex
+
+
+def spreads_book(key, home, away):
+    """Casa con un mercado de hándicap: (punto, cuota) del local y del visitante"""
+    return {'key': key, 'title': key, 'markets': [{'key': 'spreads', 'outcomes': [
+        {'name': 'A', 'point': home[0], 'price': home[1]},
+        {'name': 'B', 'point': away[0], 'price': away[1]},
+    ]}]}
+
+
+def build_index(*bookmakers):
+    table = OddsTable.from_events([{
+        'id': 'e1', 'home_team': 'A', 'away_team': 'B', 'commence_time': '2024-08-18T19:00:00Z',
+        'bookmakers': list(bookmakers),
+    }])
+    return PriceIndex(table, ['bet365', 'bwin'])
+
+
+def test_spreads_of_opposite_sign_are_different_lines():
+    # A −0.5 / B +0.5 frente a A +0.5 / B −0.5: cuatro selecciones en dos líneas
+    index = build_index(
+        spreads_book('bet365', (-0.5, 2.10), (0.5, 1.75)),
+        spreads_book('bwin', (0.5, 1.50), (-0.5, 2.60)),
+    )
+    assert len(index) == 4
+    assert len(index.line_keys) == 2
+    assert index.is_best().all()
+    assert index.arbitrages().empty
+    assert np.allclose(index.n_books, 1)
+
+
+def test_same_spread_line_groups_across_bookmakers():
+    index = build_index(
+        spreads_book('bet365', (-0.5, 2.10), (0.5, 1.75)),
+        spreads_book('bwin', (-0.5, 2.00), (0.5, 1.90)),
+    )
+    assert len(index) == 2
+    assert index.is_best().tolist() == [True, False, False, True]
+    assert np.allclose(index.n_books, 2)
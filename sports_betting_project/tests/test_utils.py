@@ -0,0 +1,36 @@
+from utils import build_game_index, find_matching_game_id, get_teams_in_match, normalize_team_name
+
+# Estimaciones con los nombres de football-data.org (los del historial)
+ESTIMATED = {
+    'g1': {'Club Atlético de Madrid': 0.55, 'RC Celta de Vigo': 0.20},
+    'g2': {'Real Madrid CF': 0.60, 'FC Barcelona': 0.25},
+    'g3': {'RCD Espanyol de Barcelona': 0.40, 'Athletic Club': 0.35},
+}
+
+
+def odds_event(home, away):
+    """Evento de The Odds API con un mercado h2h"""
+    return {'home_team': home, 'away_team': away, 'bookmakers': [{'key': 'bet365', 'markets': [{'key': 'h2h', 'outcomes': [
+        {'name': home, 'price': 1.8}, {'name': away, 'price': 4.5}, {'name': 'Draw', 'price': 3.6},
+    ]}]}]}
+
+
+def test_odds_api_spellings_resolve_to_canonical_names():
+    assert normalize_team_name('Atlético Madrid') == 'Club Atlético de Madrid'
+    assert normalize_team_name('Atletico Madrid') == 'Club Atlético de Madrid'
+    assert normalize_team_name('Celta Vigo') == 'RC Celta de Vigo'
+    assert normalize_team_name('Espanyol') == 'RCD Espanyol de Barcelona'
+    assert normalize_team_name('Barcelona') == 'FC Barcelona'
+
+
+def test_find_matching_game_id_with_odds_api_names():
+    teams = get_teams_in_match(odds_event('Atlético Madrid', 'Celta Vigo'))
+    assert find_matching_game_id(teams, ESTIMATED) == 'g1'
+    assert find_matching_game_id({'Espanyol', 'Athletic Bilbao'}, ESTIMATED) == 'g3'
+    assert find_matching_game_id({'Atlético Madrid', 'Sevilla'}, ESTIMATED) is None
+
+
+def test_find_matching_game_id_with_prebuilt_index():
+    index = build_game_index(ESTIMATED)
+    assert find_matching_game_id({'Celta Vigo', 'Atlético Madrid'}, ESTIMATED, game_index=index) == 'g1'
+    assert find_matching_game_id({'Real Madrid', 'Barcelona'}, {}, game_index=index) == 'g2'
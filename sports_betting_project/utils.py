@@ -1,105 +1,164 @@
+import difflib
+import re
+import numpy as np
 import unidecode  # Asegura que los nombres sean uniformes eliminando acentos
-from typing import Dict, List, Set, Any
+from typing import Dict, Iterable, List, Optional, Set, Any
+
+# Nombres canónicos por liga: los de football-data.org, que son los del historial
+TEAM_NAMES = {
+    'la_liga': [
+        "Athletic Club", "CA Osasuna", "CD Leganés", "Club Atlético de Madrid", "Deportivo Alavés",
+        "FC Barcelona", "Getafe CF", "Girona FC", "RC Celta de Vigo", "RCD Espanyol de Barcelona",
+        "RCD Mallorca", "Rayo Vallecano de Madrid", "Real Betis Balompié", "Real Madrid CF",
+        "Real Sociedad de Fútbol", "Real Valladolid CF", "Sevilla FC", "UD Las Palmas", "Valencia CF",
+        "Villarreal CF",
+    ],
+}
 
+# Alias que ni el plegado de acentos/mayúsculas ni la búsqueda aproximada resuelven solos
 TEAM_ALIASES = {
-    "Athletic Bilbao": "Athletic Club",
-    "Athletic bilbao": "Athletic Club",
-    "Athletic": "Athletic Club",
-
-    "Las Palmas": "UD Las Palmas",
-    "Las palmas": "UD Las Palmas",
-
-    "Celta Vigo": "RC Celta",
-    "Celta vigo": "RC Celta",
-    "Celta": "RC Celta",
-
-    "Real Sociedad": "Real Sociedad",
-    "Real sociedad": "Real Sociedad",
-
-    "Atletico Madrid": "Atlético de Madrid",
-    "Atletico madrid": "Atlético de Madrid",
-    "Atlético Madrid": "Atlético de Madrid",
-
-    "Real Betis": "Real Betis Balompié",
-    "Real betis": "Real Betis Balompié",
-    "Betis": "Real Betis Balompié",
-
-    "Valladolid": "Real Valladolid",
-    "valladolid": "Real Valladolid",
-
-    "Leganes": "CD Leganés",
-    "leganes": "CD Leganés",
-
-    "Espanyol": "RCD Espanyol",
-    "espanyol": "RCD Espanyol",
-
-    "Getafe": "Getafe CF",
-    "getafe": "Getafe CF",
-
-    "Osasuna": "CA Osasuna",
-    "CA Osasuna": "CA Osasuna",
-    "osasuna": "CA Osasuna",
-
-    "Alaves": "Deportivo Alavés",
-    "alaves": "Deportivo Alavés",
-
-    "Girona": "Girona FC",
-    "girona": "Girona FC",
-
-    "Mallorca": "RCD Mallorca",
-    "mallorca": "RCD Mallorca",
-
-    "Real Madrid": "Real Madrid CF",
-    "real madrid": "Real Madrid CF",
-    "Madrid": "Real Madrid CF",
-
-    "Barcelona": "FC Barcelona",
-    "barcelona": "FC Barcelona",
-
-    "Sevilla": "Sevilla FC",
-    "sevilla": "Sevilla FC",
-
-    "Valencia": "Valencia CF",
-    "valencia": "Valencia CF",
-
-    "Villarreal": "Villarreal CF",
-    "villarreal": "Villarreal CF"
+    'la_liga': {
+        "Athletic Bilbao": "Athletic Club",
+        "Madrid": "Real Madrid CF",
+        "Atleti": "Club Atlético de Madrid",
+        "Barça": "FC Barcelona",
+    },
 }
 
-def normalize_team_name(name: str) -> str:
+# Palabras que no distinguen a un equipo (siglas societarias y genéricas)
+NAME_STOPWORDS = {'fc', 'cf', 'cd', 'ud', 'sd', 'rc', 'rcd', 'ca', 'sad', 'club', 'de', 'del', 'balompie', 'futbol'}
+FUZZY_CUTOFF = 0.8  # Similitud mínima para aceptar un nombre desconocido
+
+
+def fold_team_name(name: str) -> str:
+    """Clave de un nombre sin acentos, mayúsculas, puntuación ni siglas del club"""
+    tokens = re.findall(r'[a-z0-9]+', unidecode.unidecode(str(name)).lower())
+    return ' '.join(token for token in tokens if token not in NAME_STOPWORDS) or ' '.join(tokens)
+
+
+class TeamResolver:
+    """Identidad canónica de los equipos de una liga con IDs enteros.
+
+    Cada nombre canónico recibe un ID y se indexa por su clave plegada, así que
+    cualquier variante de acentos, mayúsculas o siglas se resuelve con un acceso
+    al diccionario. Los nombres que no están en el índice pasan por una búsqueda
+    aproximada cuyo resultado se memoriza (también los fallos, con ID -1).
+    """
+
+    def __init__(self, names: Iterable[str] = (), aliases: Optional[Dict[str, str]] = None):
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._fuzzy: Dict[str, int] = {}
+        for name in names:
+            self.register(name)
+        for alias, name in (aliases or {}).items():
+            self._index[fold_team_name(alias)] = self.register(name)
+
+    def register(self, name: str) -> int:
+        """Da de alta un nombre canónico (p. ej. del historial) y devuelve su ID"""
+        key = fold_team_name(name)
+        team_id = self._index.get(key)
+        if team_id is None:
+            team_id = self._index[key] = len(self.names)
+            self.names.append(str(name).strip())
+            # Un equipo nuevo puede cambiar lo que antes se resolvió por aproximación
+            self._fuzzy.clear()
+        return team_id
+
+    def register_all(self, names: Iterable[str]) -> None:
+        """Da de alta los equipos de un historial; los que ya se reconocen conservan su ID.
+
+        Los nombres de un mismo historial son equipos distintos: uno que solo se
+        parece a otro del mismo historial ('RCD Espanyol de Barcelona' y 'FC Barcelona')
+        se da de alta aparte en lugar de fusionarse con él.
+        """
+        names = sorted(set(map(str, names)))
+        propios = {self._index[key] for key in map(fold_team_name, names) if key in self._index}
+        for name in names:
+            if fold_team_name(name) in self._index:
+                continue
+            team_id = self.resolve(name)
+            if team_id < 0 or team_id in propios:
+                team_id = self.register(name)
+            propios.add(team_id)
+
+    def resolve(self, name: str) -> int:
+        """ID del equipo, o -1 si no se reconoce"""
+        key = fold_team_name(name)
+        team_id = self._index.get(key)
+        if team_id is None:
+            team_id = self._fuzzy.get(key)
+            if team_id is None:
+                team_id = self._fuzzy[key] = self._closest(key)
+        return team_id
+
+    def _closest(self, key: str) -> int:
+        """Búsqueda aproximada: un único equipo cuyas palabras contengan (o estén en) las del nombre, o el más parecido"""
+        tokens = set(key.split())
+        candidates = {team_id for k, team_id in self._index.items() if tokens <= set(k.split()) or set(k.split()) <= tokens}
+        if len(candidates) == 1:
+            return candidates.pop()
+        matches = difflib.get_close_matches(key, list(self._index), n=1, cutoff=FUZZY_CUTOFF)
+        return self._index[matches[0]] if matches else -1
+
+    def ids(self, names: Iterable[str]) -> np.ndarray:
+        """IDs de un lote de nombres"""
+        names = list(names)
+        return np.fromiter((self.resolve(name) for name in names), dtype=np.int64, count=len(names))
+
+    def canonical(self, name: str) -> str:
+        """Nombre canónico del equipo (el mismo nombre si no se reconoce)"""
+        team_id = self.resolve(name)
+        return self.names[team_id] if team_id >= 0 else str(name).strip()
+
+
+_resolvers: Dict[str, TeamResolver] = {}
+
+def team_resolver(league: str = 'la_liga') -> TeamResolver:
+    """Resolvedor compartido de una liga, sembrado con sus nombres y alias"""
+    resolver = _resolvers.get(league)
+    if resolver is None:
+        resolver = _resolvers[league] = TeamResolver(TEAM_NAMES.get(league, ()), TEAM_ALIASES.get(league))
+    return resolver
+
+def normalize_team_name(name: str, league: str = 'la_liga') -> str:
     """Normaliza el nombre del equipo para evitar problemas de coincidencia."""
-    return TEAM_ALIASES.get(name.strip(), name.strip())
+    return team_resolver(league).canonical(name)
 
 def calculate_implied_probability(odds: float) -> float:
     """Calcula la probabilidad implícita a partir de las cuotas."""
     return 1/odds if odds > 0 else 0
 
-def get_teams_in_match(match: Dict[str, Any]) -> Set[str]:
+def get_teams_in_match(match: Dict[str, Any], league: str = 'la_liga') -> Set[str]:
     """Extrae los equipos que aparecen en el partido."""
     teams = set()
     for bookmaker in match.get('bookmakers', []):
         for market in bookmaker.get('markets', []):
             if market.get('key') == 'h2h':
                 for outcome in market.get('outcomes', []):
-                    if outcome.get('name', []).lower() != 'draw':
-                        teams.add(normalize_team_name(outcome.get('name', '')))                   
-    return teams          
-    
-
-def find_matching_game_id(teams_in_match: Set[str], estimated_probabilities: Dict[str, Any]) -> str:
-    """Busca el game_id que coincide con los equipos en el partido."""
-    for game_id, teams_probs in estimated_probabilities.items():
-        estimated_teams = {normalize_team_name(t) for t in teams_probs.keys()}
-        if estimated_teams == teams_in_match:
-            print(f"✅ ¡Match encontrado! Usaremos {game_id}")
-            return game_id
-    return None  # Si no se encuentra coincidencia  
-
-def filter_duplicate_bets(value_bets: List[Dict]) -> List[Dict]:
-    """Filtra las apuestas duplicadas."""
-    best_bets = {}
-    for bet in value_bets:
-        key = (bet['game_id'], bet['team'])  # Agrupa por partido y equipo
-        if key not in best_bets or bet['edge'] > best_bets[key]['edge']:  
-            best_bets[key] = bet
-    return list(best_bets.values())
\ No newline at end of file
+                    if outcome.get('name', '').lower() != 'draw':
+                        teams.add(normalize_team_name(outcome.get('name', ''), league))
+    return teams
+
+def build_game_index(estimated_probabilities: Dict[str, Any], league: str = 'la_liga') -> Dict[frozenset, str]:
+    """Índice {IDs de los equipos: game_id}, construido una vez por conjunto de estimaciones."""
+    resolver = team_resolver(league)
+    return {
+        frozenset(resolver.ids(teams_probs.keys())): game_id
+        for game_id, teams_probs in estimated_probabilities.items()
+    }
+
+def find_matching_game_id(teams_in_match: Set[str], estimated_probabilities: Dict[str, Any], league: str = 'la_liga',
+                          game_index: Optional[Dict[frozenset, str]] = None) -> str:
+    """Busca el game_id que coincide con los equipos en el partido.
+
+    Para muchos partidos contra las mismas estimaciones conviene pasar `game_index`
+    (ver `build_game_index`) y no reconstruir el índice en cada llamada.
+    """
+    if game_index is None:
+        game_index = build_game_index(estimated_probabilities, league)
+    ids = frozenset(team_resolver(league).ids(teams_in_match))
+    game_id = None if -1 in ids else game_index.get(ids)
+    if game_id is not None:
+        print(f"✅ ¡Match encontrado! Usaremos {game_id}")
+    return game_id  # None si no se encuentra coincidencia